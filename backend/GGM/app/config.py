@@ -51,6 +51,7 @@ class AccountConfig(BaseModel):
     available: bool = Field(True, description="是否可用")
     note: str = Field("", description="备注")
     refresh_time: str = Field("", description="凭据刷新时间 (ISO 格式)")
+    expires_at: str = Field("", description="__Secure-C_SES 过期时间 (ISO 格式)")
 
 
 class ModelConfig(BaseModel):
@@ -89,6 +90,8 @@ class AutoLoginConfig(BaseModel):
     retry_count: int = Field(3, description="重试次数")
     headless: bool = Field(True, description="是否使用无头浏览器模式（False 可以看到浏览器界面，便于调试）")
     yescaptcha_api_key: str = Field("", description="YesCaptcha API 密钥（用于绕过 reCAPTCHA 验证）")
+    yescaptcha_max_concurrent: int = Field(3, description="YesCaptcha 最大并发打码任务数（与套餐并发数一致）")
+    yescaptcha_token_pool_size: int = Field(0, description="YesCaptcha 预取 token 池大小（0 表示不预取，预取会在空闲时消耗额度）")
 
 
 class AppConfig(BaseModel):
@@ -220,6 +223,12 @@ class ConfigManager:
             if hasattr(unified_config, 'YESCAPTCHA_API_KEY'):
                 if self._config.auto_login:
                     self._config.auto_login.yescaptcha_api_key = unified_config.YESCAPTCHA_API_KEY
+            if hasattr(unified_config, 'YESCAPTCHA_MAX_CONCURRENT'):
+                if self._config.auto_login:
+                    self._config.auto_login.yescaptcha_max_concurrent = unified_config.YESCAPTCHA_MAX_CONCURRENT
+            if hasattr(unified_config, 'YESCAPTCHA_TOKEN_POOL_SIZE'):
+                if self._config.auto_login:
+                    self._config.auto_login.yescaptcha_token_pool_size = unified_config.YESCAPTCHA_TOKEN_POOL_SIZE
             logger.info("已从统一配置文件加载关键配置")
 
         # 环境变量覆盖
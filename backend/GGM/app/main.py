@@ -7,6 +7,8 @@ Gemini Business API 代理服务
 - 生命周期管理
 """
 import logging
+import logging.handlers
+import queue
 import asyncio
 from contextlib import asynccontextmanager
 
@@ -30,10 +32,17 @@ from app.services.account_replacement_service import account_replacement_service
 from app.services.account_pool_service import account_pool_service
 from app.services.quota_service import quota_service
 
-# 配置日志
+# 配置日志：记录先进入队列，由后台线程写出，避免在事件循环线程上阻塞 IO
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+_log_listener.start()
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
@@ -166,6 +175,9 @@ async def lifespan(app: FastAPI):
 
     # 加载配置
     config_manager.load_config()
+    logging.getLogger().setLevel(
+        getattr(logging, str(config_manager.config.log_level).upper(), logging.INFO)
+    )
     logger.info(f"配置已加载: {len(config_manager.config.accounts)} 个账号")
 
     # 加载账号
@@ -256,6 +268,7 @@ async def lifespan(app: FastAPI):
     await close_http_client()
 
     logger.info("服务已关闭")
+    _log_listener.stop()
 
 
 async def periodic_cleanup():
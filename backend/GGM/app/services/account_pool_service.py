@@ -11,7 +11,7 @@ import sys
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Set
+from typing import Set, Optional
 
 # 添加 backend 目录到路径，以便导入统一配置
 BACKEND_DIR = Path(__file__).parent.parent.parent.parent
@@ -71,6 +71,13 @@ class AccountPoolService:
             return unified_config.ACCOUNT_POOL_CREDENTIAL_EXPIRE_HOURS
         return 12
 
+    @property
+    def CREDENTIAL_REFRESH_AHEAD_SECONDS(self):
+        # 提前刷新窗口需大于健康检查间隔，否则可能在两次检查之间过期
+        if unified_config and hasattr(unified_config, 'ACCOUNT_POOL_CREDENTIAL_REFRESH_AHEAD_SECONDS'):
+            return unified_config.ACCOUNT_POOL_CREDENTIAL_REFRESH_AHEAD_SECONDS
+        return 900
+
     def __init__(self):
         self._running = False
         self._task = None
@@ -150,27 +157,22 @@ class AccountPoolService:
             should_delete = False
             delete_reason = ""
 
-            # 检查1: 凭证是否过期
-            if account.refresh_time:
-                try:
-                    # 处理时区：统一转换为本地时间比较
-                    refresh_time_str = account.refresh_time.replace('Z', '+00:00')
-                    refresh_dt = datetime.fromisoformat(refresh_time_str)
-                    # 如果有时区信息，转换为本地时间
-                    if refresh_dt.tzinfo is not None:
-                        refresh_dt = refresh_dt.replace(tzinfo=None)
-                    age_hours = (datetime.now() - refresh_dt).total_seconds() / 3600
-
-                    if age_hours > self.CREDENTIAL_EXPIRE_HOURS:
-                        # 尝试刷新
-                        print(f"[AccountPool] {account_note} 凭证已过期 {age_hours:.1f}h，尝试刷新...")
-                        success = await self._try_refresh(i, account_note)
-
-                        if not success:
-                            should_delete = True
-                            delete_reason = f"凭证过期且刷新失败"
-                except Exception as e:
-                    logger.warning(f"解析 refresh_time 失败: {e}")
+            # 检查1: 凭证是否即将过期（在过期前的窗口内提前刷新）
+            expires_at = self._get_credential_expiry(account)
+            if expires_at is not None:
+                remaining = (expires_at - datetime.now()).total_seconds()
+
+                if remaining <= 0:
+                    print(f"[AccountPool] {account_note} 凭证已过期 {-remaining / 3600:.1f}h，尝试刷新...")
+                    success = await self._try_refresh(i, account_note)
+
+                    if not success:
+                        should_delete = True
+                        delete_reason = f"凭证过期且刷新失败"
+                elif remaining < self.CREDENTIAL_REFRESH_AHEAD_SECONDS:
+                    # 旧凭证仍然有效，提前刷新失败时继续使用，下次检查再试
+                    print(f"[AccountPool] {account_note} 凭证将在 {remaining / 60:.0f} 分钟后过期，提前刷新...")
+                    await self._try_refresh(i, account_note, count_failure=False)
 
             # 检查2: 刷新失败次数
             failures = self._refresh_failures.get(account_note, 0)
@@ -210,10 +212,40 @@ class AccountPoolService:
         if deleted_count > 0:
             print(f"[AccountPool] 健康检查完成，删除了 {deleted_count} 个账号")
 
-    async def _try_refresh(self, account_index: int, account_note: str) -> bool:
+    def _get_credential_expiry(self, account) -> Optional[datetime]:
+        """
+        获取凭证过期时间（本地时间）
+
+        __Secure-C_SES cookie 的过期时间与 refresh_time + CREDENTIAL_EXPIRE_HOURS
+        都存在时取较早者，只有其一时使用该值
+        """
+        candidates = []
+        for value, ttl in (
+            (account.expires_at, timedelta(0)),
+            (account.refresh_time, timedelta(hours=self.CREDENTIAL_EXPIRE_HOURS)),
+        ):
+            if not value:
+                continue
+            try:
+                # 处理时区：统一转换为本地时间比较
+                dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                # 如果有时区信息，转换为本地时间
+                if dt.tzinfo is not None:
+                    dt = dt.replace(tzinfo=None)
+                candidates.append(dt + ttl)
+            except Exception as e:
+                logger.warning(f"解析凭证时间失败: {value}: {e}")
+        return min(candidates) if candidates else None
+
+    async def _try_refresh(self, account_index: int, account_note: str, count_failure: bool = True) -> bool:
         """
         尝试刷新账号凭证
 
+        Args:
+            account_index: 账号索引
+            account_note: 账号备注
+            count_failure: 失败时是否计入刷新失败次数（提前刷新时旧凭证仍可用，不计入）
+
         Returns:
             True 如果刷新成功
         """
@@ -226,12 +258,14 @@ class AccountPoolService:
                 return True
             else:
                 print(f"[AccountPool] {account_note} 刷新失败: {error}")
-                self._refresh_failures[account_note] = self._refresh_failures.get(account_note, 0) + 1
+                if count_failure:
+                    self._refresh_failures[account_note] = self._refresh_failures.get(account_note, 0) + 1
                 return False
 
         except Exception as e:
             logger.error(f"刷新账号 {account_note} 出错: {e}")
-            self._refresh_failures[account_note] = self._refresh_failures.get(account_note, 0) + 1
+            if count_failure:
+                self._refresh_failures[account_note] = self._refresh_failures.get(account_note, 0) + 1
             return False
 
     async def _replenish_accounts(self):
@@ -4,9 +4,13 @@ YesCaptcha 打码服务
 用于解决 Google reCAPTCHA v3 验证，提高验证码发送成功率
 """
 import asyncio
+import base64
+import json
 import logging
 import re
-from typing import Optional, Tuple
+import time
+from collections import deque
+from typing import List, Optional, Tuple
 
 import httpx
 
@@ -21,9 +25,68 @@ RECAPTCHA_WEBSITE_KEY = "6Ld8dCcrAAAAAFVbDMVZy8aNRwCjakBVaDEdRUH8"
 RECAPTCHA_WEBSITE_URL = "https://accountverification.business.gemini.google"
 RECAPTCHA_PAGE_ACTION = "verify_oob_code"
 
+# 同时进行的打码任务上限（与 YesCaptcha 套餐并发数保持一致）
+YESCAPTCHA_MAX_CONCURRENT = 3
+
+# 请求体为预先序列化的 JSON
+JSON_HEADERS = {"content-type": "application/json"}
+
+# 重发拦截请求时去掉的头部：长度按新请求体重新计算，host 和 cookie 由 APIRequestContext 生成
+# （HTTP/2 伪头部 ":authority" 等另行过滤）
+REPLAY_DROP_HEADERS = frozenset({"content-length", "host", "cookie"})
+
+# 结果轮询间隔（秒）：无历史耗时参考时从最小值开始指数退避
+POLL_MIN_INTERVAL = 1.0
+POLL_MAX_INTERVAL = 10.0
+
+# 预取 token 池：token 有效期约 2 分钟，留出余量按 110 秒过期处理
+# 预取会在空闲时持续消耗打码额度，默认关闭，需通过配置显式开启
+TOKEN_POOL_SIZE = 0
+TOKEN_POOL_TTL = 110
+# 超过此时间没有请求则停止后台预取，避免空耗打码额度
+TOKEN_POOL_IDLE_TIMEOUT = 300
+
 # Token 正则匹配（用于替换请求中的 captcha token）
 CAPTCHA_TOKEN_PATTERN = re.compile(r'0[3c]AFc[a-zA-Z0-9_\-]{50,}')
 
+# batchexecute 响应中需要关注的标记（均为 ASCII，直接在原始字节上匹配）及对应动作
+RESPONSE_MARKERS = {
+    b"LookupVerifiedEmail": "code_sent",
+    b"SendVerificationCode": "code_sent",
+    b"CAPTCHA_CHECK_FAILED": "captcha_failed",
+    b"inner_api_status": "handled",
+}
+# 同一响应命中多个标记时按此优先级处理
+RESPONSE_ACTION_PRIORITY = ("code_sent", "captcha_failed", "handled")
+
+# 标记位于 batchexecute 响应开头的 JSON 前缀中，只扫描前 512KB，限制超大响应的最坏耗时
+RESPONSE_SCAN_LIMIT = 512 * 1024
+
+# 所有标记合并为一个交替模式，一次扫描即可找出全部标记
+RESPONSE_MARKER_PATTERN = re.compile(b"|".join(re.escape(m) for m in RESPONSE_MARKERS))
+
+
+def classify_response(body: bytes) -> Optional[str]:
+    """
+    单次扫描响应体，返回优先级最高的动作
+
+    命中最高优先级的标记后立即停止扫描
+
+    Args:
+        body: 原始响应体（未解码）
+
+    Returns:
+        动作名称，未命中任何标记返回 None
+    """
+    best = None
+    for match in RESPONSE_MARKER_PATTERN.finditer(body):
+        action = RESPONSE_MARKERS[match.group()]
+        if action == RESPONSE_ACTION_PRIORITY[0]:
+            return action
+        if best is None or RESPONSE_ACTION_PRIORITY.index(action) < RESPONSE_ACTION_PRIORITY.index(best):
+            best = action
+    return best
+
 
 class YesCaptchaService:
     """
@@ -33,15 +96,37 @@ class YesCaptchaService:
     使用 YesCaptcha 获取有效的 reCAPTCHA v3 token 来绕过检测
     """
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrent: int = YESCAPTCHA_MAX_CONCURRENT,
+        pool_size: int = TOKEN_POOL_SIZE
+    ):
         """
         初始化服务
 
         Args:
             api_key: YesCaptcha API 密钥
+            max_concurrent: 最大并发打码任务数
+            pool_size: 预取 token 池大小（0 表示不预取）
         """
         self.api_key = api_key
         self._client: Optional[httpx.AsyncClient] = None
+        # 限制同时进行的打码任务数，多个页面共享同一服务实例时并行打码
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        # 预取的 token 池：[(token, expires_at), ...]，按获取顺序排列
+        self._pool_size = max(0, pool_size)
+        self._token_pool: deque = deque()
+        self._prefetch_task: Optional[asyncio.Task] = None
+        # 当前的预取打码任务，以及它的结果是否已被请求认领或放入池中
+        self._prefetch_solve: Optional[asyncio.Task] = None
+        self._prefetch_claimed = False
+        self._last_demand = 0.0
+        # 最近打码耗时的滑动平均（秒），用于预估下一次轮询时机
+        self._avg_solve_time: Optional[float] = None
+        # 预先序列化的请求体（默认验证页面的 createTask 在首次使用时生成）
+        self._default_create_body: Optional[bytes] = None
+        self._result_body_prefix = b'{"clientKey":' + json.dumps(api_key).encode() + b',"taskId":'
 
     async def _get_client(self) -> httpx.AsyncClient:
         """获取 HTTP 客户端"""
@@ -51,6 +136,17 @@ class YesCaptchaService:
 
     async def close(self):
         """关闭客户端"""
+        if self._prefetch_task and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+            try:
+                await self._prefetch_task
+            except asyncio.CancelledError:
+                pass
+        self._prefetch_task = None
+        if self._prefetch_solve and not self._prefetch_solve.done():
+            self._prefetch_solve.cancel()
+        self._prefetch_solve = None
+        self._token_pool.clear()
         if self._client:
             await self._client.aclose()
             self._client = None
@@ -78,94 +174,257 @@ class YesCaptchaService:
             logger.warning("YesCaptcha API key 未配置")
             return None
 
+        # 默认验证页面的 token 可以预取，优先从池中直接取用
+        if self._pool_size and (website_url, website_key, page_action) == (
+            RECAPTCHA_WEBSITE_URL, RECAPTCHA_WEBSITE_KEY, RECAPTCHA_PAGE_ACTION
+        ):
+            self._last_demand = asyncio.get_running_loop().time()
+            self._ensure_prefetch()
+            token = self._pop_pooled_token()
+            if token:
+                logger.info("YesCaptcha 使用预取的 token")
+                return token
+
+            # 池为空时等待预取中的打码结果，不再另外发起一次付费打码
+            solve = self._claim_prefetch_solve()
+            if solve:
+                try:
+                    token = await asyncio.shield(solve)
+                except asyncio.CancelledError:
+                    # 请求被取消，结果留给预取任务放入池中
+                    self._prefetch_claimed = False
+                    raise
+                if token:
+                    logger.info("YesCaptcha 使用预取中的 token")
+                    return token
+
+        async with self._semaphore:
+            return await self._solve_captcha_token(website_url, website_key, page_action, max_wait)
+
+    def _pop_pooled_token(self) -> Optional[str]:
+        """从池中取出一个未过期的 token"""
+        now = asyncio.get_running_loop().time()
+        while self._token_pool:
+            token, expires_at = self._token_pool.popleft()
+            if expires_at > now:
+                return token
+        return None
+
+    def _ensure_prefetch(self):
+        """确保后台预取任务在运行"""
+        if self._prefetch_task is None or self._prefetch_task.done():
+            self._prefetch_task = asyncio.create_task(self._prefetch_loop())
+
+    def _start_prefetch_solve(self) -> asyncio.Task:
+        """返回进行中的预取打码任务，没有时发起一个新的"""
+        if self._prefetch_solve is None or self._prefetch_solve.done():
+            self._prefetch_solve = asyncio.create_task(self._solve_default_token())
+            self._prefetch_claimed = False
+        return self._prefetch_solve
+
+    def _claim_prefetch_solve(self) -> Optional[asyncio.Task]:
+        """
+        认领预取打码任务的结果
+
+        结果尚未被认领时直接认领；已被认领且仍在进行时返回 None，
+        由调用方自行打码；否则发起一个新的预取打码并认领
+        """
+        solve = self._prefetch_solve
+        if solve is None or self._prefetch_claimed:
+            if solve is not None and not solve.done():
+                return None
+            solve = self._start_prefetch_solve()
+        self._prefetch_claimed = True
+        return solve
+
+    async def _solve_default_token(self) -> Optional[str]:
+        """为默认验证页面打码（预取使用）"""
+        async with self._semaphore:
+            return await self._solve_captcha_token(
+                RECAPTCHA_WEBSITE_URL, RECAPTCHA_WEBSITE_KEY, RECAPTCHA_PAGE_ACTION, 60
+            )
+
+    async def _prefetch_loop(self):
+        """后台保持 token 池填满，空闲一段时间后自动退出"""
+        loop = asyncio.get_running_loop()
+        while loop.time() - self._last_demand < TOKEN_POOL_IDLE_TIMEOUT:
+            # 丢弃已过期的 token
+            now = loop.time()
+            while self._token_pool and self._token_pool[0][1] <= now:
+                self._token_pool.popleft()
+
+            if len(self._token_pool) >= self._pool_size:
+                await asyncio.sleep(5)
+                continue
+
+            token = await asyncio.shield(self._start_prefetch_solve())
+
+            if token:
+                # 已被等待中的请求取走的 token 不再放入池中
+                if not self._prefetch_claimed:
+                    self._prefetch_claimed = True
+                    self._token_pool.append((token, loop.time() + TOKEN_POOL_TTL))
+            else:
+                # 打码失败时稍后再试，避免连续消耗额度
+                await asyncio.sleep(10)
+
+    async def get_many(self, n: int, **kwargs) -> List[Optional[str]]:
+        """
+        并行获取多个 reCAPTCHA v3 token
+
+        Args:
+            n: 需要的 token 数量
+            **kwargs: 传递给 get_captcha_token 的参数
+
+        Returns:
+            token 列表，失败的位置为 None
+        """
+        if n <= 0:
+            return []
+        return list(await asyncio.gather(
+            *(self.get_captcha_token(**kwargs) for _ in range(n))
+        ))
+
+    async def _solve_captcha_token(
+        self,
+        website_url: str,
+        website_key: str,
+        page_action: str,
+        max_wait: int
+    ) -> Optional[str]:
+        """创建打码任务并轮询结果（内部方法）"""
         client = await self._get_client()
 
         try:
-            print(f"  [YesCaptcha] 正在请求 reCAPTCHA v3 token...")
             logger.info(f"请求 YesCaptcha: website={website_url}, action={page_action}")
 
             # 创建任务
             create_response = await client.post(
                 YESCAPTCHA_CREATE_TASK_URL,
-                json={
-                    "clientKey": self.api_key,
-                    "task": {
-                        "websiteURL": website_url,
-                        "websiteKey": website_key,
-                        "pageAction": page_action,
-                        "type": "RecaptchaV3TaskProxylessM1"
-                    }
-                }
+                content=self._create_task_body(website_url, website_key, page_action),
+                headers=JSON_HEADERS
             )
 
             create_data = create_response.json()
 
             if create_data.get("errorId"):
                 error_msg = create_data.get("errorDescription", "未知错误")
-                print(f"  [YesCaptcha] 创建任务失败: {error_msg}")
                 logger.error(f"YesCaptcha 创建任务失败: {error_msg}")
                 return None
 
             task_id = create_data.get("taskId")
             if not task_id:
-                print(f"  [YesCaptcha] 未获取到任务 ID")
                 logger.error("YesCaptcha 未返回 taskId")
                 return None
 
-            print(f"  [YesCaptcha] 任务已创建: {task_id}")
+            logger.info(f"YesCaptcha 任务已创建: {task_id}")
 
-            # 轮询获取结果
-            poll_interval = 3  # 每 3 秒查询一次
-            max_polls = max_wait // poll_interval
-
-            for i in range(max_polls):
-                await asyncio.sleep(poll_interval)
+            # 轮询获取结果：创建后立即查询一次，未就绪再按自适应间隔等待
+            result_body = self._result_body_prefix + json.dumps(task_id).encode() + b"}"
+            started = time.monotonic()
+            delay = None
+            last_status = None
 
+            while True:
                 result_response = await client.post(
                     YESCAPTCHA_GET_RESULT_URL,
-                    json={
-                        "clientKey": self.api_key,
-                        "taskId": task_id
-                    }
+                    content=result_body,
+                    headers=JSON_HEADERS
                 )
 
                 result_data = result_response.json()
 
                 if result_data.get("errorId"):
                     error_msg = result_data.get("errorDescription", "未知错误")
-                    print(f"  [YesCaptcha] 获取结果失败: {error_msg}")
                     logger.error(f"YesCaptcha 获取结果失败: {error_msg}")
                     return None
 
                 status = result_data.get("status")
+                # 状态发生变化说明任务有进展，下一次立即恢复最短轮询间隔
+                progressed = last_status is not None and status != last_status
+                last_status = status
 
                 if status == "ready":
                     token = result_data.get("solution", {}).get("gRecaptchaResponse")
                     if token:
-                        print(f"  [YesCaptcha] Token 获取成功!")
+                        self._record_solve_time(time.monotonic() - started)
                         logger.info(f"YesCaptcha token 获取成功，长度: {len(token)}")
                         return token
                     else:
-                        print(f"  [YesCaptcha] 结果中无 token")
+                        logger.warning("YesCaptcha 结果中无 token")
                         return None
 
                 elif status == "processing":
-                    if (i + 1) % 5 == 0:
-                        print(f"  [YesCaptcha] 处理中... [{(i+1) * poll_interval}/{max_wait}秒]")
-                    continue
+                    logger.debug(f"YesCaptcha 处理中... [{int(time.monotonic() - started)}/{max_wait}秒]")
 
                 else:
-                    print(f"  [YesCaptcha] 未知状态: {status}")
+                    logger.warning(f"YesCaptcha 未知状态: {status}")
+
+                elapsed = time.monotonic() - started
+                delay = POLL_MIN_INTERVAL if progressed else self._next_poll_delay(elapsed, delay)
+                delay = min(delay, max_wait - elapsed)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
 
-            print(f"  [YesCaptcha] 获取 token 超时 ({max_wait}秒)")
-            logger.warning(f"YesCaptcha 获取 token 超时")
+            logger.warning(f"YesCaptcha 获取 token 超时 ({max_wait}秒)")
             return None
 
         except Exception as e:
-            print(f"  [YesCaptcha] 请求出错: {e}")
             logger.error(f"YesCaptcha 请求出错: {e}")
             return None
 
+    def _create_task_body(self, website_url: str, website_key: str, page_action: str) -> bytes:
+        """
+        生成 createTask 请求体
+
+        默认验证页面的请求体内容固定，只序列化一次
+        """
+        is_default = (website_url, website_key, page_action) == (
+            RECAPTCHA_WEBSITE_URL, RECAPTCHA_WEBSITE_KEY, RECAPTCHA_PAGE_ACTION
+        )
+        if is_default and self._default_create_body is not None:
+            return self._default_create_body
+
+        body = json.dumps({
+            "clientKey": self.api_key,
+            "task": {
+                "websiteURL": website_url,
+                "websiteKey": website_key,
+                "pageAction": page_action,
+                "type": "RecaptchaV3TaskProxylessM1"
+            }
+        }).encode()
+        if is_default:
+            self._default_create_body = body
+        return body
+
+    def _next_poll_delay(self, elapsed: float, last_delay: Optional[float]) -> float:
+        """
+        计算下一次查询结果前的等待时间
+
+        有历史耗时时按预估剩余时间等待，否则指数退避
+
+        Args:
+            elapsed: 任务创建后已经过的时间（秒）
+            last_delay: 上一次的等待时间，首次为 None
+
+        Returns:
+            等待时间（秒）
+        """
+        if self._avg_solve_time is not None:
+            return max(POLL_MIN_INTERVAL, min(self._avg_solve_time - elapsed, POLL_MAX_INTERVAL))
+        if last_delay is None:
+            return POLL_MIN_INTERVAL
+        return min(last_delay * 2, POLL_MAX_INTERVAL)
+
+    def _record_solve_time(self, solve_time: float):
+        """更新打码耗时的滑动平均"""
+        if self._avg_solve_time is None:
+            self._avg_solve_time = solve_time
+        else:
+            self._avg_solve_time = 0.7 * self._avg_solve_time + 0.3 * solve_time
+
     def patch_payload(self, raw_body: str, new_token: str) -> str:
         """
         替换请求体中的 captcha token
@@ -180,38 +439,23 @@ class YesCaptchaService:
         if not raw_body or not new_token:
             return raw_body
 
-        try:
-            from urllib.parse import parse_qs, urlencode
-
-            # 解析 URL 编码的请求体
-            params = parse_qs(raw_body, keep_blank_values=True)
-
-            f_req = params.get("f.req", [""])[0]
-            if not f_req:
-                return raw_body
+        # token 只包含 URL 安全字符，直接在编码后的 f.req 字段上替换，
+        # 不需要解码再重新编码整个请求体
+        parts = raw_body.split("&")
+        for i, part in enumerate(parts):
+            if not part.startswith("f.req="):
+                continue
 
             # 检查是否包含 captcha token
-            if not CAPTCHA_TOKEN_PATTERN.search(f_req):
+            if not CAPTCHA_TOKEN_PATTERN.search(part):
                 logger.warning("请求体中未找到 captcha token")
                 return raw_body
 
             # 替换 token
-            patched_f_req = CAPTCHA_TOKEN_PATTERN.sub(new_token, f_req)
-
-            # 重新编码
-            params["f.req"] = [patched_f_req]
-
-            # 构建新的请求体
-            result_parts = []
-            for key, values in params.items():
-                for value in values:
-                    result_parts.append(f"{key}={value}")
-
-            return "&".join(result_parts)
+            parts[i] = CAPTCHA_TOKEN_PATTERN.sub(lambda _: new_token, part)
+            return "&".join(parts)
 
-        except Exception as e:
-            logger.error(f"替换 token 失败: {e}")
-            return raw_body
+        return raw_body
 
 
 class CaptchaInterceptor:
@@ -231,109 +475,263 @@ class CaptchaInterceptor:
         """
         self.page = page
         self.captcha_service = captcha_service
-        self._code_sent = asyncio.Event()
-        self._captcha_handled = asyncio.Event()
-        self._last_batch_request = None  # 保存最后一次 batchexecute 请求
+        loop = asyncio.get_running_loop()
+        # 由 _on_response 直接完成的 Future，等待方无需再包一层 Event.wait()
+        self._code_sent: asyncio.Future = loop.create_future()
+        self._captcha_handled: asyncio.Future = loop.create_future()
+        # 最后一次 batchexecute 请求（Playwright Request 对象或 CDP 事件参数）
+        self._last_batch_request = None
+        self._cdp = None  # CDP 会话（不可用时回退到页面事件监听）
+        self._batch_post_ids: set = set()  # 已发出、尚未收到响应头的 batchexecute POST 请求
+        self._pending_body_ids: set = set()  # 等待响应体接收完成的请求
+        # 响应动作分发表
+        self._marker_actions = {
+            "code_sent": self._on_code_sent,
+            "captcha_failed": self._on_captcha_failed,
+            "handled": self._on_api_status,
+        }
+        self._captcha_task: Optional[asyncio.Task] = None  # 进行中的打码重试任务
+        self._monitoring = False  # 网络事件监听是否已挂载
 
     async def start_monitoring(self):
         """开始监控网络响应"""
+        # 优先直接订阅 CDP 网络事件：只有 batchexecute 请求会进入后续处理，
+        # 不再为页面上每个请求/响应构造 Playwright 对象
+        try:
+            cdp = await self.page.context.new_cdp_session(self.page)
+            await cdp.send("Network.enable")
+            cdp.on("Network.requestWillBeSent", self._cdp_on_request)
+            cdp.on("Network.responseReceived", self._cdp_on_response)
+            cdp.on("Network.loadingFinished", self._cdp_on_loading_finished)
+            self._cdp = cdp
+            self._monitoring = True
+            logger.info("拦截器开始监控网络响应 (CDP)")
+            return
+        except Exception as e:
+            logger.debug(f"无法创建 CDP 会话，改用页面事件监听: {e}")
+            self._cdp = None
+
         self.page.on("response", self._on_response)
         self.page.on("request", self._on_request)
-        print(f"  [拦截器] 开始监控网络响应...")
+        self._monitoring = True
+        logger.info("拦截器开始监控网络响应")
+
+    @property
+    def is_monitoring(self) -> bool:
+        """网络事件监听是否仍在运行（检测到验证码发送后会自动取消订阅）"""
+        return self._monitoring
 
     def stop_monitoring(self):
         """停止监控"""
-        try:
-            self.page.remove_listener("response", self._on_response)
-            self.page.remove_listener("request", self._on_request)
-        except:
-            pass
+        self._detach_listeners()
+        if self._captcha_task and not self._captcha_task.done():
+            self._captcha_task.cancel()
+        self._captcha_task = None
+
+    def _detach_listeners(self):
+        """取消网络事件订阅"""
+        self._monitoring = False
+        if self._cdp:
+            cdp, self._cdp = self._cdp, None
+            cdp.remove_all_listeners()
+            detach_task = asyncio.ensure_future(cdp.detach())
+            detach_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            try:
+                self.page.remove_listener("response", self._on_response)
+                self.page.remove_listener("request", self._on_request)
+            except:
+                pass
+        self._batch_post_ids.clear()
+        self._pending_body_ids.clear()
+
+    @staticmethod
+    def _is_relevant_status(status: int) -> bool:
+        """
+        标记只会出现在 2xx / 400 响应中，重定向和其他错误响应直接跳过，
+        避免为无关响应多一次获取响应体的往返
+        """
+        return status < 300 or status == 400
 
     async def _on_request(self, request):
         """记录 batchexecute 请求"""
-        url = request.url
-        if "batchexecute" in url:
-            self._last_batch_request = {
-                "url": url,
-                "headers": request.headers,
-                "post_data": request.post_data
-            }
+        # 只保存请求对象引用，headers / post_data 等到真正需要重发时再读取
+        if "batchexecute" in request.url:
+            self._last_batch_request = request
 
     async def _on_response(self, response):
-        """处理网络响应"""
-        url = response.url
+        """处理网络响应（页面事件监听模式）"""
+        if self._code_sent.done() or "batchexecute" not in response.url:
+            return
 
-        if "batchexecute" not in url:
+        # 先用无需读取响应体的元数据过滤
+        if not self._is_relevant_status(response.status) or response.request.method != "POST":
             return
 
         try:
-            text = await response.text()
-
-            # 检测验证码发送成功
-            if "LookupVerifiedEmail" in text or "SendVerificationCode" in text:
-                print(f"  [拦截器] 检测到验证码发送成功!")
-                self._code_sent.set()
-                return
+            # 标记均为 ASCII，直接扫描原始字节，省去整段 UTF-8 解码
+            body = await response.body()
+            await self._handle_response_body(body)
+        except Exception as e:
+            logger.debug(f"处理响应时出错: {e}")
 
-            # 检测 CAPTCHA 拦截
-            if "CAPTCHA_CHECK_FAILED" in text:
-                print(f"  [拦截器] 检测到 CAPTCHA 拦截，开始打码...")
-                await self._handle_captcha_failure()
-                return
+    def _cdp_on_request(self, params: dict):
+        """记录 batchexecute 请求（CDP 模式）"""
+        request = params.get("request", {})
+        if "batchexecute" not in request.get("url", ""):
+            return
+        # 保存事件参数本身（已由 Playwright 解析好），重发时再从中取字段
+        self._last_batch_request = params
+        if request.get("method") == "POST":
+            self._batch_post_ids.add(params["requestId"])
+
+    def _cdp_on_response(self, params: dict):
+        """响应头到达时按元数据过滤（CDP 模式）"""
+        request_id = params.get("requestId")
+        if request_id not in self._batch_post_ids:
+            return
+        self._batch_post_ids.discard(request_id)
+        if not self._code_sent.done() and self._is_relevant_status(params.get("response", {}).get("status", 0)):
+            # 响应体要等 loadingFinished 之后才能读取
+            self._pending_body_ids.add(request_id)
+
+    async def _cdp_on_loading_finished(self, params: dict):
+        """响应体接收完成后读取并扫描（CDP 模式）"""
+        request_id = params.get("requestId")
+        if request_id not in self._pending_body_ids:
+            return
+        self._pending_body_ids.discard(request_id)
 
-            # 其他成功响应
-            if "inner_api_status" in text:
-                self._captcha_handled.set()
+        cdp = self._cdp
+        if not cdp:
+            return
 
+        try:
+            result = await cdp.send("Network.getResponseBody", {"requestId": request_id})
+            body = result.get("body", "")
+            if result.get("base64Encoded"):
+                body = base64.b64decode(body)
+            else:
+                body = body.encode("utf-8")
+            await self._handle_response_body(body)
         except Exception as e:
             logger.debug(f"处理响应时出错: {e}")
 
+    async def _handle_response_body(self, body: bytes):
+        """扫描 batchexecute 响应体并分发处理"""
+        # 验证码已发送后不再需要关注任何标记
+        if self._code_sent.done():
+            return
+
+        if len(body) > RESPONSE_SCAN_LIMIT:
+            body = body[:RESPONSE_SCAN_LIMIT]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"batchexecute 响应: {body[:200].decode('utf-8', errors='replace')}")
+
+        action = classify_response(body)
+        if action:
+            self._marker_actions[action]()
+
+    def _on_code_sent(self):
+        """检测到验证码发送成功"""
+        logger.info("拦截器检测到验证码发送成功")
+        self._mark_done(self._code_sent)
+        # 之后的网络流量都与拦截器无关，直接取消订阅
+        self._detach_listeners()
+
+    def _on_captcha_failed(self):
+        """检测到 CAPTCHA 拦截"""
+        # 打码耗时较长，放到后台任务中执行，不阻塞后续响应的处理
+        if self._captcha_task and not self._captcha_task.done():
+            return
+        logger.info("拦截器检测到 CAPTCHA 拦截，开始打码")
+        self._captcha_task = asyncio.create_task(self._handle_captcha_failure())
+
+    def _on_api_status(self):
+        """其他成功响应"""
+        self._mark_done(self._captcha_handled)
+
+    async def _read_last_batch_request(self) -> Tuple[str, dict, str]:
+        """
+        读取最后一次 batchexecute 请求的 url / headers / 请求体
+
+        Returns:
+            (url, headers, post_data) 元组
+        """
+        request = self._last_batch_request
+        if isinstance(request, dict):
+            # CDP Network.requestWillBeSent 事件参数
+            info = request["request"]
+            post_data = info.get("postData")
+            if post_data is None and info.get("hasPostData") and self._cdp:
+                result = await self._cdp.send(
+                    "Network.getRequestPostData", {"requestId": request["requestId"]}
+                )
+                post_data = result.get("postData")
+            return info["url"], info.get("headers", {}), post_data or ""
+        return request.url, request.headers, request.post_data or ""
+
+    @staticmethod
+    def _replay_headers(headers: dict) -> dict:
+        """过滤原始请求头，只保留可以交给 APIRequestContext 重发的部分"""
+        return {
+            name: value for name, value in headers.items()
+            if not name.startswith(":") and name.lower() not in REPLAY_DROP_HEADERS
+        }
+
     async def _handle_captcha_failure(self):
         """处理 CAPTCHA 拦截"""
         if not self._last_batch_request:
-            print(f"  [拦截器] 未找到原始请求，无法重试")
+            logger.warning("拦截器未找到原始请求，无法重试")
             return
 
         # 获取新的 captcha token
         new_token = await self.captcha_service.get_captcha_token()
         if not new_token:
-            print(f"  [拦截器] 获取 token 失败")
+            logger.warning("拦截器获取 token 失败")
             return
 
         # 替换请求中的 token
-        original_post_data = self._last_batch_request.get("post_data", "")
+        url, headers, original_post_data = await self._read_last_batch_request()
         patched_post_data = self.captcha_service.patch_payload(original_post_data, new_token)
 
         if patched_post_data == original_post_data:
-            print(f"  [拦截器] Token 替换失败")
+            logger.warning("拦截器 Token 替换失败")
             return
 
         # 重发请求
-        url = self._last_batch_request["url"]
-        headers = self._last_batch_request["headers"]
-
-        print(f"  [拦截器] 正在重发带 token 的请求...")
+        logger.info("拦截器正在重发带 token 的请求")
 
         try:
-            # 在页面中执行 fetch 重发请求
-            await self.page.evaluate(
-                """
-                async ([url, headers, body]) => {
-                    await fetch(url, {
-                        method: 'POST',
-                        headers: headers,
-                        body: body,
-                        credentials: 'include'
-                    });
-                }
-                """,
-                [url, headers, patched_post_data]
+            # 通过页面所属上下文的 APIRequestContext 重发（共享 cookie），无需在页面里执行脚本
+            response = await self.page.request.post(
+                url, headers=self._replay_headers(headers), data=patched_post_data
             )
-            print(f"  [拦截器] 请求已重发!")
-            self._captcha_handled.set()
+            logger.info("拦截器请求已重发")
+            # APIRequestContext 发出的请求不会触发页面网络事件，直接检查重发结果
+            await self._handle_response_body(await response.body())
+            self._mark_done(self._captcha_handled)
 
         except Exception as e:
-            print(f"  [拦截器] 重发请求失败: {e}")
+            logger.error(f"拦截器重发请求失败: {e}")
+
+    @staticmethod
+    def _mark_done(future: asyncio.Future):
+        """完成状态 Future（已完成则忽略）"""
+        if not future.done():
+            future.set_result(True)
+
+    @staticmethod
+    async def _wait_future(future: asyncio.Future, timeout: float) -> bool:
+        """等待状态 Future 完成，超时不会取消该 Future"""
+        if future.done():
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
 
     async def wait_for_code_sent(self, timeout: float = 30) -> bool:
         """
@@ -345,11 +743,7 @@ class CaptchaInterceptor:
         Returns:
             是否成功
         """
-        try:
-            await asyncio.wait_for(self._code_sent.wait(), timeout=timeout)
-            return True
-        except asyncio.TimeoutError:
-            return False
+        return await self._wait_future(self._code_sent, timeout)
 
     async def wait_for_captcha_handled(self, timeout: float = 60) -> bool:
         """
@@ -361,18 +755,23 @@ class CaptchaInterceptor:
         Returns:
             是否成功
         """
-        try:
-            await asyncio.wait_for(self._captcha_handled.wait(), timeout=timeout)
-            return True
-        except asyncio.TimeoutError:
-            return False
+        return await self._wait_future(self._captcha_handled, timeout)
 
     def is_code_sent(self) -> bool:
         """验证码是否已发送"""
-        return self._code_sent.is_set()
+        return self._code_sent.done()
 
     def reset(self):
-        """重置状态"""
-        self._code_sent.clear()
-        self._captcha_handled.clear()
+        """
+        重置单次尝试的状态，并取消进行中的打码重试
+
+        不会重新挂载网络监听：检测到验证码发送后监听已被取消，
+        复用前需检查 is_monitoring 并重新调用 start_monitoring()
+        """
+        if self._captcha_task and not self._captcha_task.done():
+            self._captcha_task.cancel()
+        self._captcha_task = None
+        loop = asyncio.get_running_loop()
+        self._code_sent = loop.create_future()
+        self._captcha_handled = loop.create_future()
         self._last_batch_request = None
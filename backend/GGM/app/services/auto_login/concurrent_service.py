@@ -7,14 +7,88 @@ import asyncio
 import re
 import random
 import logging
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any, List, Set
+from email.header import decode_header
+from email.parser import BytesParser
+from email.policy import compat32
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, List, Deque, Tuple
 from urllib.parse import urlparse, parse_qs
 
 from app.config import AccountConfig, config_manager
+from .service import (
+    GoogleAutoLogin, _safe_goto, _handle_trial_signup_page,
+    _dismiss_welcome_dialog, _wait_for_page_settled
+)
+from .human_behavior import HumanBehavior, PAGE_STEALTH_SCRIPT
+from .captcha_service import YesCaptchaService, CaptchaInterceptor
+from .email_service import KEYWORDLESS_CODE_PATTERN, _check_keyword_prefilter
+
+try:
+    import aioimaplib
+except ImportError:
+    aioimaplib = None
+
+# 可选：selectolax（lexbor 后端，C 实现的 HTML 解析器）用于提取 HTML 正文文本
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
 
 logger = logging.getLogger(__name__)
 
+# 邮箱地址与 HTML 标签正则（预编译，避免每封邮件重复查找缓存）
+# re.ASCII：地址只取 ASCII 字符，紧贴中文的地址（如"账号user@a.com"）不会把中文并入
+_EMAIL_RE = re.compile(r'[\w\.\-\+]+@[\w\.\-]+\.\w+', re.ASCII)
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+# FETCH 响应行头，如 b'12 FETCH (UID 345 RFC822 {6789}'
+_FETCH_LINE_RE = re.compile(rb'^\d+ FETCH \(')
+_FETCH_UID_RE = re.compile(rb'\bUID (\d+)')
+# FETCH 响应中字面量所属的段，如 b' BODY[TEXT] {1234}'
+_FETCH_SECTION_RE = re.compile(rb'BODY\[(TEXT|HEADER[^\]]*)\]\s*\{\d+\}\s*$')
+# SELECT 响应中的 UIDNEXT，如 b'OK [UIDNEXT 1234] Predicted next UID'
+_UIDNEXT_RE = re.compile(rb'\[UIDNEXT (\d+)\]')
+
+# Google 验证邮件发件人
+GOOGLE_SENDER = "noreply-googlecloud@google.com"
+# 转发邮箱域名：收件人是这些域名时，真正的目标邮箱在正文里
+FORWARDING_DOMAINS = ("qq.com", "163.com", "126.com")
+# 从正文提取目标邮箱时排除的常见转发/发送方域名
+EXCLUDED_TARGET_DOMAINS = frozenset({
+    'qq.com', '163.com', '126.com', 'gmail.com',
+    'google.com', 'googlemail.com', 'outlook.com', 'hotmail.com'
+})
+
+# 单次 FETCH 最多包含的邮件数
+FETCH_BATCH_SIZE = 100
+# 只取路由和解析需要的头部 + 正文，BODY.PEEK 不会把邮件标记为已读
+# Content-Type/Content-Transfer-Encoding 用于解析多段正文（boundary、编码）
+FETCH_HEADER_FIELDS = (
+    "FROM TO X-ORIGINAL-TO DELIVERED-TO DATE SUBJECT "
+    "MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING"
+)
+FETCH_MESSAGE_PARTS = f"(BODY.PEEK[HEADER.FIELDS ({FETCH_HEADER_FIELDS})] BODY.PEEK[TEXT])"
+# 邮件解析线程数
+PARSE_WORKERS = 4
+
+# 服务器不支持 IDLE 时的轮询间隔（秒）
+POLL_INTERVAL = 2
+# 轮询状态日志间隔（秒）
+STATUS_LOG_INTERVAL = 60
+# IDLE 续期间隔（RFC 2177 建议 29 分钟内重新发起）
+IDLE_REFRESH_SECONDS = 25 * 60
+# IDLE 期间检查暂停/等待者变化的间隔（秒）
+IDLE_CHECK_INTERVAL = 5
+# 没有等待者时保持连接，每隔 KEEPALIVE_INTERVAL 秒 NOOP 一次，
+# 空闲超过 IDLE_DISCONNECT_SECONDS 秒才断开
+KEEPALIVE_INTERVAL = 60
+IDLE_DISCONNECT_SECONDS = 300
+
 
 class VerificationCodeHub:
     """
@@ -24,8 +98,8 @@ class VerificationCodeHub:
     每封验证邮件都有明确的收件人，用于匹配等待者。
     """
 
-    # 验证码正则模式（和 email_service.py 一致）
-    CODE_PATTERNS = [
+    # 验证码正则模式（和 email_service.py 一致，类加载时预编译）
+    CODE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
         # Google Business 验证码格式：验证码在单独一行
         r'一次性验\s*证码为[：:]\s*\n+\s*([A-Z0-9]{6})',
         r'验证码为[：:]\s*\n+\s*([A-Z0-9]{6})',
@@ -40,10 +114,20 @@ class VerificationCodeHub:
         r'verification code[：:\s]*([A-Z0-9]{6})',
         r'security code[：:\s]*([A-Z0-9]{6})',
         # 更宽松的模式：独立行的6位代码
-        r'\n\s*([A-Z0-9]{6})\s*\n',
+        KEYWORDLESS_CODE_PATTERN,
         # 尝试匹配任何被空白包围的6位验证码
         r'(?:验证码|code|Code)[^\d]*(\d{6})',
-    ]
+    ))
+    # 合并为单个交替正则：每个模式恰有一个捕获组，第 i 组对应第 i+1 个模式
+    CODE_ALTERNATION = re.compile(
+        "|".join(f"(?:{p.pattern})" for p in CODE_PATTERNS), re.IGNORECASE
+    )
+    # 快速预筛：除"独立行的6位代码"外，每个模式都包含以下关键词之一
+    CODE_KEYWORDS_CJK = ("验证", "证码")
+    CODE_KEYWORDS_ASCII = ("code", "g-")
+    KEYWORDLESS_PATTERN = CODE_PATTERNS[_check_keyword_prefilter(
+        [p.pattern for p in CODE_PATTERNS], CODE_KEYWORDS_CJK + CODE_KEYWORDS_ASCII
+    )]
 
     def __init__(self, email_config: dict):
         """
@@ -56,21 +140,38 @@ class VerificationCodeHub:
         self._imap_client = None
         self._running = False
         self._poll_task = None
+        # 邮件解析线程池（MIME 解析和正则匹配不占用事件循环）
+        self._parse_executor: Optional[ThreadPoolExecutor] = None
+        # 无状态的字节解析器，各解析线程共用
+        self._bytes_parser = BytesParser(policy=compat32)
 
         # 按目标邮箱存储验证码：{target_email_lower: [(code, timestamp), ...]}
-        self._codes_by_email: Dict[str, List[tuple]] = {}
+        # 按时间顺序追加，队首最旧
+        self._codes_by_email: Dict[str, Deque[Tuple[str, float]]] = {}
         # 后备队列（无法识别收件人时使用）
-        self._fallback_queue: List[tuple] = []
-        # 全局通知事件（有新验证码时通知所有等待者）
-        self._new_code_event = asyncio.Event()
-        # 已处理的邮件 UID
-        self._processed_uids: Set[int] = set()
-        # 锁
-        self._lock = asyncio.Lock()
+        self._fallback_queue: Deque[Tuple[str, float]] = deque()
+        # 等待者登记：{target_email_lower 或 None: deque[(future, since_ts)]}
+        # 新验证码直接交给匹配的等待者，不再广播唤醒所有人
+        self._waiters: Dict[Optional[str], Deque[Tuple[asyncio.Future, float]]] = {}
+        # 已处理邮件的最大 UID（水位线），之后只搜索更大的 UID
+        self._last_max_uid = 0
+        # SELECT 返回的 UIDNEXT，首次搜索时用于初始化水位线
+        self._uidnext_hint = 0
         # 等待者计数（用于日志）
         self._waiting_count = 0
         # 暂停标志（用于让其他服务使用 IMAP）
         self._paused = False
+        # 服务器拒绝 IDLE 后退回定时轮询
+        self._idle_supported = True
+        # IMAP 连接锁：轮询与 borrow_imap() 的借用者轮流使用同一连接
+        self._imap_lock = asyncio.Lock()
+        self._borrowers = 0
+        # 新等待者到达时唤醒空闲中的轮询循环
+        self._waiter_arrived = asyncio.Event()
+        # 最近一次有等待者/NOOP 的时间（monotonic）
+        self._last_active = 0.0
+        self._last_noop = 0.0
+        self._last_status_log = float("-inf")
 
     async def start(self):
         """启动验证码轮询"""
@@ -78,8 +179,11 @@ class VerificationCodeHub:
             return
 
         self._running = True
+        self._parse_executor = ThreadPoolExecutor(
+            max_workers=PARSE_WORKERS, thread_name_prefix="codehub-parse"
+        )
         self._poll_task = asyncio.create_task(self._poll_loop())
-        print(f"  [CodeHub] Started, polling every 2s")
+        logger.info(f"[CodeHub] Started, waiting via IMAP IDLE (fallback: polling every {POLL_INTERVAL}s)")
 
     async def stop(self):
         """停止轮询"""
@@ -91,36 +195,42 @@ class VerificationCodeHub:
             except asyncio.CancelledError:
                 pass
         await self._disconnect()
-        print(f"  [CodeHub] Stopped")
+        if self._parse_executor:
+            self._parse_executor.shutdown(wait=False)
+            self._parse_executor = None
+        logger.info("[CodeHub] Stopped")
 
     async def pause(self):
-        """暂停轮询（释放 IMAP 连接供其他服务使用）"""
+        """暂停轮询（释放 IMAP 连接供其他服务使用；需要共用连接时优先 borrow_imap()）"""
         if self._paused:
             return
         self._paused = True
-        await self._disconnect()
-        print(f"  [CodeHub] Paused - IMAP connection released")
+        async with self._imap_lock:
+            await self._disconnect()
+        logger.info("[CodeHub] Paused - IMAP connection released")
 
     async def resume(self):
         """恢复轮询"""
         if not self._paused:
             return
         self._paused = False
-        print(f"  [CodeHub] Resumed")
+        logger.info("[CodeHub] Resumed")
 
     async def _connect(self):
         """连接 IMAP"""
         if self._imap_client:
             return True
 
-        try:
-            import aioimaplib
+        if aioimaplib is None:
+            logger.error("[CodeHub] aioimaplib not installed: pip install aioimaplib")
+            return False
 
+        try:
             imap_server = self.email_config.get("imap_server", "imap.qq.com")
             imap_port = self.email_config.get("imap_port", 993)
             address = self.email_config.get("address", "")
 
-            print(f"  [CodeHub] Connecting to {imap_server}:{imap_port} as {address}...")
+            logger.info(f"[CodeHub] Connecting to {imap_server}:{imap_port} as {address}...")
 
             self._imap_client = aioimaplib.IMAP4_SSL(
                 host=imap_server,
@@ -134,26 +244,65 @@ class VerificationCodeHub:
                 self.email_config.get("auth_code", "")
             )
             if not login_response or 'OK' not in login_response[0]:
-                print(f"  [CodeHub] Login failed: {login_response}")
+                logger.error(f"[CodeHub] Login failed: {login_response}")
                 self._imap_client = None
                 return False
 
             # 选择收件箱并检查状态
             select_response = await self._imap_client.select("INBOX")
             if not select_response or 'OK' not in select_response[0]:
-                print(f"  [CodeHub] Select INBOX failed: {select_response}")
+                logger.error(f"[CodeHub] Select INBOX failed: {select_response}")
                 self._imap_client = None
                 return False
 
-            print(f"  [CodeHub] IMAP connected successfully")
+            for line in select_response[1] or []:
+                if isinstance(line, (bytes, bytearray)):
+                    uidnext_match = _UIDNEXT_RE.search(line)
+                    if uidnext_match:
+                        self._uidnext_hint = int(uidnext_match.group(1))
+                        break
+
+            logger.info("[CodeHub] IMAP connected successfully")
             return True
 
         except Exception as e:
-            logger.error(f"IMAP connection failed: {e}")
-            print(f"  [CodeHub] IMAP connection failed: {e}")
+            logger.error(f"[CodeHub] IMAP connection failed: {e}")
             self._imap_client = None
             return False
 
+    @asynccontextmanager
+    async def borrow_imap(self):
+        """
+        借用验证码中心的 IMAP 连接（已登录并选中 INBOX）
+
+        其他服务通过它复用同一连接，而不是 pause() 后自行登录。
+        借用期间轮询暂停，正在进行的 IDLE 会被立即打断。
+
+        用法:
+            async with hub.borrow_imap() as client:
+                await client.uid_search(...)
+        """
+        self._borrowers += 1
+        try:
+            if self._imap_client:
+                await self._imap_client.stop_wait_server_push()
+            async with self._imap_lock:
+                if not await self._connect():
+                    raise ConnectionError("IMAP connection failed")
+                self._last_active = time.monotonic()
+                yield self._imap_client
+        finally:
+            self._borrowers -= 1
+
+    async def _keepalive(self):
+        """空闲期间发送 NOOP 保持连接，失败时断开（下次使用时重连）"""
+        self._last_noop = time.monotonic()
+        try:
+            await self._imap_client.noop()
+        except Exception as e:
+            logger.warning(f"[CodeHub] Keepalive failed ({e}), reconnecting on next use")
+            await self._disconnect()
+
     async def _disconnect(self):
         """断开连接"""
         if self._imap_client:
@@ -176,43 +325,122 @@ class VerificationCodeHub:
                     await asyncio.sleep(1)
                     continue
 
-                # 没有等待者时，减少轮询频率并断开连接
+                # 没有等待者时停止轮询，连接用 NOOP 保活，空闲较久才断开
                 if self._waiting_count == 0:
                     idle_count += 1
                     if idle_count == 1:
-                        # 首次进入空闲，打印一次并断开连接
-                        print(f"  [CodeHub] No waiters, entering idle mode...")
-                        await self._disconnect()
-                    # 空闲时每 10 秒检查一次（而非 2 秒）
-                    await asyncio.sleep(10)
+                        # 首次进入空闲，打印一次
+                        logger.info("[CodeHub] No waiters, entering idle mode...")
+                    if self._imap_client and not self._borrowers:
+                        now = time.monotonic()
+                        if now - self._last_active >= IDLE_DISCONNECT_SECONDS:
+                            logger.info(f"[CodeHub] Idle for {IDLE_DISCONNECT_SECONDS}s, IMAP connection released")
+                            async with self._imap_lock:
+                                await self._disconnect()
+                        elif now - self._last_noop >= KEEPALIVE_INTERVAL:
+                            async with self._imap_lock:
+                                if self._imap_client:
+                                    await self._keepalive()
+                    # 空闲时每 10 秒检查一次，新等待者到达时立即恢复
+                    self._waiter_arrived.clear()
+                    try:
+                        await asyncio.wait_for(self._waiter_arrived.wait(), timeout=10)
+                    except asyncio.TimeoutError:
+                        pass
                     continue
 
                 # 有等待者，重置空闲计数
                 idle_count = 0
+                self._last_active = time.monotonic()
 
-                if poll_count % 10 == 1:  # 每20秒打印一次状态
+                # 每分钟输出一次状态
+                if self._last_active - self._last_status_log >= STATUS_LOG_INTERVAL:
+                    self._last_status_log = self._last_active
                     total_codes = sum(len(v) for v in self._codes_by_email.values()) + len(self._fallback_queue)
-                    print(f"  [CodeHub] Polling... (count={poll_count}, codes={total_codes}, waiting={self._waiting_count})")
-                await self._poll_once()
-                await asyncio.sleep(2)  # 每 2 秒轮询一次
+                    logger.info(f"[CodeHub] Polling... (count={poll_count}, codes={total_codes}, waiting={self._waiting_count})")
+                async with self._imap_lock:
+                    await self._poll_once()
+                    await self._wait_for_new_mail()
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"Poll error: {e}")
-                print(f"  [CodeHub] Poll loop error: {e}")
-                await self._disconnect()
+                logger.error(f"[CodeHub] Poll loop error: {e}")
+                async with self._imap_lock:
+                    await self._disconnect()
                 await asyncio.sleep(5)
 
+    def _should_keep_waiting(self) -> bool:
+        """IDLE 等待期间是否继续等待"""
+        return (
+            self._running and not self._paused
+            and self._waiting_count > 0 and not self._borrowers
+        )
+
+    async def _wait_for_new_mail(self):
+        """
+        等待新邮件
+
+        优先使用 IMAP IDLE，服务器推送 EXISTS 时立即返回；
+        服务器不支持 IDLE 时退回每 POLL_INTERVAL 秒轮询一次。
+        """
+        client = self._imap_client
+        if self._borrowers:
+            # 有借用者在等待连接，直接让出
+            return
+        if not client or not self._idle_supported or not client.has_capability("IDLE"):
+            await asyncio.sleep(POLL_INTERVAL)
+            return
+
+        try:
+            idle_task = await client.idle_start(timeout=IDLE_REFRESH_SECONDS)
+        except Exception as e:
+            logger.warning(f"[CodeHub] IDLE rejected ({e}), falling back to polling every {POLL_INTERVAL}s")
+            self._idle_supported = False
+            await asyncio.sleep(POLL_INTERVAL)
+            return
+
+        try:
+            while self._should_keep_waiting():
+                try:
+                    push = await client.wait_server_push(timeout=IDLE_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+
+                lines = push if isinstance(push, list) else [push]
+                texts = [
+                    line.decode(errors="ignore") if isinstance(line, (bytes, bytearray)) else str(line)
+                    for line in lines
+                ]
+                # 续期定时器到期，结束本轮 IDLE 后重新发起
+                if any("stop_wait_server_push" in text for text in texts):
+                    break
+                # 新邮件到达
+                if any(text.strip().endswith("EXISTS") for text in texts):
+                    break
+        finally:
+            if client is self._imap_client:
+                try:
+                    client.idle_done()
+                    await asyncio.wait_for(idle_task, timeout=IDLE_CHECK_INTERVAL)
+                except Exception:
+                    pass
+
     async def _poll_once(self):
         """单次轮询"""
         if not await self._connect():
-            print("  [CodeHub] IMAP connection failed")
+            logger.warning("[CodeHub] IMAP connection failed")
             return
 
         try:
-            # 按发件人搜索 Google 验证邮件
+            # 按发件人搜索 Google 验证邮件，只搜索水位线之后的 UID
+            # 首次搜索（尚无水位线）只取未读邮件
             # aioimaplib 的 search 语法: 整个搜索条件作为单个字符串
-            response = await self._imap_client.search('FROM "noreply-googlecloud@google.com"')
+            seeding = self._last_max_uid == 0
+            if seeding:
+                criteria = f'FROM "{GOOGLE_SENDER}" UNSEEN'
+            else:
+                criteria = f'UID {self._last_max_uid + 1}:* FROM "{GOOGLE_SENDER}"'
+            response = await self._imap_client.uid_search(criteria)
 
             # aioimaplib 返回 (status, data) 格式
             if not response or len(response) < 2:
@@ -222,7 +450,7 @@ class VerificationCodeHub:
 
             # 检查响应状态
             if 'OK' not in status:
-                print(f"  [CodeHub] Search failed: {status}")
+                logger.warning(f"[CodeHub] Search failed: {status}")
                 return
 
             # data 可能是 list 或 bytes
@@ -239,98 +467,161 @@ class VerificationCodeHub:
             else:
                 return
 
-            uids = uid_str.split()
+            # "N:*" 在 N 大于当前最大 UID 时仍会返回最后一封，需要再过滤一次
+            uids = [uid for uid in uid_str.split() if int(uid) > self._last_max_uid]
+
+            # 新水位线：本次结果的最大 UID；首次搜索用 UIDNEXT 推进到当前邮箱末尾
+            # 处理完成后才推进，FETCH 出错时下次轮询会重新处理这些邮件
+            watermark = max(map(int, uids), default=self._last_max_uid)
+            if seeding and self._uidnext_hint:
+                watermark = max(watermark, self._uidnext_hint - 1)
             if not uids:
+                self._last_max_uid = watermark
                 return
 
-            # 过滤掉已处理的
-            new_uids = [uid for uid in uids[-20:] if int(uid) not in self._processed_uids]
-            if new_uids:
-                print(f"  [CodeHub] Found {len(new_uids)} new Google emails to process")
+            new_uids = uids[-20:]
+            logger.info(f"[CodeHub] Found {len(new_uids)} new Google emails to process")
+
+            # 批量 FETCH，每批一次往返；解析交给线程池，与下一批 FETCH 重叠
+            # 并发解析数由线程池的 PARSE_WORKERS 限制，其余任务在池内排队
+            loop = asyncio.get_running_loop()
+            parse_futures = []
+            for i in range(0, len(new_uids), FETCH_BATCH_SIZE):
+                batch = new_uids[i:i + FETCH_BATCH_SIZE]
+                raw_emails = await self._fetch_batch(batch)
+                missing = [uid for uid in batch if uid not in raw_emails]
+                if missing:
+                    logger.debug(f"[CodeHub] Emails {','.join(missing)}: no raw_email found in data")
+                parse_futures.extend(
+                    loop.run_in_executor(self._parse_executor, self._parse_email, uid, raw)
+                    for uid, raw in raw_emails.items()
+                )
 
-            for uid in new_uids:
-                uid_int = int(uid)
-                await self._process_email(uid)
-                self._processed_uids.add(uid_int)
+            # 整批解析完成后一次性交付/存储
+            codes = [result for result in await asyncio.gather(*parse_futures) if result]
+            if codes:
+                self._store_codes(codes, time.time())
+                total_codes = sum(len(v) for v in self._codes_by_email.values()) + len(self._fallback_queue)
+                for code, target_email in codes:
+                    logger.info(f"[CodeHub] Got code: {code} for {target_email or 'unknown'} (total={total_codes}, waiting={self._waiting_count})")
 
-                # 清理旧的 UID 记录
-                if len(self._processed_uids) > 1000:
-                    self._processed_uids = set(list(self._processed_uids)[-500:])
+            self._last_max_uid = watermark
 
         except Exception as e:
-            import traceback
             error_msg = f"{type(e).__name__}: {e}" if str(e) else f"{type(e).__name__}: {repr(e)}"
-            logger.error(f"Poll once error: {error_msg}\n{traceback.format_exc()}")
-            print(f"  [CodeHub] Poll error: {error_msg}")
+            logger.error(f"[CodeHub] Poll error: {error_msg}\n{traceback.format_exc()}")
             # 发生错误时断开连接，下次轮询会重连
             await self._disconnect()
 
-    async def _process_email(self, uid: str):
-        """处理单封邮件（已经按发件人过滤过了）"""
-        try:
-            response = await self._imap_client.fetch(uid, "(RFC822)")
+    async def _fetch_batch(self, uids: List[str]) -> Dict[str, bytes]:
+        """
+        一次 FETCH 取回多封邮件
 
-            # aioimaplib 返回 (status, data_list) 格式
-            if not response or len(response) < 2:
-                return
+        Returns:
+            {uid: 原始邮件字节}
+        """
+        response = await self._imap_client.uid("fetch", ",".join(uids), FETCH_MESSAGE_PARTS)
+
+        # aioimaplib 返回 (status, data_list) 格式
+        if not response or len(response) < 2:
+            return {}
+
+        status, data = response[0], response[1]
+
+        if 'OK' not in status or not data:
+            return {}
+
+        # aioimaplib 返回格式与 imaplib 不同：data 是一个 list，每封邮件依次为
+        # b'N FETCH (UID ... BODY[HEADER.FIELDS (...)] {size}'、bytearray 头部、
+        # b' BODY[TEXT] {size}'、bytearray 正文、b')'
+        # 响应头里没有 UID 时按顺序对应（服务器按升序返回）
+        sections: Dict[str, Dict[str, bytes]] = {}
+        position = 0
+        current_uid = uids[0] if len(uids) == 1 else None
+        current_section = "text"
+
+        def header_uid(line: bytes) -> Optional[str]:
+            nonlocal position
+            uid_match = _FETCH_UID_RE.search(line)
+            if uid_match:
+                uid = uid_match.group(1).decode()
+            else:
+                uid = uids[position] if position < len(uids) else None
+            position += 1
+            return uid
+
+        def literal_section(line: bytes) -> str:
+            section_match = _FETCH_SECTION_RE.search(line)
+            if section_match and section_match.group(1).startswith(b"HEADER"):
+                return "header"
+            return "text"
+
+        for item in data:
+            # 兼容 imaplib 的 tuple 格式：(头部, 内容)
+            if isinstance(item, tuple) and len(item) >= 2:
+                if isinstance(item[0], bytes):
+                    if _FETCH_LINE_RE.match(item[0]):
+                        current_uid = header_uid(item[0])
+                    current_section = literal_section(item[0])
+                uid, content = current_uid, item[1]
+            elif isinstance(item, bytearray):
+                uid, content = current_uid, bytes(item)
+            elif isinstance(item, bytes):
+                if _FETCH_LINE_RE.match(item):
+                    current_uid = header_uid(item)
+                if _FETCH_SECTION_RE.search(item):
+                    current_section = literal_section(item)
+                continue
+            else:
+                continue
 
-            status, data = response[0], response[1]
+            if uid and isinstance(content, bytes):
+                sections.setdefault(uid, {}).setdefault(current_section, content)
 
-            if 'OK' not in status or not data:
-                return
+        # 头部段以空行结尾，直接拼接即为可解析的邮件
+        raw_emails = {}
+        for uid, parts in sections.items():
+            raw = parts.get("header", b"") + parts.get("text", b"")
+            raw_emails[uid] = raw
 
-            # 解析邮件
-            import email
-            from email.header import decode_header
-            from email.utils import parsedate_to_datetime
-
-            # aioimaplib 返回格式与 imaplib 不同：
-            # data 是一个 list，其中 bytearray 类型是邮件内容
-            raw_email = None
-            for item in data:
-                # aioimaplib 返回 bytearray 作为邮件内容
-                if isinstance(item, bytearray):
-                    raw_email = bytes(item).decode("utf-8", errors="ignore")
-                    break
-                # 兼容 imaplib 的 tuple 格式
-                elif isinstance(item, tuple) and len(item) >= 2:
-                    raw_email = item[1]
-                    if isinstance(raw_email, bytes):
-                        raw_email = raw_email.decode("utf-8", errors="ignore")
-                    break
-                # 如果是 bytes 类型，直接解码
-                elif isinstance(item, bytes) and b'@' in item:
-                    raw_email = item.decode("utf-8", errors="ignore")
-                    break
+        return raw_emails
+
+    def _parse_email(self, uid: str, raw_email: Optional[bytes]) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        解析单封邮件（已经按发件人过滤过了，内容由 _fetch_batch 批量取回）
 
+        在解析线程池中运行，只做纯计算，不访问共享状态。
+
+        Returns:
+            (验证码, 目标邮箱)，没有验证码返回 None
+        """
+        try:
             if not raw_email:
-                print(f"  [CodeHub] Email {uid}: no raw_email found in data")
-                return
+                logger.debug(f"[CodeHub] Email {uid}: no raw_email found in data")
+                return None
 
-            msg = email.message_from_string(raw_email)
+            # 直接解析字节，不先把整封邮件解码成字符串
+            msg = self._bytes_parser.parsebytes(raw_email)
 
             # 获取邮件时间
             date_str = msg.get("Date", "")
             mail_time_str = "unknown"
-            mail_time_local = None
+            mail_ts = None
 
             if date_str:
                 try:
-                    mail_time = parsedate_to_datetime(date_str)
-                    if mail_time.tzinfo:
-                        mail_time_local = mail_time.astimezone().replace(tzinfo=None)
-                    else:
-                        mail_time_local = mail_time
-                    mail_time_str = mail_time_local.strftime("%H:%M:%S")
+                    # 无时区的时间按本地时间处理
+                    mail_ts = parsedate_to_datetime(date_str).timestamp()
+                    mail_time_str = time.strftime("%H:%M:%S", time.localtime(mail_ts))
                 except:
                     pass
 
             # 检查邮件是否太旧（超过5分钟的跳过）
-            if mail_time_local:
-                age_seconds = (datetime.now() - mail_time_local).total_seconds()
+            if mail_ts is not None:
+                age_seconds = time.time() - mail_ts
                 if age_seconds > 300:
-                    print(f"  [CodeHub] Email {uid}: too old ({int(age_seconds)}s), skipped")
-                    return
+                    logger.debug(f"[CodeHub] Email {uid}: too old ({int(age_seconds)}s), skipped")
+                    return None
 
             # 获取主题用于日志
             subject = ""
@@ -341,29 +632,29 @@ class VerificationCodeHub:
                     for part, enc in decoded
                 )
 
-            print(f"  [CodeHub] Email {uid}: time={mail_time_str}, subject='{subject[:40]}...'")
+            logger.debug(f"[CodeHub] Email {uid}: time={mail_time_str}, subject='{subject[:40]}...'")
 
             # 获取邮件正文
             body = self._get_email_body(msg)
             if not body:
-                print(f"  [CodeHub] Email {uid}: no body content")
-                return
+                logger.debug(f"[CodeHub] Email {uid}: no body content")
+                return None
 
             # 获取收件人（优先从 To 头，其次从正文）
             to_header = msg.get("To", "")
             target_email = self._extract_email_from_header(to_header)
 
             # 如果 To 头是转发邮箱（如 QQ 邮箱），则从正文中提取真正的目标邮箱
-            if target_email and ("qq.com" in target_email or "163.com" in target_email or "126.com" in target_email):
+            if target_email and any(domain in target_email for domain in FORWARDING_DOMAINS):
                 # 这是转发邮箱，需要从正文提取真正的目标
                 body_email = self._extract_target_email_from_body(body)
                 if body_email:
-                    print(f"  [CodeHub] Email {uid}: recipient from body={body_email}")
+                    logger.debug(f"[CodeHub] Email {uid}: recipient from body={body_email}")
                     target_email = body_email
                 else:
-                    print(f"  [CodeHub] Email {uid}: forwarded to {target_email}, but no target in body")
+                    logger.debug(f"[CodeHub] Email {uid}: forwarded to {target_email}, but no target in body")
             elif target_email:
-                print(f"  [CodeHub] Email {uid}: recipient={target_email}")
+                logger.debug(f"[CodeHub] Email {uid}: recipient={target_email}")
             else:
                 # 尝试从 X-Original-To 或 Delivered-To 获取
                 target_email = self._extract_email_from_header(msg.get("X-Original-To", ""))
@@ -375,59 +666,90 @@ class VerificationCodeHub:
                     target_email = self._extract_target_email_from_body(body)
 
                 if target_email:
-                    print(f"  [CodeHub] Email {uid}: recipient={target_email} (from alt source)")
+                    logger.debug(f"[CodeHub] Email {uid}: recipient={target_email} (from alt source)")
 
             # 提取验证码
             code = self._extract_code(body)
 
             if code:
-                await self._store_code(code, target_email)
-                total_codes = sum(len(v) for v in self._codes_by_email.values()) + len(self._fallback_queue)
-                print(f"  [CodeHub] SUCCESS: code={code} for={target_email or 'unknown'} (total={total_codes}, waiting={self._waiting_count})")
-                logger.info(f"Got code: {code} for {target_email or 'unknown'}")
-            else:
-                print(f"  [CodeHub] Email {uid}: no code found")
-                # 打印正文前300字符帮助调试
+                return code, target_email
+
+            if logger.isEnabledFor(logging.DEBUG):
+                # 输出正文前300字符帮助调试
                 body_preview = body[:300].replace('\n', '\\n')
-                print(f"  [CodeHub] Body: {body_preview}")
+                logger.debug(f"[CodeHub] Email {uid}: no code found, body: {body_preview}")
+            return None
 
         except Exception as e:
-            logger.error(f"Process email error: {e}")
-            print(f"  [CodeHub] Email {uid} error: {e}")
+            logger.error(f"[CodeHub] Email {uid} error: {e}")
+            return None
 
     def _get_email_body(self, msg) -> str:
-        """获取邮件正文"""
-        body = ""
-
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        body += payload.decode("utf-8", errors="ignore")
-                elif content_type == "text/html":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        # 简单去除 HTML 标签
-                        html = payload.decode("utf-8", errors="ignore")
-                        body += re.sub(r'<[^>]+>', ' ', html)
-        else:
+        """获取邮件正文（优先 text/plain，没有纯文本时才解析 HTML）"""
+        if not msg.is_multipart():
             payload = msg.get_payload(decode=True)
+            return payload.decode("utf-8", errors="ignore") if payload else ""
+
+        plain_parts = []
+        html_parts = []
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            if content_type == "text/plain":
+                payload = part.get_payload(decode=True)
+                if payload:
+                    plain_parts.append(payload.decode("utf-8", errors="ignore"))
+            elif content_type == "text/html" and not plain_parts:
+                # 已有纯文本时不再收集 HTML 部分
+                html_parts.append(part)
+
+        if plain_parts:
+            return "".join(plain_parts)
+
+        texts = []
+        for part in html_parts:
+            payload = part.get_payload(decode=True)
             if payload:
-                body = payload.decode("utf-8", errors="ignore")
-
-        return body
+                texts.append(self._html_to_text(payload.decode("utf-8", errors="ignore")))
+        return "".join(texts)
+
+    @staticmethod
+    def _html_to_text(html: str) -> str:
+        """提取 HTML 正文文本（优先 selectolax，未安装时简单去除标签）"""
+        if LexborHTMLParser is not None:
+            tree = LexborHTMLParser(html)
+            node = tree.body or tree.root
+            return node.text(separator=' ') if node else ""
+        return _HTML_TAG_RE.sub(' ', html)
 
     def _extract_code(self, body: str) -> Optional[str]:
-        """提取验证码"""
-        for pattern in self.CODE_PATTERNS:
-            match = re.search(pattern, body, re.IGNORECASE)
-            if match:
-                code = match.group(1).upper()
-                # 验证是否为有效的 6 位验证码
-                if len(code) == 6 and code.isalnum():
-                    return code
+        """
+        提取验证码
+
+        先用子串查找预筛关键词：不含任何关键词时只可能命中"独立行的6位代码"模式。
+        否则用合并正则单次扫描正文：没有匹配直接返回；命中时只需再检查
+        优先级更高的模式，结果与按顺序逐个匹配一致。
+        """
+        if not any(keyword in body for keyword in self.CODE_KEYWORDS_CJK):
+            lowered = body.lower()
+            if not any(keyword in lowered for keyword in self.CODE_KEYWORDS_ASCII):
+                match = self.KEYWORDLESS_PATTERN.search(body)
+                return match.group(1).upper() if match else None
+
+        match = self.CODE_ALTERNATION.search(body)
+        if not match:
+            return None
+
+        index = match.lastindex - 1
+        for pattern in self.CODE_PATTERNS[:index]:
+            higher = pattern.search(body)
+            if higher:
+                match, index = higher, 0
+                break
+
+        code = match.group(index + 1).upper()
+        # 验证是否为有效的 6 位验证码
+        if len(code) == 6 and code.isalnum():
+            return code
         return None
 
     def _extract_email_from_header(self, header: str) -> Optional[str]:
@@ -435,7 +757,7 @@ class VerificationCodeHub:
         if not header:
             return None
         # 匹配邮箱地址（支持 "Name <email@domain>" 格式）
-        match = re.search(r'[\w\.\-\+]+@[\w\.\-]+\.\w+', header)
+        match = _EMAIL_RE.search(header)
         if match:
             return match.group(0).lower()
         return None
@@ -451,67 +773,105 @@ class VerificationCodeHub:
         if not body:
             return None
 
-        # 排除常见的转发/发送方邮箱
-        excluded_domains = [
-            'qq.com', '163.com', '126.com', 'gmail.com',
-            'google.com', 'googlemail.com', 'outlook.com', 'hotmail.com'
-        ]
-
-        # 找出所有邮箱地址
-        emails = re.findall(r'[\w\.\-\+]+@[\w\.\-]+\.\w+', body.lower())
-
+        # 逐个匹配并只转换匹配到的地址为小写，不复制整个正文
         # 返回第一个非排除域名的邮箱
-        for email in emails:
-            domain = email.split('@')[1] if '@' in email else ''
-            if domain and domain not in excluded_domains:
-                return email
+        for match in _EMAIL_RE.finditer(body):
+            address = match.group(0).lower()
+            domain = address.rpartition('@')[2]
+            if domain not in EXCLUDED_TARGET_DOMAINS:
+                return address
 
         return None
 
-    async def _store_code(self, code: str, target_email: str = None):
-        """存储验证码（按目标邮箱分类）"""
-        async with self._lock:
-            timestamp = datetime.now().timestamp()
-
-            if target_email:
-                target_lower = target_email.lower()
-                # 检查是否重复
-                if target_lower in self._codes_by_email:
-                    for existing_code, ts in self._codes_by_email[target_lower]:
-                        if existing_code == code and timestamp - ts < 300:
-                            logger.debug(f"Duplicate code ignored: {code} for {target_email}")
-                            return
-                else:
-                    self._codes_by_email[target_lower] = []
+    def _store_codes(self, codes: List[Tuple[str, Optional[str]]], timestamp: Optional[float] = None):
+        """
+        交付/存储一次轮询得到的所有验证码
 
-                # 添加到对应邮箱的队列
-                self._codes_by_email[target_lower].append((code, timestamp))
-            else:
-                # 无法识别收件人，放入后备队列
-                for existing_code, ts in self._fallback_queue:
-                    if existing_code == code and timestamp - ts < 300:
-                        logger.debug(f"Duplicate code ignored: {code}")
-                        return
-                self._fallback_queue.append((code, timestamp))
+        整个过程没有 await，在事件循环中天然原子，无需加锁。
+        同一批中重复的 (验证码, 收件人) 只处理一次。
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        seen = set()
+        for code, target_email in codes:
+            key = (code, target_email.lower() if target_email else None)
+            if key in seen:
+                continue
+            seen.add(key)
+            self._store_code(code, target_email, timestamp)
+
+    def _store_code(self, code: str, target_email: Optional[str], timestamp: float):
+        """
+        存储验证码（按目标邮箱分类）
+
+        常见情况是等待者已经登记，直接交付，不入队也不扫描队列；
+        只有验证码先于 wait_for_code 到达时才入队。
+        """
+        target_lower = target_email.lower() if target_email else None
+
+        # 有等待者时直接交付
+        if self._dispatch(code, timestamp, target_lower):
+            return
+
+        # 检查是否重复
+        if target_lower:
+            queue = self._codes_by_email.get(target_lower, ())
+        else:
+            queue = self._fallback_queue
+        for existing_code, ts in queue:
+            if existing_code == code and timestamp - ts < 300:
+                logger.debug(f"Duplicate code ignored: {code} for {target_email or 'unknown'}")
+                return
+
+        if target_lower:
+            # 添加到对应邮箱的队列
+            self._codes_by_email.setdefault(target_lower, deque()).append((code, timestamp))
+        else:
+            # 无法识别收件人，放入后备队列
+            self._fallback_queue.append((code, timestamp))
 
-            # 通知所有等待者
-            self._new_code_event.set()
+    def _dispatch(self, code: str, timestamp: float, target_lower: Optional[str]) -> bool:
+        """
+        把验证码交给一个等待者
+
+        有收件人时只交给等待该邮箱的等待者；无法识别收件人时交给任意等待者
+        （与后备队列语义一致）。
+
+        Returns:
+            是否已交付
+        """
+        if not self._waiters:
+            return False
+        keys = [target_lower] if target_lower else list(self._waiters)
+        for key in keys:
+            waiters = self._waiters.get(key)
+            if not waiters:
+                continue
+            for i, (future, since_ts) in enumerate(waiters):
+                if not future.done() and timestamp > since_ts:
+                    del waiters[i]
+                    future.set_result(code)
+                    return True
+        return False
 
     async def wait_for_code(
         self,
         target_email: str = None,
         timeout: float = 120,
-        since_time: Optional[datetime] = None
+        since_time: Optional[datetime] = None,
+        cancel_event: Optional[asyncio.Event] = None
     ) -> Optional[str]:
         """
         等待验证码（按目标邮箱精确匹配）
 
-        优先从目标邮箱的队列获取验证码，如果没有则尝试后备队列。
+        优先从目标邮箱的队列获取验证码，如果没有则尝试后备队列；
+        都没有时登记等待，由 _store_codes 直接交付。
 
         Args:
             target_email: 目标邮箱（用于精确匹配）
             timeout: 超时时间（秒）
             since_time: 只接受此时间之后的验证码
+            cancel_event: 置位后立即放弃等待（例如页面已离开验证码页）
 
         Returns:
             验证码，超时返回 None
@@ -519,72 +879,102 @@ class VerificationCodeHub:
         since_ts = since_time.timestamp() if since_time else 0
         target_lower = target_email.lower() if target_email else None
 
-        # 增加等待者计数
+        # 增加等待者计数，唤醒空闲中的轮询循环
         self._waiting_count += 1
+        self._waiter_arrived.set()
         tag = f"[{target_email.split('@')[0] if target_email else 'unknown'}]"
 
         try:
-            end_time = asyncio.get_event_loop().time() + timeout
             logger.info(f"{tag} Start waiting for code (since_ts={since_ts:.0f})")
 
-            while asyncio.get_event_loop().time() < end_time:
-                async with self._lock:
-                    # 优先从目标邮箱的队列获取
-                    if target_lower and target_lower in self._codes_by_email:
-                        codes = self._codes_by_email[target_lower]
-                        for i, (code, ts) in enumerate(codes):
-                            if ts > since_ts:
-                                codes.pop(i)
-                                # 清理空队列
-                                if not codes:
-                                    del self._codes_by_email[target_lower]
-                                logger.info(f"{tag} Got code: {code} (exact match)")
-                                return code
-
-                    # 后备：从通用队列获取（按时间顺序）
-                    for i, (code, ts) in enumerate(self._fallback_queue):
-                        if ts > since_ts:
-                            self._fallback_queue.pop(i)
-                            logger.info(f"{tag} Got code: {code} (from fallback queue)")
-                            return code
-
-                # 等待新验证码
-                remaining = end_time - asyncio.get_event_loop().time()
-                if remaining <= 0:
-                    break
+            # 优先从目标邮箱的队列获取
+            codes = self._codes_by_email.get(target_lower) if target_lower else None
+            if codes:
+                code = self._take_code(codes, since_ts)
+                # 清理空队列
+                if not codes:
+                    del self._codes_by_email[target_lower]
+                if code:
+                    logger.info(f"{tag} Got code: {code} (exact match)")
+                    return code
 
-                # 等待通知或超时
-                self._new_code_event.clear()
-                try:
-                    await asyncio.wait_for(
-                        self._new_code_event.wait(),
-                        timeout=min(5, remaining)
-                    )
-                except asyncio.TimeoutError:
-                    pass
+            # 后备：从通用队列获取（按时间顺序）
+            code = self._take_code(self._fallback_queue, since_ts)
+            if code:
+                logger.info(f"{tag} Got code: {code} (from fallback queue)")
+                return code
 
-            logger.warning(f"{tag} Timeout, no code received")
-            return None
+            # 登记等待者（检查与登记之间没有 await，不会错过期间到达的验证码）
+            future = asyncio.get_running_loop().create_future()
+            entry = (future, since_ts)
+            self._waiters.setdefault(target_lower, deque()).append(entry)
+
+            try:
+                if cancel_event is None:
+                    code = await asyncio.wait_for(future, timeout=timeout)
+                else:
+                    cancel_task = asyncio.ensure_future(cancel_event.wait())
+                    try:
+                        await asyncio.wait(
+                            (future, cancel_task),
+                            timeout=timeout,
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                    finally:
+                        cancel_task.cancel()
+                    # 取消与交付同时发生时以已交付的验证码为准
+                    if not future.done():
+                        if cancel_event.is_set():
+                            logger.info(f"{tag} Cancelled, stop waiting for code")
+                            return None
+                        raise asyncio.TimeoutError()
+                    code = future.result()
+                logger.info(f"{tag} Got code: {code} (dispatched)")
+                return code
+            except asyncio.TimeoutError:
+                logger.warning(f"{tag} Timeout, no code received")
+                return None
+            finally:
+                waiters = self._waiters.get(target_lower)
+                if waiters is not None:
+                    try:
+                        waiters.remove(entry)
+                    except ValueError:
+                        pass
+                    if not waiters:
+                        del self._waiters[target_lower]
 
         finally:
             self._waiting_count -= 1
 
+    @staticmethod
+    def _take_code(queue: Deque[Tuple[str, float]], since_ts: float) -> Optional[str]:
+        """
+        取出队列中第一个晚于 since_ts 的验证码
+
+        队列按时间递增，常见情况是队首即可用，O(1) 弹出。
+        """
+        if queue and queue[0][1] > since_ts:
+            return queue.popleft()[0]
+        for i, (code, ts) in enumerate(queue):
+            if ts > since_ts:
+                del queue[i]
+                return code
+        return None
+
     def cleanup_old_codes(self, max_age: float = 600):
         """清理过期验证码"""
-        now = datetime.now().timestamp()
-        # 清理各邮箱队列
-        for email in list(self._codes_by_email.keys()):
-            self._codes_by_email[email] = [
-                (code, ts) for code, ts in self._codes_by_email[email]
-                if now - ts < max_age
-            ]
-            if not self._codes_by_email[email]:
-                del self._codes_by_email[email]
+        now = time.time()
+        # 队列按时间递增，从队首弹出过期项即可
+        for address in list(self._codes_by_email.keys()):
+            codes = self._codes_by_email[address]
+            while codes and now - codes[0][1] >= max_age:
+                codes.popleft()
+            if not codes:
+                del self._codes_by_email[address]
         # 清理后备队列
-        self._fallback_queue = [
-            (code, ts) for code, ts in self._fallback_queue
-            if now - ts < max_age
-        ]
+        while self._fallback_queue and now - self._fallback_queue[0][1] >= max_age:
+            self._fallback_queue.popleft()
 
     def get_status(self) -> dict:
         """获取验证码中心状态"""
@@ -595,7 +985,7 @@ class VerificationCodeHub:
             "codes_by_email": {k: len(v) for k, v in self._codes_by_email.items()},
             "fallback_queue_size": len(self._fallback_queue),
             "waiting_count": self._waiting_count,
-            "processed_uids": len(self._processed_uids),
+            "last_uid": self._last_max_uid,
         }
 
 
@@ -606,13 +996,24 @@ class ConcurrentAutoLoginService:
     支持多账号同时刷新，大幅提升效率
     """
 
-    def __init__(self, config: dict, max_concurrent: int = 5):
+    def __init__(
+        self,
+        config: dict,
+        max_concurrent: int = 5,
+        browser=None,
+        code_hub: Optional[VerificationCodeHub] = None,
+        captcha_service: Optional[YesCaptchaService] = None
+    ):
         """
         初始化服务
 
         Args:
             config: 自动登录配置
             max_concurrent: 最大并发数
+            browser: 调用方共享的 Playwright Browser；传入时必须同时传入 code_hub，
+                服务不再自行启动浏览器和验证码中心，关闭时也不释放它们
+            code_hub: 调用方共享的验证码中心
+            captcha_service: 调用方共享的打码服务
         """
         self.config = config
         self.max_concurrent = max_concurrent
@@ -622,13 +1023,20 @@ class ConcurrentAutoLoginService:
         self.yescaptcha_api_key = config.get("yescaptcha_api_key", "")
 
         self._playwright = None
-        self._browser = None
-        self._code_hub: Optional[VerificationCodeHub] = None
-        self._captcha_service = None
+        self._browser = browser
+        self._code_hub: Optional[VerificationCodeHub] = code_hub
+        self._captcha_service = captcha_service
         self._semaphore: Optional[asyncio.Semaphore] = None
+        # 每个账号只创建独立的 BrowserContext，浏览器进程由所有账号共用
+        self._owns_resources = browser is None
 
     async def initialize(self):
         """初始化服务"""
+        if not self._owns_resources:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            print(f"  [并发服务] 已初始化 (共享浏览器, 最大并发={self.max_concurrent})")
+            return
+
         # 启动浏览器
         from playwright.async_api import async_playwright
 
@@ -660,8 +1068,11 @@ class ConcurrentAutoLoginService:
 
         # 初始化打码服务
         if self.yescaptcha_api_key:
-            from .captcha_service import YesCaptchaService
-            self._captcha_service = YesCaptchaService(self.yescaptcha_api_key)
+            self._captcha_service = YesCaptchaService(
+                self.yescaptcha_api_key,
+                max_concurrent=self.config.get("yescaptcha_max_concurrent", 3),
+                pool_size=self.config.get("yescaptcha_token_pool_size", 0)
+            )
 
         # 并发控制
         self._semaphore = asyncio.Semaphore(self.max_concurrent)
@@ -670,6 +1081,8 @@ class ConcurrentAutoLoginService:
 
     async def close(self):
         """关闭服务"""
+        if not self._owns_resources:
+            return
         if self._code_hub:
             await self._code_hub.stop()
         if self._captcha_service:
@@ -769,12 +1182,6 @@ class ConcurrentAutoLoginService:
         google_email: str
     ) -> Optional[Dict[str, Any]]:
         """执行实际的刷新逻辑"""
-        from .service import (
-            GoogleAutoLogin, _safe_goto, _handle_trial_signup_page,
-            _dismiss_welcome_dialog, inject_stealth_scripts
-        )
-        from .human_behavior import HumanBehavior
-
         context = None
         page = None
 
@@ -792,10 +1199,9 @@ class ConcurrentAutoLoginService:
                 Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
                 Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
                 window.chrome = { runtime: {} };
-            """)
+            """ + PAGE_STEALTH_SCRIPT)
 
             page = await context.new_page()
-            await inject_stealth_scripts(page)
 
             # 访问目标页面
             target_url = f"https://business.gemini.google/home/cid/{account.team_id}"
@@ -838,14 +1244,11 @@ class ConcurrentAutoLoginService:
             if "admin/create" in current_url:
                 display_name = account.note or google_email.split("@")[0]
                 await _handle_trial_signup_page(page, display_name)
-                await asyncio.sleep(3)
+                await _wait_for_page_settled(page)
                 current_url = page.url
 
             # 等待进入聊天页面
-            for _ in range(30):
-                if "/cid/" in page.url:
-                    break
-                await asyncio.sleep(1)
+            await self._wait_for_url(page, lambda url: "/cid/" in url, timeout=30)
 
             # 关闭弹窗
             await _dismiss_welcome_dialog(page)
@@ -874,6 +1277,8 @@ class ConcurrentAutoLoginService:
             for cookie in cookies:
                 if cookie["name"] == "__Secure-C_SES":
                     credentials["secure_c_ses"] = cookie["value"]
+                    if cookie.get("expires", -1) > 0:
+                        credentials["expires_at"] = datetime.fromtimestamp(cookie["expires"]).isoformat()
                 elif cookie["name"] == "__Host-C_OSES":
                     credentials["host_c_oses"] = cookie["value"]
 
@@ -895,6 +1300,23 @@ class ConcurrentAutoLoginService:
             if context:
                 await context.close()
 
+    @staticmethod
+    async def _wait_for_url(page, predicate, timeout: float) -> bool:
+        """
+        等待页面 URL 满足条件
+
+        由 Playwright 的导航事件驱动，URL 一变化就返回，不需要按秒轮询。
+        URL 已满足条件时立即返回。
+
+        Returns:
+            是否在超时前满足条件
+        """
+        try:
+            await page.wait_for_url(predicate, wait_until="commit", timeout=timeout * 1000)
+            return True
+        except Exception:
+            return False
+
     async def _concurrent_login(
         self,
         page,
@@ -906,8 +1328,6 @@ class ConcurrentAutoLoginService:
 
         使用验证码中心获取验证码，而不是独占式轮询
         """
-        from .captcha_service import CaptchaInterceptor
-
         try:
             current_url = page.url
 
@@ -931,20 +1351,32 @@ class ConcurrentAutoLoginService:
                     await asyncio.sleep(0.5)
                     await page.keyboard.press("Enter")
 
-            # 等待跳转到验证码页面
-            await asyncio.sleep(3)
+            # 等待提交后的页面加载，再等待跳转到验证码页面
+            try:
+                await page.wait_for_load_state("networkidle", timeout=3000)
+            except Exception:
+                pass
+            await self._wait_for_url(
+                page,
+                lambda url: (
+                    "accountverification.business.gemini.google" in url
+                    or "business.gemini.google/home" in url
+                ),
+                timeout=15,
+            )
 
             # 检查是否需要验证码
-            for _ in range(15):
-                current_url = page.url
-                if "accountverification.business.gemini.google" in current_url:
-                    break
-                if "business.gemini.google/home" in current_url:
-                    return True  # 无需验证码
-                await asyncio.sleep(1)
+            current_url = page.url
+            if "accountverification" not in current_url:
+                return "business.gemini.google/home" in current_url  # 无需验证码
 
-            if "accountverification" not in page.url:
-                return False
+            # 登录成功：离开验证码页面进入业务页面，或进入首次注册页面
+            def logged_in(url: str) -> bool:
+                return (
+                    "business.gemini.google" in url
+                    and "auth" not in url
+                    and "accountverification" not in url
+                ) or "admin/create" in url
 
             # 启动验证码拦截（如果配置了打码服务）
             interceptor = None
@@ -952,6 +1384,13 @@ class ConcurrentAutoLoginService:
                 interceptor = CaptchaInterceptor(page, self._captcha_service)
                 await interceptor.start_monitoring()
 
+            # 页面离开验证码页（跳转或关闭）后不再需要验证码，通知验证码中心停止等待
+            cancel_event = asyncio.Event()
+            left_verification = asyncio.create_task(
+                self._wait_for_url(page, lambda url: "accountverification" not in url, timeout=0)
+            )
+            left_verification.add_done_callback(lambda _: cancel_event.set())
+
             try:
                 # 记录请求时间
                 request_time = datetime.now()
@@ -964,25 +1403,36 @@ class ConcurrentAutoLoginService:
                 code = await self._code_hub.wait_for_code(
                     target_email=google_email,
                     timeout=self.verification_timeout,
-                    since_time=request_time
+                    since_time=request_time,
+                    cancel_event=cancel_event
                 )
 
                 if not code:
+                    if cancel_event.is_set() and logged_in(page.url):
+                        return True
                     print(f"    [{google_email}] No code received")
                     return False
 
                 print(f"    [{google_email}] Got code: {code}")
 
-                # 输入验证码
-                inputs = await page.query_selector_all('input[type="text"]')
-                visible_inputs = [inp for inp in inputs if await inp.is_visible()]
-
-                if len(visible_inputs) >= 6:
-                    for i, char in enumerate(code[:6]):
-                        await visible_inputs[i].fill(char)
+                # 输入验证码：一次 evaluate 取出所有可见文本框的序号，
+                # 避免对每个输入框单独 is_visible（每次都是一次 CDP 往返）
+                visible_indices = await page.evaluate("""
+                    () => [...document.querySelectorAll('input[type="text"]')]
+                        .map((el, i) => (
+                            el.getClientRects().length > 0 &&
+                            getComputedStyle(el).visibility !== 'hidden'
+                        ) ? i : -1)
+                        .filter(i => i >= 0)
+                """)
+                text_inputs = page.locator('input[type="text"]')
+
+                if len(visible_indices) >= 6:
+                    for index, char in zip(visible_indices, code[:6]):
+                        await text_inputs.nth(index).fill(char)
                         await asyncio.sleep(0.1)
-                elif len(visible_inputs) == 1:
-                    await visible_inputs[0].fill(code)
+                elif len(visible_indices) == 1:
+                    await text_inputs.nth(visible_indices[0]).fill(code)
 
                 # 点击验证按钮
                 verify_btn = await page.query_selector('button:has-text("验证")')
@@ -991,20 +1441,11 @@ class ConcurrentAutoLoginService:
                 else:
                     await page.keyboard.press("Enter")
 
-                await asyncio.sleep(3)
-
                 # 检查是否成功
-                for _ in range(30):
-                    current_url = page.url
-                    if "business.gemini.google" in current_url and "auth" not in current_url:
-                        return True
-                    if "admin/create" in current_url:
-                        return True
-                    await asyncio.sleep(1)
-
-                return False
+                return await self._wait_for_url(page, logged_in, timeout=33)
 
             finally:
+                left_verification.cancel()
                 if interceptor:
                     interceptor.stop_monitoring()
 
@@ -1037,6 +1478,8 @@ async def get_concurrent_service(config: dict = None) -> ConcurrentAutoLoginServ
                 "verification_timeout": auto_login_config.verification_timeout,
                 "headless": getattr(auto_login_config, 'headless', True),
                 "yescaptcha_api_key": getattr(auto_login_config, 'yescaptcha_api_key', ''),
+                "yescaptcha_max_concurrent": getattr(auto_login_config, 'yescaptcha_max_concurrent', 3),
+                "yescaptcha_token_pool_size": getattr(auto_login_config, 'yescaptcha_token_pool_size', 0),
                 "proxy": config_manager.config.proxy,
             }
 
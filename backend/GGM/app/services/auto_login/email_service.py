@@ -6,24 +6,188 @@
 """
 import re
 import time
+import queue
+import select
+import ssl
 import asyncio
+import threading
 import imaplib
 import email
 import email.message
 from email.header import decode_header
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Callable, Any, Dict, List
 import logging
 
+# 可选：Hyperscan（多模式正则 DFA）用于一次扫描判断命中的验证码模式
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# 可选：selectolax（lexbor 后端，C 实现的 HTML 解析器）用于提取 HTML 正文文本
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
 logger = logging.getLogger(__name__)
 
+# 单轮 IDLE 的最长时间：每轮结束都会重新搜索一次，即使漏掉推送也只多等几秒
+# （远低于 RFC 2177 要求的 29 分钟续期上限）
+IDLE_ROUND_SECONDS = 5
+# IDLE 等待按此间隔分片，片间检查停止标记，取消后工作线程最多再阻塞这么久
+IDLE_SLICE_SECONDS = 1.0
+
+# 先只取过滤需要的头部，通过过滤后再取正文前段；BODY.PEEK 不会把邮件标记为已读
+# Content-Type/Content-Transfer-Encoding 用于解析多段正文（boundary、编码）
+FETCH_HEADER_FIELDS = (
+    "FROM TO DATE SUBJECT "
+    "MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING"
+)
+FETCH_HEADER_PART = f"(BODY.PEEK[HEADER.FIELDS ({FETCH_HEADER_FIELDS})])"
+# 验证码和目标邮箱都在正文开头的 text/plain 段，截断后面的 HTML 部分
+FETCH_TEXT_LIMIT = 16384
+FETCH_TEXT_PART = f"(BODY.PEEK[TEXT]<0.{FETCH_TEXT_LIMIT}>)"
+# 批量 FETCH 响应中用于区分各邮件的 UID
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+# 未安装 selectolax 时用于去除 HTML 标签
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# 解析结果缓存条数：同一封邮件会被多次请求（并发登录、重复轮询）反复检查
+MSG_CACHE_SIZE = 64
+
+# IMAP 连接池大小：QQ 邮箱允许同一账号多个会话，并发登录可各自独占一个连接
+# 连接在工作线程首次借出时才建立，单个请求只会登录一个会话
+IMAP_POOL_SIZE = 3
+
+
+# 验证码模式中唯一不含关键词的一个："独立行的6位代码"
+# 关键词预筛依赖这一点，其余模式都必须包含 CODE_KEYWORDS_* 之一
+KEYWORDLESS_CODE_PATTERN = r'\n\s*([A-Z0-9]{6})\s*\n'
+
+# Hyperscan 数据库的 scratch 空间不能被多个线程同时使用
+_hyperscan_lock = threading.Lock()
+
+
+def _check_keyword_prefilter(patterns, keywords) -> int:
+    """
+    检查关键词预筛的前提并返回 KEYWORDLESS_CODE_PATTERN 在模式列表中的位置
+
+    除 KEYWORDLESS_CODE_PATTERN 外，每个模式的源码都必须包含某个关键词，
+    否则预筛会漏掉该模式；在类加载时调用，增删模式破坏前提时立即报错
+    """
+    missing = [
+        p for p in patterns
+        if p != KEYWORDLESS_CODE_PATTERN and not any(k in p.lower() for k in keywords)
+    ]
+    if missing:
+        raise ValueError(f"验证码模式缺少预筛关键词: {missing}")
+    return patterns.index(KEYWORDLESS_CODE_PATTERN)
+
+
+def _compile_hyperscan_db(patterns: list):
+    """把验证码模式编译为 Hyperscan 数据库，模式 id 即优先级；不可用时返回 None"""
+    if hyperscan is None:
+        return None
+    try:
+        db = hyperscan.Database()
+        # UCP 让 \s 等字符类按 Unicode 解释，与 Python 正则一致
+        flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        db.compile(
+            expressions=[p.encode("utf-8") for p in patterns],
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            flags=[flags] * len(patterns),
+        )
+        return db
+    except Exception as e:
+        logger.warning(f"Hyperscan 编译验证码模式失败，改用正则匹配: {e}")
+        return None
+
+
+@dataclass
+class VerificationMail:
+    """按 UID 缓存的验证码邮件，正文在头部通过过滤后才拉取"""
+    to_addr: str
+    mail_time: Optional[datetime]  # 本地时间
+    raw_header: bytes
+    body: Optional[str] = None
+    code: Optional[str] = None
+
+
+class ImapWorker(threading.Thread):
+    """
+    IMAP 工作线程
+
+    独占一个 IMAP 连接，按提交顺序在线程内执行该连接上的全部阻塞操作，
+    不占用事件循环的默认线程池，同一连接上的命令也天然串行。
+    线程在第一次提交任务时启动。
+    """
+
+    def __init__(self):
+        super().__init__(name="imap-worker", daemon=True)
+        self.conn: Optional[imaplib.IMAP4_SSL] = None
+        self._tasks: "queue.Queue[Optional[Tuple[Callable, tuple, Future]]]" = queue.Queue()
+        self._stopping = False
+        # 置位后正在进行的 IDLE 等待会在下一个分片结束时退出
+        self.interrupt = threading.Event()
+
+    def run(self):
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            func, args, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, func: Callable, *args) -> Future:
+        """提交一个在工作线程中执行的调用"""
+        if self.ident is None:
+            self.start()
+        future = Future()
+        self._tasks.put((func, args, future))
+        return future
+
+    async def call(self, func: Callable, *args) -> Any:
+        """在工作线程中执行调用并等待结果"""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def _close_connection(self):
+        if self.conn:
+            try:
+                self.conn.logout()
+            except Exception:
+                pass
+            self.conn = None
+
+    def stop(self) -> Optional[Future]:
+        """排在已提交的任务之后断开连接并退出线程，返回断开操作的 Future"""
+        if self._stopping or (self.ident is None and self.conn is None):
+            return None
+        self._stopping = True
+        self.interrupt.set()
+        future = self.submit(self._close_connection)
+        self._tasks.put(None)
+        return future
+
 
 class EmailVerificationService:
     """
     QQ 邮箱验证码服务
 
     通过 IMAP 协议从 QQ 邮箱获取 Google 登录验证码
-    所有网络操作都通过 asyncio.to_thread 异步执行，不会阻塞事件循环
+    异步接口共享一个 IMAP 连接池，每个连接由专属的 ImapWorker 线程操作，
+    并发的验证码请求各自借用一个连接，不会阻塞事件循环
     """
 
     # Google 验证码邮件特征
@@ -49,10 +213,24 @@ class EmailVerificationService:
         r'verification code[：:\s]*([A-Z0-9]{6})',
         r'security code[：:\s]*([A-Z0-9]{6})',
         # 更宽松的模式：独立行的6位代码
-        r'\n\s*([A-Z0-9]{6})\s*\n',
+        KEYWORDLESS_CODE_PATTERN,
         # 尝试匹配任何被空白包围的6位验证码（带前后文验证）
         r'(?:验证码|code|Code)[^\d]*(\d{6})',
     ]
+    # 类加载时预编译
+    COMPILED_CODE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in VERIFICATION_CODE_PATTERNS)
+    # 合并为单个交替正则：每个模式恰有一个捕获组，第 i 组对应第 i+1 个模式
+    CODE_ALTERNATION = re.compile(
+        "|".join(f"(?:{p})" for p in VERIFICATION_CODE_PATTERNS), re.IGNORECASE
+    )
+    # 安装了 hyperscan 时，所有模式编译为一个 DFA 数据库
+    HYPERSCAN_DB = _compile_hyperscan_db(VERIFICATION_CODE_PATTERNS)
+    # 快速预筛：除"独立行的6位代码"外，每个模式都包含以下关键词之一
+    CODE_KEYWORDS_CJK = ("验证", "证码")
+    CODE_KEYWORDS_ASCII = ("code", "g-")
+    KEYWORDLESS_PATTERN = COMPILED_CODE_PATTERNS[_check_keyword_prefilter(
+        VERIFICATION_CODE_PATTERNS, CODE_KEYWORDS_CJK + CODE_KEYWORDS_ASCII
+    )]
 
     def __init__(self, config: dict):
         """
@@ -69,49 +247,212 @@ class EmailVerificationService:
         self.auth_code = config.get("auth_code", "")
         self.imap_server = config.get("imap_server", "imap.qq.com")
         self.imap_port = config.get("imap_port", 993)
-        self._connection: Optional[imaplib.IMAP4_SSL] = None
+        self._connection: Optional[imaplib.IMAP4_SSL] = None  # 同步兼容接口使用的连接
         self._search_email_count = 5
-        self._lock = asyncio.Lock()  # 保护 IMAP 连接的并发访问
-
-    def _connect_sync(self) -> bool:
-        """同步连接到 IMAP 服务器（内部方法）"""
+        # 按 UID 缓存的邮件解析结果，不是验证码邮件的 UID 缓存为 None
+        # 连接池中的多个工作线程会同时读写，用线程锁保护
+        self._msg_cache: "OrderedDict[bytes, Optional[VerificationMail]]" = OrderedDict()
+        self._msg_cache_lock = threading.Lock()
+        # 异步接口的连接池，conn 为 None 的工作线程表示尚未连接或连接已失效，借出时按需重连
+        self._pool: "asyncio.Queue[ImapWorker]" = asyncio.Queue()
+        for _ in range(IMAP_POOL_SIZE):
+            self._pool.put_nowait(ImapWorker())
+
+    def _connect_sync(self) -> Optional[imaplib.IMAP4_SSL]:
+        """同步建立一个 IMAP 连接（内部方法），失败返回 None"""
         try:
-            self._connection = imaplib.IMAP4_SSL(
+            conn = imaplib.IMAP4_SSL(
                 host=self.imap_server,
                 port=self.imap_port
             )
-            self._connection.login(self.email_address, self.auth_code)
-            self._connection.select("INBOX")
+            conn.login(self.email_address, self.auth_code)
+            conn.select("INBOX")
+            conn.untagged_responses.pop("EXISTS", None)
             print(f"  [邮箱] 已连接到 {self.imap_server}")
             logger.info("邮箱连接成功")
-            return True
+            return conn
         except Exception as e:
             print(f"  [邮箱] 连接失败: {e}")
             logger.error(f"连接邮箱失败: {e}")
-            return False
+            return None
+
+    def _drain_pool(self) -> list:
+        """取出连接池中当前空闲的全部工作线程"""
+        workers = []
+        while not self._pool.empty():
+            workers.append(self._pool.get_nowait())
+        return workers
+
+    async def _connect_worker(self, worker: ImapWorker) -> bool:
+        """在工作线程中（重新）建立它的 IMAP 连接"""
+        worker.conn = await worker.call(self._connect_sync)
+        return worker.conn is not None
 
     async def connect(self) -> bool:
-        """异步连接到 IMAP 服务器"""
-        return await asyncio.to_thread(self._connect_sync)
+        """
+        异步连接邮箱，只为连接池中的一个工作线程登录
 
-    def _disconnect_sync(self):
-        """同步断开连接（内部方法）"""
-        if self._connection:
-            try:
-                self._connection.logout()
-            except:
-                pass
-            self._connection = None
+        其余工作线程在首次借出时才连接：单次登录只会借用一个连接，
+        不为用不到的连接付出登录开销
+        """
+        worker = await self._pool.get()
+        try:
+            if worker.conn is not None or await self._connect_worker(worker):
+                return True
+            # 连接失败时结束已启动的工作线程，换回一个未启动的
+            stopping, worker = worker.stop(), ImapWorker()
+            if stopping:
+                await asyncio.wrap_future(stopping)
+            return False
+        finally:
+            self._pool.put_nowait(worker)
 
     async def disconnect(self):
-        """异步断开连接"""
-        await asyncio.to_thread(self._disconnect_sync)
+        """异步断开连接池中的全部连接并结束工作线程"""
+        workers = self._drain_pool()
+        for _ in workers:
+            self._pool.put_nowait(ImapWorker())
+        if self._connection:
+            # 同步接口的连接也交给一个临时工作线程登出，不占用默认线程池
+            closer = ImapWorker()
+            closer.conn, self._connection = self._connection, None
+            workers.append(closer)
+        stopping = [future for future in (w.stop() for w in workers) if future]
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in stopping))
+
+    @staticmethod
+    def _supports_idle(conn: Optional[imaplib.IMAP4_SSL]) -> bool:
+        """
+        连接是否可以使用 IDLE
+
+        除服务器声明 IDLE 能力外，还要求 imaplib 仍提供 _idle_sync 依赖的私有接口，
+        否则退化为普通轮询
+        """
+        return (
+            conn is not None
+            and "IDLE" in conn.capabilities
+            and all(
+                hasattr(conn, name)
+                for name in ("_new_tag", "send", "readline", "sock", "file", "untagged_responses")
+            )
+        )
 
-    def _refresh_inbox_sync(self) -> bool:
-        """同步刷新收件箱状态（内部方法）"""
+    @staticmethod
+    def _has_unread_data(conn: imaplib.IMAP4_SSL) -> bool:
+        """
+        imaplib 读缓冲或 SSL 层中是否已有未读数据（内部方法）
+
+        服务器可能把 "+ idling" 和 "* N EXISTS" 放在同一个报文里，
+        后者已被读进 conn.file 的缓冲，socket 上的 select 看不到
+        """
+        sock = conn.sock
+        pending = getattr(sock, "pending", None)
+        if pending and pending():
+            return True
+        # 临时切换为非阻塞：缓冲非空时直接返回，否则最多尝试一次不阻塞的读取
+        previous_timeout = sock.gettimeout()
+        sock.setblocking(False)
         try:
-            self._connection.noop()
-            self._connection.select("INBOX")
+            return bool(conn.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(previous_timeout)
+
+    @staticmethod
+    def _idle_sync(
+        conn: imaplib.IMAP4_SSL,
+        timeout: float,
+        stop_event: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        同步进入 IDLE 等待服务器推送（内部方法）
+
+        上一次 SEARCH/FETCH 期间已收到 EXISTS 时不进入 IDLE，直接返回。
+        否则按 IDLE_SLICE_SECONDS 分片等待，片间检查 stop_event；收到任意未标记响应
+        （通常是 EXISTS）、超时或 stop_event 置位后发送 DONE 退出 IDLE。
+        imaplib 没有 IDLE 接口，对其私有接口（_new_tag、untagged_responses、
+        原始 socket 与读缓冲）的使用只集中在这里和 _has_unread_data。
+
+        Returns:
+            是否收到了服务器推送
+        """
+        if conn.untagged_responses.pop("EXISTS", None):
+            return True
+
+        tag = conn._new_tag()
+        conn.send(tag + b" IDLE\r\n")
+        line = conn.readline()
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE 被拒绝: {line!r}")
+
+        pushed = False
+        try:
+            sock = conn.sock
+            deadline = time.monotonic() + timeout
+            while stop_event is None or not stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if (
+                    EmailVerificationService._has_unread_data(conn)
+                    or select.select([sock], [], [], min(IDLE_SLICE_SECONDS, remaining))[0]
+                ):
+                    pushed = conn.readline().startswith(b"*")
+                    break
+        finally:
+            conn.send(b"DONE\r\n")
+            while True:
+                line = conn.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("IDLE 期间连接已关闭")
+                if line.startswith(tag):
+                    break
+                # DONE 之前到达的推送同样算数
+                if line.startswith(b"*"):
+                    pushed = True
+        return pushed
+
+    async def _wait_for_new_mail(
+        self,
+        worker: ImapWorker,
+        timeout: float,
+        poll_interval: float
+    ) -> bool:
+        """
+        等待新邮件到达
+
+        支持 IDLE 时由服务器推送唤醒，否则退化为按 poll_interval 休眠。
+
+        Returns:
+            True 表示 IDLE 正常结束，连接可直接用于下一次搜索
+        """
+        if not self._supports_idle(worker.conn):
+            await asyncio.sleep(poll_interval)
+            return False
+
+        try:
+            await worker.call(
+                self._idle_sync, worker.conn,
+                min(timeout, max(poll_interval, IDLE_ROUND_SECONDS)), worker.interrupt
+            )
+            return True
+        except Exception as e:
+            # IDLE 失败时按普通轮询等待，避免立即重试形成空转
+            logger.debug(f"IDLE 等待失败，改为轮询: {e}")
+            await asyncio.sleep(poll_interval)
+            return False
+
+    @staticmethod
+    def _refresh_inbox_sync(conn: Optional[imaplib.IMAP4_SSL]) -> bool:
+        """同步刷新收件箱状态（内部方法），连接为空或已失效时返回 False"""
+        if conn is None:
+            return False
+        try:
+            conn.noop()
+            conn.select("INBOX")
+            # SELECT 返回的 EXISTS 是邮件总数而不是新邮件推送，丢弃以免 _idle_sync 误判
+            conn.untagged_responses.pop("EXISTS", None)
             return True
         except:
             return False
@@ -126,7 +467,7 @@ class EmailVerificationService:
         """
         异步获取 Google 验证码
 
-        使用 asyncio.to_thread 执行 IMAP 操作，不会阻塞事件循环
+        IMAP 操作在连接池的工作线程中执行，不会阻塞事件循环
 
         Args:
             timeout: 超时时间（秒）
@@ -140,186 +481,378 @@ class EmailVerificationService:
         if since_time is None:
             since_time = datetime.now() - timedelta(minutes=2)
 
-        async with self._lock:  # 保护 IMAP 连接的并发访问
-            if not self._connection:
-                if not await self.connect():
-                    return None
+        # 从连接池借用一个工作线程及其连接，并发请求之间互不阻塞
+        worker = await self._pool.get()
+        try:
+            if worker.conn is None and not await self._connect_worker(worker):
+                return None
 
-            if target_email:
-                print(f"  [邮箱] 正在获取 {target_email} 的验证码...")
-                print(f"  [邮箱] 请求时间: {since_time.strftime('%H:%M:%S')}")
-            else:
-                print(f"  [邮箱] 正在获取验证码...")
+            logger.info(
+                f"正在获取 {target_email or '任意邮箱'} 的验证码, 请求时间: {since_time.strftime('%H:%M:%S')}"
+            )
 
             start_time = time.time()
             poll_count = 0
+            idle_ok = False
+            last_uid = 0
 
             while time.time() - start_time < timeout:
                 poll_count += 1
 
-                # 使用 to_thread 执行同步的 IMAP 刷新操作
-                refresh_ok = await asyncio.to_thread(self._refresh_inbox_sync)
-                if not refresh_ok:
-                    if not await self.connect():
-                        print(f"  [邮箱] IMAP连接失败，重试中...")
+                # IDLE 正常返回时服务器状态已是最新，无需 NOOP/SELECT 刷新
+                if not idle_ok:
+                    refresh_ok = await worker.call(self._refresh_inbox_sync, worker.conn)
+                    # 失效的连接直接丢弃，换一个新连接
+                    if not refresh_ok and not await self._connect_worker(worker):
+                        logger.warning("IMAP 连接失败，重试中...")
                         await asyncio.sleep(1)  # 使用异步 sleep
                         continue
 
-                # 使用 to_thread 执行同步的邮件搜索操作
-                code, msg_id = await asyncio.to_thread(
+                code, msg_id, last_uid = await worker.call(
                     self._search_verification_email_sync,
+                    worker.conn,
                     target_email,
-                    since_time
+                    since_time,
+                    last_uid
                 )
                 if code:
-                    # 删除邮件也异步执行
-                    await asyncio.to_thread(self._delete_email_sync, msg_id)
+                    await worker.call(self._delete_email_sync, worker.conn, msg_id)
                     return code
 
-                elapsed = int(time.time() - start_time)
-                print(f"  [邮箱] 等待验证码... ({elapsed}秒/{timeout}秒) [轮询#{poll_count}]")
-                await asyncio.sleep(poll_interval)  # 使用异步 sleep，不阻塞事件循环
+                elapsed = time.time() - start_time
+                logger.debug(f"等待验证码... ({int(elapsed)}秒/{timeout}秒) [轮询#{poll_count}]")
+                if elapsed >= timeout:
+                    break
+                idle_ok = await self._wait_for_new_mail(worker, timeout - elapsed, poll_interval)
 
-            print(f"  [邮箱] 获取验证码超时 ({timeout}秒)", flush=True)
+            logger.warning(f"获取验证码超时 ({timeout}秒)")
             return None
+        except asyncio.CancelledError:
+            # 工作线程可能仍在执行本次请求的操作（例如 IDLE），换一个新的工作线程，
+            # 旧线程做完手头的操作后断开连接并退出
+            worker.stop()
+            worker = ImapWorker()
+            raise
+        finally:
+            self._pool.put_nowait(worker)
 
     def _search_verification_email_sync(
         self,
+        conn: imaplib.IMAP4_SSL,
         target_email: Optional[str] = None,
-        since_time: Optional[datetime] = None
-    ) -> Tuple[Optional[str], Optional[bytes]]:
-        """同步搜索验证码邮件（内部方法）"""
+        since_time: Optional[datetime] = None,
+        last_uid: int = 0
+    ) -> Tuple[Optional[str], Optional[bytes], int]:
+        """
+        同步搜索验证码邮件（内部方法）
+
+        首次搜索用 SINCE 让服务器按日期过滤，之后只搜索 UID 大于 last_uid 的新邮件，
+        已检查过的邮件不会重复拉取。FETCH 失败或连接异常时 last_uid 保持不变，
+        下次搜索会重新检查这些邮件。
+
+        Returns:
+            (验证码, 邮件 UID, 新的 last_uid)
+        """
         try:
-            typ, msg_nums = self._connection.search(
-                None,
+            if last_uid:
+                criteria = ('UID', f'{last_uid + 1}:*')
+            else:
+                # SINCE 只精确到日期，且按服务器时区解释，多留一天余量
+                since_date = (since_time or datetime.now()) - timedelta(days=1)
+                criteria = ('SINCE', since_date.strftime('%d-%b-%Y'))
+            typ, msg_nums = conn.uid(
+                'SEARCH', *criteria,
                 'FROM', '"noreply-googlecloud@google.com"'
             )
 
-            if typ != "OK" or not msg_nums[0]:
-                print(f"    [搜索] 未找到 Google 验证码邮件", flush=True)
-                return None, None
-
-            msg_ids = msg_nums[0].split()
-            recent_ids = msg_ids[-self._search_email_count:] if len(msg_ids) > self._search_email_count else msg_ids
-            recent_ids.reverse()
-
-            print(f"    [搜索] 找到 {len(msg_ids)} 封 Google 邮件，检查最新 {len(recent_ids)} 封...", flush=True)
+            # "n:*" 总会包含最大 UID 的邮件，需过滤掉已检查过的
+            msg_ids = [uid for uid in msg_nums[0].split() if int(uid) > last_uid] if typ == "OK" else []
+            if not msg_ids:
+                logger.debug("未找到新的 Google 验证码邮件")
+                return None, None, last_uid
+
+            recent_ids = msg_ids[-self._search_email_count:]
+            logger.debug(f"找到 {len(msg_ids)} 封新 Google 邮件，检查最新 {len(recent_ids)} 封")
+
+            # 过滤条件对本次搜索的所有邮件都相同，只计算一次
+            target_lower = target_email.lower() if target_email else None
+            if since_time:
+                # 邮件必须在 since_time 之后（允许5秒容差，考虑网络延迟和时钟误差），且在3分钟内
+                earliest = since_time - timedelta(seconds=5)
+                oldest = datetime.now() - timedelta(seconds=180)
+            else:
+                earliest = oldest = None
 
-            for msg_id in recent_ids:
-                code = self._extract_code_sync(msg_id, target_email, since_time)
+            # 一次往返拉取全部候选邮件的头部，逐封检查时直接命中缓存
+            self._prefetch_headers_sync(conn, recent_ids)
+            for msg_id in reversed(recent_ids):
+                code = self._extract_code_sync(conn, msg_id, target_lower, earliest, oldest)
                 if code:
-                    return code, msg_id
+                    return code, msg_id, last_uid
 
-            return None, None
+            return None, None, max(last_uid, max(int(uid) for uid in msg_ids))
 
         except Exception as e:
-            print(f"    [搜索] 搜索邮件出错: {e}", flush=True)
-            logger.debug(f"搜索邮件出错: {e}")
-            return None, None
+            logger.warning(f"搜索邮件出错: {e}")
+            return None, None, last_uid
+
+    @staticmethod
+    def _fetch_sections_sync(
+        conn: imaplib.IMAP4_SSL,
+        msg_ids: List[bytes],
+        parts: str
+    ) -> Dict[bytes, bytes]:
+        """
+        一次 UID FETCH 拉取多封邮件的同一个段（内部方法）
+
+        FETCH 失败时抛出 IMAP4.abort，与连接异常一样交给上层处理，
+        搜索水位线不会越过这些未检查的邮件
+
+        Returns:
+            {uid: 段内容}，服务器没有返回的邮件（例如已被删除）不在结果中
+        """
+        typ, msg_data = conn.uid("FETCH", b",".join(msg_ids), parts)
+        if typ != "OK":
+            raise imaplib.IMAP4.abort(f"FETCH 失败: {typ} {msg_data!r}")
+
+        # imaplib 把字面量段返回为 (描述, 内容) 元组；UID 通常在描述里，
+        # 也可能出现在字面量之后的剩余响应中
+        sections = {}
+        pending = None
+        for item in msg_data:
+            if isinstance(item, tuple):
+                match = _FETCH_UID_RE.search(item[0])
+                if match:
+                    sections[match.group(1)] = item[1]
+                    pending = None
+                else:
+                    pending = item[1]
+            elif pending is not None and isinstance(item, bytes):
+                match = _FETCH_UID_RE.search(item)
+                if match:
+                    sections[match.group(1)] = pending
+                pending = None
+        return sections
+
+    def _cache_mail(self, msg_id: bytes, mail: Optional[VerificationMail]):
+        """写入邮件缓存，超出容量时淘汰最久未使用的条目"""
+        with self._msg_cache_lock:
+            self._msg_cache[msg_id] = mail
+            if len(self._msg_cache) > MSG_CACHE_SIZE:
+                self._msg_cache.popitem(last=False)
+
+    def _prefetch_headers_sync(self, conn: imaplib.IMAP4_SSL, msg_ids: List[bytes]):
+        """一次往返拉取多封未缓存邮件的头部并写入缓存（内部方法）"""
+        with self._msg_cache_lock:
+            missing = [msg_id for msg_id in msg_ids if msg_id not in self._msg_cache]
+        if not missing:
+            return
+
+        for msg_id, raw_header in self._fetch_sections_sync(conn, missing, FETCH_HEADER_PART).items():
+            try:
+                self._cache_mail(msg_id, self._parse_headers(raw_header))
+            except Exception as e:
+                # 解析失败不缓存，逐封检查时会重试并记录错误
+                logger.debug(f"解析邮件头部失败: {e}")
+
+    def _load_headers_sync(self, conn: imaplib.IMAP4_SSL, msg_id: bytes) -> Optional[VerificationMail]:
+        """
+        读取候选邮件的头部（内部方法），优先使用缓存，未缓存时单独拉取
+
+        Returns:
+            验证码邮件；邮件已不存在或不是 Google 验证码邮件时返回 None
+        """
+        with self._msg_cache_lock:
+            if msg_id in self._msg_cache:
+                self._msg_cache.move_to_end(msg_id)
+                return self._msg_cache[msg_id]
+
+        raw_header = self._fetch_sections_sync(conn, [msg_id], FETCH_HEADER_PART).get(msg_id)
+        if not raw_header:
+            # 服务器没有返回该邮件（已被删除），不缓存
+            return None
+
+        mail = self._parse_headers(raw_header)
+        self._cache_mail(msg_id, mail)
+        return mail
+
+    def _parse_headers(self, raw_header: bytes) -> Optional[VerificationMail]:
+        """解析邮件头部，不是 Google 验证码邮件时返回 None"""
+        msg = email.message_from_bytes(raw_header)
+
+        # 检查发件人
+        from_addr = msg.get("From", "").lower()
+        if "google" not in from_addr:
+            return None
+
+        # 检查主题
+        subject = self._decode_header_value(msg.get("Subject", ""))
+        if "验证码" not in subject and "verification" not in subject.lower() and "code" not in subject.lower():
+            return None
+
+        to_addr = self._decode_header_value(msg.get("To", ""))
+
+        # 解析邮件时间
+        mail_time_local = None
+        date_str = msg.get("Date", "")
+        if date_str:
+            try:
+                mail_time = parsedate_to_datetime(date_str)
+                if mail_time.tzinfo:
+                    mail_time_local = mail_time.astimezone().replace(tzinfo=None)
+                else:
+                    mail_time_local = mail_time
+            except Exception:
+                pass
+
+        return VerificationMail(to_addr, mail_time_local, raw_header)
+
+    def _load_body_sync(self, conn: imaplib.IMAP4_SSL, msg_id: bytes, mail: VerificationMail) -> bool:
+        """
+        拉取正文并提取验证码（内部方法），结果写回缓存的邮件
+
+        Returns:
+            正文是否可用
+        """
+        if mail.body is not None:
+            return True
+
+        text = self._fetch_sections_sync(conn, [msg_id], FETCH_TEXT_PART).get(msg_id)
+        if text is None:
+            return False
+
+        # HEADER.FIELDS 段自带结尾空行，拼上正文段即可按完整 MIME 解析
+        body = self._get_email_body(email.message_from_bytes(mail.raw_header + text))
+        mail.code = self._match_code(body)
+        mail.body = body
+        return True
 
     def _extract_code_sync(
         self,
+        conn: imaplib.IMAP4_SSL,
         msg_id: bytes,
-        target_email: Optional[str] = None,
-        since_time: Optional[datetime] = None
+        target_lower: Optional[str] = None,
+        earliest: Optional[datetime] = None,
+        oldest: Optional[datetime] = None
     ) -> Optional[str]:
-        """同步从邮件中提取验证码（内部方法）"""
-        try:
-            typ, msg_data = self._connection.fetch(msg_id, "(RFC822)")
-            if typ != "OK" or not msg_data or not msg_data[0]:
-                return None
+        """
+        同步从邮件中提取验证码（内部方法）
 
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
+        先只拉取头部检查发件人、主题、时间和收件人，全部通过才拉取正文。
 
-            # 检查发件人
-            from_addr = msg.get("From", "").lower()
-            if "google" not in from_addr:
-                return None
-
-            # 检查主题
-            subject = self._decode_header_value(msg.get("Subject", ""))
-            if "验证码" not in subject and "verification" not in subject.lower() and "code" not in subject.lower():
+        Args:
+            target_lower: 小写的目标邮箱，None 表示不限收件人
+            earliest: 最早可接受的邮件时间，None 表示不检查时间
+            oldest: 早于此时间的邮件视为已过期，与 earliest 同时给出
+        """
+        try:
+            mail = self._load_headers_sync(conn, msg_id)
+            if mail is None:
                 return None
-
-            # 获取邮件基本信息用于日志
-            to_addr = self._decode_header_value(msg.get("To", ""))
-            date_str = msg.get("Date", "")
-            mail_time_str = "未知"
-            mail_time_local = None
-
-            # 解析邮件时间
-            if date_str:
-                try:
-                    from email.utils import parsedate_to_datetime
-                    mail_time = parsedate_to_datetime(date_str)
-                    if mail_time.tzinfo:
-                        mail_time_local = mail_time.astimezone().replace(tzinfo=None)
-                    else:
-                        mail_time_local = mail_time
-                    mail_time_str = mail_time_local.strftime("%H:%M:%S")
-                except Exception:
-                    pass
-
-            # 打印检测到的邮件信息
-            print(f"    [邮件] 收件人: {to_addr[:40]}... | 时间: {mail_time_str}", flush=True)
+            mail_time_local = mail.mail_time
+            if logger.isEnabledFor(logging.DEBUG):
+                mail_time_str = mail_time_local.strftime("%H:%M:%S") if mail_time_local else "未知"
+                logger.debug(f"邮件 {msg_id}: 收件人={mail.to_addr[:40]} 时间={mail_time_str}")
 
             # 检查邮件时间（必须在 since_time 之后，且在3分钟内）
-            if since_time and mail_time_local:
-                since_time_str = since_time.strftime("%H:%M:%S")
-
-                # 邮件必须在 since_time 之后（允许5秒容差，考虑网络延迟和时钟误差）
-                time_diff = (mail_time_local - since_time).total_seconds()
-                if time_diff < -5:  # 邮件比请求早超过5秒才跳过
-                    print(f"    [跳过] 邮件时间 {mail_time_str} 早于请求时间 {since_time_str} (差 {int(-time_diff)} 秒)", flush=True)
+            if earliest and mail_time_local:
+                if mail_time_local < earliest:
+                    logger.debug(f"跳过: 邮件时间 {mail_time_local:%H:%M:%S} 早于请求时间")
                     return None
-
-                # 邮件不能超过3分钟
-                now = datetime.now()
-                age_seconds = (now - mail_time_local).total_seconds()
-                if age_seconds > 180:
-                    print(f"    [跳过] 邮件已过期 ({int(age_seconds)}秒 > 180秒)", flush=True)
+                if mail_time_local < oldest:
+                    logger.debug(f"跳过: 邮件已过期 (早于 {oldest:%H:%M:%S})")
                     return None
 
             # 检查收件人（To 字段必须包含目标邮箱）
-            if target_email:
-                if target_email.lower() not in to_addr.lower():
-                    print(f"    [跳过] 收件人不匹配 (目标: {target_email})", flush=True)
-                    return None
+            if target_lower and target_lower not in mail.to_addr.lower():
+                logger.debug(f"跳过: 收件人不匹配 (目标: {target_lower})")
+                return None
 
             # 获取邮件正文
-            body = self._get_email_body(msg)
+            if not self._load_body_sync(conn, msg_id, mail):
+                return None
+            body, code = mail.body, mail.code
 
             # 精确匹配：检查邮件内容中是否包含目标邮箱
-            if target_email:
-                if target_email.lower() not in body.lower():
-                    print(f"    [跳过] 邮件正文不包含目标邮箱 {target_email}", flush=True)
-                    return None
+            if target_lower and target_lower not in body.lower():
+                logger.debug(f"跳过: 邮件正文不包含目标邮箱 {target_lower}")
+                return None
 
-            # 提取验证码（忽略大小写匹配）
-            for pattern in self.VERIFICATION_CODE_PATTERNS:
-                match = re.search(pattern, body, re.IGNORECASE)
-                if match:
-                    code = match.group(1).upper()  # 统一转为大写
-                    print(f"    [OK] 验证码: {code} (目标: {target_email or '任意'})")
-                    logger.info(f"提取到验证码: {code}")
-                    return code
+            if code:
+                logger.info(f"提取到验证码: {code} (目标: {target_lower or '任意'})")
+                return code
 
-            # 调试输出：打印邮件正文前500字符，帮助分析验证码格式
-            body_preview = body[:500].replace('\n', '\\n').replace('\r', '\\r')
-            print(f"    [调试] 邮件正文预览: {body_preview}", flush=True)
-            print(f"    [跳过] 未找到验证码格式", flush=True)
+            if logger.isEnabledFor(logging.DEBUG):
+                # 输出正文前500字符，帮助分析验证码格式
+                body_preview = body[:500].replace('\n', '\\n').replace('\r', '\\r')
+                logger.debug(f"跳过: 未找到验证码格式, 正文预览: {body_preview}")
             return None
 
+        except (imaplib.IMAP4.abort, OSError):
+            # 连接异常交给上层处理，避免该邮件被当作已检查跳过
+            raise
         except Exception as e:
-            print(f"    [错误] 解析邮件失败: {e}", flush=True)
-            logger.debug(f"解析邮件失败: {e}")
+            logger.warning(f"解析邮件失败: {e}")
             return None
 
-    def _delete_email_sync(self, msg_id: bytes):
+    def _match_code(self, body: str) -> Optional[str]:
+        """
+        按优先级匹配验证码
+
+        先用子串查找预筛关键词：不含任何关键词时只可能命中"独立行的6位代码"模式。
+        否则用合并正则单次扫描正文：没有匹配直接返回；命中时只需再检查
+        优先级更高的模式，结果与按顺序逐个匹配一致。
+        有 Hyperscan 时先用它扫描出命中的最高优先级模式，只对该模式跑一次正则取捕获组。
+        """
+        if not any(keyword in body for keyword in self.CODE_KEYWORDS_CJK):
+            lowered = body.lower()
+            if not any(keyword in lowered for keyword in self.CODE_KEYWORDS_ASCII):
+                match = self.KEYWORDLESS_PATTERN.search(body)
+                return match.group(1).upper() if match else None
+
+        if self.HYPERSCAN_DB is not None:
+            index = self._hyperscan_first_pattern(body)
+            if index is None:
+                return None
+            match = self.COMPILED_CODE_PATTERNS[index].search(body)
+            if match:
+                return match.group(1).upper()
+            # 两个引擎语义不一致时退回合并正则
+
+        match = self.CODE_ALTERNATION.search(body)
+        if not match:
+            return None
+
+        index = match.lastindex - 1
+        for pattern in self.COMPILED_CODE_PATTERNS[:index]:
+            higher = pattern.search(body)
+            if higher:
+                match, index = higher, 0
+                break
+
+        return match.group(index + 1).upper()  # 统一转为大写
+
+    def _hyperscan_first_pattern(self, body: str) -> Optional[int]:
+        """用 Hyperscan 扫描正文，返回命中的最高优先级模式序号"""
+        hits = []
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.append(pattern_id)
+            return pattern_id == 0  # 已命中最高优先级，停止扫描
+
+        with _hyperscan_lock:
+            try:
+                self.HYPERSCAN_DB.scan(body.encode("utf-8", errors="ignore"), match_event_handler=on_match)
+            except hyperscan.ScanTerminated:
+                pass
+        return min(hits) if hits else None
+
+    def _delete_email_sync(self, conn: imaplib.IMAP4_SSL, msg_id: bytes):
         """同步删除邮件（内部方法）"""
+        with self._msg_cache_lock:
+            self._msg_cache.pop(msg_id, None)
         try:
-            self._connection.store(msg_id, '+FLAGS', '\\Deleted')
+            conn.uid('STORE', msg_id, '+FLAGS', '\\Deleted')
         except:
             pass
 
@@ -341,30 +874,45 @@ class EmailVerificationService:
             return value
 
     def _get_email_body(self, msg: email.message.Message) -> str:
-        """获取邮件正文"""
-        body = ""
-
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        charset = part.get_content_charset() or "utf-8"
-                        body += payload.decode(charset, errors="ignore")
-                elif content_type == "text/html" and not body:
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        charset = part.get_content_charset() or "utf-8"
-                        html = payload.decode(charset, errors="ignore")
-                        body = re.sub(r'<[^>]+>', ' ', html)
-        else:
+        """获取邮件正文（优先 text/plain，没有纯文本时才解析 HTML）"""
+        if not msg.is_multipart():
             payload = msg.get_payload(decode=True)
+            if not payload:
+                return ""
+            charset = msg.get_content_charset() or "utf-8"
+            return payload.decode(charset, errors="ignore")
+
+        plain_parts = []
+        html_parts = []
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            if content_type == "text/plain":
+                payload = part.get_payload(decode=True)
+                if payload:
+                    charset = part.get_content_charset() or "utf-8"
+                    plain_parts.append(payload.decode(charset, errors="ignore"))
+            elif content_type == "text/html" and not plain_parts:
+                # 已有纯文本时不再收集 HTML 部分
+                html_parts.append(part)
+
+        if plain_parts:
+            return "".join(plain_parts)
+
+        for part in html_parts:
+            payload = part.get_payload(decode=True)
             if payload:
-                charset = msg.get_content_charset() or "utf-8"
-                body = payload.decode(charset, errors="ignore")
-
-        return body
+                charset = part.get_content_charset() or "utf-8"
+                return self._html_to_text(payload.decode(charset, errors="ignore"))
+        return ""
+
+    @staticmethod
+    def _html_to_text(html: str) -> str:
+        """提取 HTML 正文文本（优先 selectolax，未安装时简单去除标签）"""
+        if LexborHTMLParser is not None:
+            tree = LexborHTMLParser(html)
+            node = tree.body or tree.root
+            return node.text(separator=' ') if node else ""
+        return _HTML_TAG_RE.sub(' ', html)
 
     # 保留同步方法的兼容性别名（供非异步上下文使用）
     def fetch_verification_code_sync(
@@ -383,35 +931,52 @@ class EmailVerificationService:
             since_time = datetime.now() - timedelta(minutes=2)
 
         if not self._connection:
-            if not self._connect_sync():
+            self._connection = self._connect_sync()
+            if not self._connection:
                 return None
 
-        if target_email:
-            print(f"  [邮箱] 正在获取 {target_email} 的验证码...")
-            print(f"  [邮箱] 请求时间: {since_time.strftime('%H:%M:%S')}")
-        else:
-            print(f"  [邮箱] 正在获取验证码...")
+        logger.info(
+            f"正在获取 {target_email or '任意邮箱'} 的验证码, 请求时间: {since_time.strftime('%H:%M:%S')}"
+        )
 
         start_time = time.time()
         poll_count = 0
+        idle_ok = False
+        last_uid = 0
 
         while time.time() - start_time < timeout:
             poll_count += 1
 
-            if not self._refresh_inbox_sync():
-                if not self._connect_sync():
-                    print(f"  [邮箱] IMAP连接失败，重试中...")
+            if not idle_ok and not self._refresh_inbox_sync(self._connection):
+                self._connection = self._connect_sync()
+                if not self._connection:
+                    logger.warning("IMAP 连接失败，重试中...")
                     time.sleep(1)
                     continue
 
-            code, msg_id = self._search_verification_email_sync(target_email, since_time)
+            code, msg_id, last_uid = self._search_verification_email_sync(
+                self._connection, target_email, since_time, last_uid
+            )
             if code:
-                self._delete_email_sync(msg_id)
+                self._delete_email_sync(self._connection, msg_id)
                 return code
 
-            elapsed = int(time.time() - start_time)
-            print(f"  [邮箱] 等待验证码... ({elapsed}秒/{timeout}秒) [轮询#{poll_count}]")
-            time.sleep(poll_interval)
+            elapsed = time.time() - start_time
+            logger.debug(f"等待验证码... ({int(elapsed)}秒/{timeout}秒) [轮询#{poll_count}]")
+            if elapsed >= timeout:
+                break
+            idle_ok = False
+            if self._supports_idle(self._connection):
+                try:
+                    self._idle_sync(
+                        self._connection, min(timeout - elapsed, max(poll_interval, IDLE_ROUND_SECONDS))
+                    )
+                    idle_ok = True
+                except Exception as e:
+                    logger.debug(f"IDLE 等待失败，改为轮询: {e}")
+                    time.sleep(poll_interval)
+            else:
+                time.sleep(poll_interval)
 
-        print(f"  [邮箱] 获取验证码超时 ({timeout}秒)")
+        logger.warning(f"获取验证码超时 ({timeout}秒)")
         return None
@@ -6,8 +6,18 @@
 import asyncio
 import random
 import math
+import itertools
+import logging
 from typing import Tuple, Optional
 
+logger = logging.getLogger(__name__)
+
+# 每个实例预先生成的随机数样本数，延迟计算时循环取用
+NOISE_POOL_SIZE = 4096
+
+# 页面没有固定视口时按此大小生成鼠标坐标
+DEFAULT_VIEWPORT = {"width": 1280, "height": 800}
+
 
 class HumanBehavior:
     """
@@ -28,6 +38,12 @@ class HumanBehavior:
         "human": (40, 200),    # 人类真实速度（有变化）
     }
 
+    # 每次 keyboard.type 输入的字符数范围
+    TYPING_RUN_LENGTH = (3, 5)
+
+    # 预热会话的随机动作
+    WARM_UP_ACTIONS = ("scroll", "mouse", "wait", "scroll_up")
+
     # 常见打字错误（可选）
     TYPO_CHARS = {
         'a': ['s', 'q', 'z'],
@@ -44,9 +60,32 @@ class HumanBehavior:
             page: Playwright 页面对象
         """
         self.page = page
-
-    @staticmethod
-    def random_delay(min_ms: int = 100, max_ms: int = 500) -> float:
+        # 标准正态分布样本池：random_delay 调用频繁，只做一次查表和缩放
+        self._next_gauss = itertools.cycle(
+            [random.gauss(0, 1) for _ in range(NOISE_POOL_SIZE)]
+        ).__next__
+        # [0, 1) 均匀分布样本池，用于生成鼠标坐标
+        self._next_random = itertools.cycle(
+            [random.random() for _ in range(NOISE_POOL_SIZE)]
+        ).__next__
+        # 页面视口大小，首次使用时读取
+        self._viewport: Optional[dict] = None
+
+    def _uniform(self, low: float, high: float) -> float:
+        """从样本池取 [low, high) 的均匀分布随机数"""
+        return low + (high - low) * self._next_random()
+
+    def _randint(self, low: int, high: int) -> int:
+        """从样本池取 [low, high] 的随机整数"""
+        return low + int((high - low + 1) * self._next_random())
+
+    def _get_viewport(self) -> Optional[dict]:
+        """获取页面视口大小（会话期间不变，读取一次后缓存）"""
+        if self._viewport is None:
+            self._viewport = self.page.viewport_size
+        return self._viewport
+
+    def random_delay(self, min_ms: int = 100, max_ms: int = 500) -> float:
         """
         生成随机延迟时间（使用正态分布更接近人类行为）
 
@@ -60,7 +99,7 @@ class HumanBehavior:
         # 使用正态分布，中心值在中间
         mean = (min_ms + max_ms) / 2
         std = (max_ms - min_ms) / 4
-        delay = random.gauss(mean, std)
+        delay = mean + std * self._next_gauss()
         # 限制在范围内
         delay = max(min_ms, min(max_ms, delay))
         return delay / 1000
@@ -80,18 +119,21 @@ class HumanBehavior:
         element,
         text: str,
         speed: str = "human",
-        clear_first: bool = True
+        clear_first: bool = True,
+        use_keystroke_clear: bool = False
     ):
         """
         模拟人类打字
 
-        不使用 fill()，而是逐字符输入，模拟真实打字
+        不使用 fill()，而是逐键输入（每键触发完整的键盘事件），模拟真实打字
 
         Args:
             element: 输入框元素
             text: 要输入的文本
             speed: 打字速度 ("fast", "normal", "slow", "human")
             clear_first: 是否先清空输入框
+            use_keystroke_clear: 用 Ctrl+A / Backspace 按键清空（页面拦截 fill 时使用），
+                默认直接 fill("") 清空
         """
         min_delay, max_delay = self.TYPING_SPEED.get(speed, self.TYPING_SPEED["human"])
 
@@ -101,25 +143,30 @@ class HumanBehavior:
 
         # 清空输入框（如果需要）
         if clear_first:
-            # 选中所有内容
-            await self.page.keyboard.press("Control+a")
-            await asyncio.sleep(self.random_delay(50, 150))
-            await self.page.keyboard.press("Backspace")
+            if use_keystroke_clear:
+                # 选中所有内容
+                await self.page.keyboard.press("Control+a")
+                await asyncio.sleep(self.random_delay(50, 150))
+                await self.page.keyboard.press("Backspace")
+            else:
+                await element.fill("")
             await asyncio.sleep(self.random_delay(100, 300))
 
-        # 逐字符输入
-        for i, char in enumerate(text):
-            # 打字间隔使用随机延迟
-            if i > 0:
-                # 人类打字有节奏变化，偶尔会快一点或慢一点
-                if random.random() < 0.1:
-                    # 10% 概率短暂停顿（思考）
-                    await asyncio.sleep(self.random_delay(200, 500))
-                else:
-                    await asyncio.sleep(self.random_delay(min_delay, max_delay))
-
-            # 输入字符
-            await self.page.keyboard.type(char)
+        # 按几个字符一组输入：每组一次 keyboard.type，由浏览器端按 delay 逐键输入，
+        # 不必每个字符都往返一次；每组使用不同的按键间隔，组间偶尔停顿
+        i = 0
+        while i < len(text):
+            # 人类打字有节奏变化，偶尔会短暂停顿（思考）
+            # 按组计算的概率约等于逐字符 10% 的停顿频率
+            if i > 0 and random.random() < 0.3:
+                await asyncio.sleep(self.random_delay(200, 500))
+
+            run_length = random.randint(*self.TYPING_RUN_LENGTH)
+            await self.page.keyboard.type(
+                text[i:i + run_length],
+                delay=self.random_delay(min_delay, max_delay) * 1000
+            )
+            i += run_length
 
         # 打字完成后短暂停顿
         await asyncio.sleep(self.random_delay(200, 500))
@@ -142,8 +189,8 @@ class HumanBehavior:
             return
 
         # 计算目标点（元素中心附近的随机位置）
-        target_x = box["x"] + box["width"] * random.uniform(0.3, 0.7)
-        target_y = box["y"] + box["height"] * random.uniform(0.3, 0.7)
+        target_x = box["x"] + box["width"] * self._uniform(0.3, 0.7)
+        target_y = box["y"] + box["height"] * self._uniform(0.3, 0.7)
 
         # 移动鼠标
         await self.page.mouse.move(target_x, target_y)
@@ -181,13 +228,13 @@ class HumanBehavior:
         Args:
             count: 移动次数
         """
-        viewport = self.page.viewport_size
+        viewport = self._get_viewport()
         if not viewport:
             return
 
         for _ in range(count):
-            x = random.randint(100, viewport["width"] - 100)
-            y = random.randint(100, viewport["height"] - 100)
+            x = self._randint(100, viewport["width"] - 100)
+            y = self._randint(100, viewport["height"] - 100)
             await self.page.mouse.move(x, y)
             await asyncio.sleep(self.random_delay(100, 300))
 
@@ -201,43 +248,52 @@ class HumanBehavior:
         Args:
             duration: 预热持续时间（秒）
         """
-        print(f"  [预热] 开始预热浏览器会话 ({duration}秒)...")
-        start_time = asyncio.get_event_loop().time()
-        viewport = self.page.viewport_size or {"width": 1280, "height": 800}
+        logger.info(f"开始预热浏览器会话 ({duration:.1f}秒)")
+        now = asyncio.get_running_loop().time
+        deadline = now() + duration
+        viewport = self._get_viewport() or DEFAULT_VIEWPORT
 
         actions_done = 0
 
-        while asyncio.get_event_loop().time() - start_time < duration:
-            action = random.choice(["scroll", "mouse", "wait", "scroll_up"])
+        # 预先抽好整个动作序列；每个动作至少停顿 0.2 秒，据此估算动作数上限
+        plan = random.choices(self.WARM_UP_ACTIONS, k=int(duration / 0.2) + 2)
+
+        for action in plan:
+            if now() >= deadline:
+                break
 
             if action == "scroll":
                 # 向下滚动
                 scroll_amount = random.randint(100, 300)
                 await self.page.mouse.wheel(0, scroll_amount)
-                await asyncio.sleep(random.uniform(0.3, 0.8))
+                pause = random.uniform(0.3, 0.8)
 
             elif action == "scroll_up":
                 # 偶尔向上滚动
                 scroll_amount = random.randint(-200, -50)
                 await self.page.mouse.wheel(0, scroll_amount)
-                await asyncio.sleep(random.uniform(0.3, 0.8))
+                pause = random.uniform(0.3, 0.8)
 
             elif action == "mouse":
-                # 随机移动鼠标（使用曲线轨迹）
+                # 随机移动鼠标
                 target_x = random.randint(100, viewport["width"] - 100)
                 target_y = random.randint(100, viewport["height"] - 100)
                 # 分多步移动，模拟自然轨迹
+                # （中间步骤由 Playwright 驱动端逐个发送，Python 侧只有一次调用）
                 steps = random.randint(10, 20)
                 await self.page.mouse.move(target_x, target_y, steps=steps)
-                await asyncio.sleep(random.uniform(0.2, 0.5))
+                pause = random.uniform(0.2, 0.5)
 
             else:  # wait
                 # 模拟阅读停顿
-                await asyncio.sleep(random.uniform(0.5, 1.5))
+                pause = random.uniform(0.5, 1.5)
 
             actions_done += 1
 
-        print(f"  [预热] 预热完成，执行了 {actions_done} 个动作")
+            # 停顿不超过剩余预热时间，避免最后一个动作把预热拖过 duration
+            await asyncio.sleep(max(0, min(pause, deadline - now())))
+
+        logger.info(f"预热完成，执行了 {actions_done} 个动作")
 
     async def simulate_reading(self, seconds: float = 3):
         """
@@ -246,10 +302,11 @@ class HumanBehavior:
         Args:
             seconds: 阅读时间
         """
-        end_time = asyncio.get_event_loop().time() + seconds
-        viewport = self.page.viewport_size or {"width": 1280, "height": 800}
+        now = asyncio.get_running_loop().time
+        end_time = now() + seconds
+        viewport = self._get_viewport() or DEFAULT_VIEWPORT
 
-        while asyncio.get_event_loop().time() < end_time:
+        while now() < end_time:
             # 偶尔小幅移动鼠标（阅读时的自然抖动）
             if random.random() < 0.3:
                 x = random.randint(200, viewport["width"] - 200)
@@ -259,6 +316,84 @@ class HumanBehavior:
             await asyncio.sleep(random.uniform(0.3, 0.8))
 
 
+# 浏览器启动参数
+# 已指定 --window-size，不再同时使用 --start-maximized；
+# 不禁用后台网络，登录页的 reCAPTCHA 需要正常的预连接
+STEALTH_LAUNCH_ARGS = (
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-infobars",
+    "--window-size=1920,1080",
+    # 额外的反检测参数
+    "--disable-extensions",
+    "--disable-plugins-discovery",
+)
+
+# 上下文级反检测脚本（setup_stealth_browser 使用）
+CONTEXT_STEALTH_SCRIPT = """
+    // 隐藏 webdriver 属性
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // 修改 plugins 数组长度
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+
+    // 修改 languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['zh-CN', 'zh', 'en']
+    });
+
+    // 覆盖 chrome 对象
+    window.chrome = {
+        runtime: {}
+    };
+
+    // 修改 permissions
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+
+    // 隐藏 automation 相关属性
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
+"""
+
+# 页面级反检测脚本：可以直接拼接到上下文的 init script 中一起注入，
+# 省去每个页面单独一次 add_init_script 往返
+PAGE_STEALTH_SCRIPT = """
+    // 更多反检测措施
+
+    // 修改 window.outerWidth/outerHeight
+    Object.defineProperty(window, 'outerWidth', {
+        get: () => window.innerWidth + 100
+    });
+    Object.defineProperty(window, 'outerHeight', {
+        get: () => window.innerHeight + 100
+    });
+
+    // 伪造 WebGL 信息
+    const getParameter = WebGLRenderingContext.prototype.getParameter;
+    WebGLRenderingContext.prototype.getParameter = function(parameter) {
+        if (parameter === 37445) {
+            return 'Intel Inc.';
+        }
+        if (parameter === 37446) {
+            return 'Intel Iris OpenGL Engine';
+        }
+        return getParameter.apply(this, arguments);
+    };
+"""
+
+
 async def setup_stealth_browser(playwright, headless: bool = True, user_data_dir: str = None):
     """
     设置隐身浏览器，规避自动化检测
@@ -271,27 +406,12 @@ async def setup_stealth_browser(playwright, headless: bool = True, user_data_dir
     Returns:
         browser, context 元组
     """
-    # 浏览器启动参数
-    launch_args = [
-        "--disable-blink-features=AutomationControlled",
-        "--disable-dev-shm-usage",
-        "--no-first-run",
-        "--no-default-browser-check",
-        "--disable-infobars",
-        "--window-size=1920,1080",
-        "--start-maximized",
-        # 额外的反检测参数
-        "--disable-extensions",
-        "--disable-plugins-discovery",
-        "--disable-background-networking",
-    ]
-
     # 如果指定了用户数据目录，使用持久化上下文
     if user_data_dir:
         context = await playwright.chromium.launch_persistent_context(
             user_data_dir,
             headless=headless,
-            args=launch_args,
+            args=list(STEALTH_LAUNCH_ARGS),
             viewport={"width": 1280, "height": 800},
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             locale="zh-CN",
@@ -301,7 +421,7 @@ async def setup_stealth_browser(playwright, headless: bool = True, user_data_dir
     else:
         browser = await playwright.chromium.launch(
             headless=headless,
-            args=launch_args
+            args=list(STEALTH_LAUNCH_ARGS)
         )
         context = await browser.new_context(
             viewport={"width": 1280, "height": 800},
@@ -310,41 +430,8 @@ async def setup_stealth_browser(playwright, headless: bool = True, user_data_dir
             timezone_id="Asia/Shanghai",
         )
 
-    # 注入反检测脚本
-    await context.add_init_script("""
-        // 隐藏 webdriver 属性
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined
-        });
-
-        // 修改 plugins 数组长度
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [1, 2, 3, 4, 5]
-        });
-
-        // 修改 languages
-        Object.defineProperty(navigator, 'languages', {
-            get: () => ['zh-CN', 'zh', 'en']
-        });
-
-        // 覆盖 chrome 对象
-        window.chrome = {
-            runtime: {}
-        };
-
-        // 修改 permissions
-        const originalQuery = window.navigator.permissions.query;
-        window.navigator.permissions.query = (parameters) => (
-            parameters.name === 'notifications' ?
-                Promise.resolve({ state: Notification.permission }) :
-                originalQuery(parameters)
-        );
-
-        // 隐藏 automation 相关属性
-        delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
-        delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
-        delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
-    """)
+    # 注入反检测脚本（上下文级和页面级合并为一次注入）
+    await context.add_init_script(CONTEXT_STEALTH_SCRIPT + PAGE_STEALTH_SCRIPT)
 
     return browser, context
 
@@ -353,29 +440,9 @@ async def inject_stealth_scripts(page):
     """
     在页面上注入额外的反检测脚本
 
+    已经把 PAGE_STEALTH_SCRIPT 拼接进上下文 init script 的页面不需要再调用
+
     Args:
         page: Playwright 页面对象
     """
-    await page.add_init_script("""
-        // 更多反检测措施
-
-        // 修改 window.outerWidth/outerHeight
-        Object.defineProperty(window, 'outerWidth', {
-            get: () => window.innerWidth + 100
-        });
-        Object.defineProperty(window, 'outerHeight', {
-            get: () => window.innerHeight + 100
-        });
-
-        // 伪造 WebGL 信息
-        const getParameter = WebGLRenderingContext.prototype.getParameter;
-        WebGLRenderingContext.prototype.getParameter = function(parameter) {
-            if (parameter === 37445) {
-                return 'Intel Inc.';
-            }
-            if (parameter === 37446) {
-                return 'Intel Iris OpenGL Engine';
-            }
-            return getParameter.apply(this, arguments);
-        };
-    """)
+    await page.add_init_script(PAGE_STEALTH_SCRIPT)
@@ -6,17 +6,37 @@
 完全参考 extract_credentials.py 实现
 """
 import asyncio
+import logging
 import re
-import time
 import random
 from datetime import datetime
 from typing import Optional, Dict, Any
 from urllib.parse import urlparse, parse_qs
 
 from app.config import AccountConfig
-from .human_behavior import HumanBehavior, setup_stealth_browser, inject_stealth_scripts
+from .human_behavior import HumanBehavior, setup_stealth_browser, PAGE_STEALTH_SCRIPT
 from .captcha_service import YesCaptchaService, CaptchaInterceptor
 
+try:
+    from playwright.async_api import Error as PlaywrightError
+except ImportError:
+    # 未安装 Playwright 时不会执行任何页面操作，退化为普通异常
+    PlaywrightError = Exception
+
+logger = logging.getLogger(__name__)
+
+
+# 浏览器端的元素可见性判断（与 Playwright 的 is_visible 一致：有布局盒且未 visibility:hidden）。
+# 不使用 offsetParent，因为 position: fixed 的弹层/toast 的 offsetParent 始终为 null
+_JS_IS_VISIBLE = """
+    const isVisible = e => e.getClientRects().length > 0 && getComputedStyle(e).visibility !== "hidden";
+"""
+
+
+def _compile_indicators(indicators) -> "re.Pattern":
+    """将指示词列表编译为一个正则，一次扫描代替逐个 in 判断"""
+    return re.compile("|".join(map(re.escape, indicators)))
+
 
 class GoogleAutoLogin:
     """
@@ -57,6 +77,31 @@ class GoogleAutoLogin:
             'div[role="button"]:has-text("Next")',
             'div[role="button"]:has-text("下一步")',
         ],
+
+        # 错误页面的返回按钮（"注册或登录"）
+        "error_retry_buttons": [
+            'button:has-text("注册或登录")',
+            'button:has-text("Sign in")',
+            'button:has-text("登录")',
+            'a:has-text("注册或登录")',
+            'a:has-text("Sign in")',
+        ],
+
+        # 首次使用注册页面
+        "trial_name_inputs": [
+            'input[type="text"]',           # 通用文本输入框
+            'input[name="name"]',           # name 属性
+            'input[placeholder*="名"]',     # 包含"名"的占位符
+            'input[aria-label*="名"]',      # aria-label 包含"名"
+        ],
+        "trial_submit_buttons": [
+            'button:has-text("同意并开始使用")',
+            'button:has-text("同意")',
+            'button:has-text("开始")',
+            'button:has-text("Start")',
+            'button:has-text("Agree")',
+            'button[type="submit"]',
+        ],
     }
 
     # 登录成功判断
@@ -90,6 +135,122 @@ class GoogleAutoLogin:
         "Something went wrong",
     ]
 
+    # 验证码页面的文本关键词
+    VERIFICATION_KEYWORDS = [
+        "请输入验证码",
+        "输入验证码",
+        "verification",
+        "verify",
+        "enter the code",
+        "security code",
+        "验证码",
+    ]
+
+    # 验证码已发送的提示文本
+    SENT_INDICATORS = [
+        # 中文
+        "验证码已发送",
+        "请查收你的邮件",
+        "请查收您的邮件",
+        "已发送验证码",
+        "代码已发送",
+        # 英文
+        "Code sent",
+        "code has been sent",
+        "Check your email",
+        "check your inbox",
+    ]
+
+    # snackbar/toast 消息元素
+    TOAST_SELECTORS = [
+        '.mat-snack-bar-container',
+        '.snackbar',
+        '.toast',
+        '[role="alert"]',
+        '.mdc-snackbar',
+        '.notification',
+    ]
+
+    # 页面加载指示器（禁用的按钮表示正在处理）
+    LOADING_SELECTORS = [
+        '[role="progressbar"]',
+        '.loading',
+        '.spinner',
+        '[aria-busy="true"]',
+        'mat-spinner',
+        'mat-progress-spinner',
+        'button[disabled]',
+    ]
+
+    # 预先转为小写的关键词，避免每次轮询重复 lower()
+    _VERIFICATION_KEYWORDS_LOWER = tuple(k.lower() for k in VERIFICATION_KEYWORDS)
+    _ERROR_INDICATORS_LOWER = tuple(k.lower() for k in ERROR_PAGE_INDICATORS)
+    _SENT_INDICATORS_LOWER = tuple(k.lower() for k in SENT_INDICATORS)
+
+    # 各类页面的 URL 匹配正则
+    _SUCCESS_URL_RE = _compile_indicators(LOGIN_SUCCESS_INDICATORS)
+    _VERIFICATION_URL_RE = _compile_indicators(VERIFICATION_PAGE_INDICATORS)
+    _SIGNUP_URL_RE = _compile_indicators(TRIAL_SIGNUP_INDICATORS)
+    _ERROR_URL_RE = _compile_indicators(ERROR_PAGE_INDICATORS)
+    # 登录流程的下一步（成功 / 注册 / 验证码），用于等待导航
+    _NEXT_STEP_URL_RE = _compile_indicators(
+        LOGIN_SUCCESS_INDICATORS + TRIAL_SIGNUP_INDICATORS + VERIFICATION_PAGE_INDICATORS
+    )
+
+    # 在浏览器内查找页面可见文本中的关键词，只返回命中的下标（未命中为 -1），
+    # 避免每次轮询都把整页 HTML 序列化传回 Python
+    _TEXT_PROBE_JS = """(keywords) => {
+        const t = ((document.body && document.body.innerText) || "").toLowerCase();
+        return keywords.findIndex(k => t.includes(k));
+    }"""
+
+    # 由浏览器按固定间隔轮询：页面文本或可见 toast 中出现发送提示时返回 {sent: 下标}，
+    # 已离开验证码页面时返回 {left: true}，否则返回 false 继续等待
+    _WAIT_CODE_SENT_JS = """({sent, toasts, verifyUrls, verifyKeywords}) => {""" + _JS_IS_VISIBLE + """
+        const text = ((document.body && document.body.innerText) || "").toLowerCase();
+        let index = sent.findIndex(k => text.includes(k));
+        if (index >= 0) return {sent: index};
+        for (const el of document.querySelectorAll(toasts)) {
+            if (!isVisible(el)) continue;
+            const toastText = (el.innerText || "").toLowerCase();
+            index = sent.findIndex(k => toastText.includes(k));
+            if (index >= 0) return {sent: index};
+        }
+        if (!verifyUrls.some(u => location.href.includes(u))
+                && !verifyKeywords.some(k => text.includes(k))) {
+            return {left: true};
+        }
+        return false;
+    }"""
+
+    # 是否存在任一可见的加载指示器
+    _IS_LOADING_JS = """(selector) => {""" + _JS_IS_VISIBLE + """
+        return [...document.querySelectorAll(selector)].some(isVisible);
+    }"""
+
+    # 在浏览器内一次性填写 Gemini 验证码输入框，返回可见输入框数量。
+    # 通过原生 value setter 赋值并派发 input/change 事件，让前端框架感知到输入
+    _FILL_CODE_INPUTS_JS = """({selector, code}) => {""" + _JS_IS_VISIBLE + """
+        const inputs = [...document.querySelectorAll(selector)].filter(isVisible);
+        let values;
+        if (inputs.length >= 6) {
+            values = [...code.slice(0, 6)];
+        } else if (inputs.length === 1) {
+            values = [code];
+        } else {
+            return inputs.length;
+        }
+        const setValue = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set;
+        values.forEach((value, i) => {
+            const el = inputs[i];
+            el.focus();
+            setValue.call(el, value);
+            el.dispatchEvent(new Event("input", {bubbles: true}));
+            el.dispatchEvent(new Event("change", {bubbles: true}));
+        });
+        return inputs.length;
+    }"""
+
     def __init__(self, page, email_service, timeout: int = 30000, captcha_service: YesCaptchaService = None):
         """
         初始化登录服务
@@ -107,6 +268,63 @@ class GoogleAutoLogin:
         self.human = HumanBehavior(page)  # 人类行为模拟器
         self.captcha_service = captcha_service  # 打码服务
         self._captcha_interceptor = None  # 验证码拦截器
+        self._login_flavor = None  # 登录页面类型："gemini" 或 "google"，决定验证码页面的输入方式
+
+    async def _find_page_text(self, keywords) -> int:
+        """
+        在页面可见文本中查找关键词（不区分大小写）
+
+        Args:
+            keywords: 已转为小写的关键词序列
+
+        Returns:
+            第一个命中关键词的下标，未命中返回 -1
+        """
+        return await self.page.evaluate(self._TEXT_PROBE_JS, list(keywords))
+
+    async def _wait_for_url(self, predicate, timeout: float) -> bool:
+        """
+        等待页面 URL 满足条件
+
+        由 Playwright 的导航事件驱动，URL 一变化就返回，不需要按秒轮询。
+        URL 已满足条件时立即返回。
+
+        Args:
+            predicate: 接收 URL 字符串的判断函数
+            timeout: 超时时间（秒）
+
+        Returns:
+            是否在超时前满足条件
+        """
+        try:
+            await self.page.wait_for_url(predicate, wait_until="commit", timeout=timeout * 1000)
+            return True
+        except PlaywrightError:
+            return False
+
+    async def _query_first_visible(self, selectors):
+        """
+        并发查询多个选择器，按优先级返回第一个可见元素
+
+        可见性过滤通过 :visible 在浏览器端完成，所有选择器一次并发发出，
+        避免逐个 query_selector + is_visible 的串行往返。
+
+        Args:
+            selectors: 按优先级排列的选择器列表
+
+        Returns:
+            第一个可见的元素，未找到返回 None
+        """
+        results = await asyncio.gather(
+            *(self.page.query_selector(f"{selector}:visible") for selector in selectors),
+            return_exceptions=True,
+        )
+        for elem in results:
+            if isinstance(elem, BaseException) and not isinstance(elem, PlaywrightError):
+                raise elem
+            if elem and not isinstance(elem, PlaywrightError):
+                return elem
+        return None
 
     async def login(self, google_email: str, verification_timeout: int = 120, max_retries: int = 3) -> bool:
         """
@@ -125,38 +343,44 @@ class GoogleAutoLogin:
         print(f"  [登录] 开始自动登录: {google_email}")
         self._current_email = google_email  # 保存当前邮箱用于注册页面
 
-        for retry in range(max_retries):
-            if retry > 0:
-                # 重试时增加等待时间，避免频繁操作
-                wait_time = (retry + 1) * 5
-                print(f"  [登录] 第 {retry + 1} 次重试，等待 {wait_time} 秒...")
-                await asyncio.sleep(wait_time)
+        try:
+            for retry in range(max_retries):
+                if retry > 0:
+                    # 重试时增加等待时间，避免频繁操作
+                    wait_time = (retry + 1) * 5
+                    print(f"  [登录] 第 {retry + 1} 次重试，等待 {wait_time} 秒...")
+                    await asyncio.sleep(wait_time)
 
-            try:
-                result = await self._do_login(google_email, verification_timeout)
-                if result:
-                    return True
-
-                # 检查是否因为错误页面失败
-                if await self._is_error_page():
-                    print(f"  [登录] 检测到错误页面，准备重试...")
-                    await self._handle_error_page()
-                    continue
-                else:
-                    # 其他原因失败，也尝试重试
-                    print(f"  [登录] 登录失败，准备重试...")
-                    continue
+                try:
+                    result = await self._do_login(google_email, verification_timeout)
+                    if result:
+                        return True
 
-            except Exception as e:
-                print(f"  [登录] [!] 登录过程出错: {e}")
-                import traceback
-                traceback.print_exc()
-                if retry < max_retries - 1:
-                    continue
-                return False
+                    # 检查是否因为错误页面失败
+                    if await self._is_error_page():
+                        print(f"  [登录] 检测到错误页面，准备重试...")
+                        await self._handle_error_page()
+                        continue
+                    else:
+                        # 其他原因失败，也尝试重试
+                        print(f"  [登录] 登录失败，准备重试...")
+                        continue
 
-        print(f"  [登录] [!] 达到最大重试次数 ({max_retries})，登录失败")
-        return False
+                except Exception as e:
+                    print(f"  [登录] [!] 登录过程出错: {e}")
+                    # 重试路径上异常频繁，完整堆栈只在 DEBUG 级别输出
+                    logger.debug("登录第 %d 次尝试出错", retry + 1, exc_info=True)
+                    if retry < max_retries - 1:
+                        continue
+                    return False
+
+            print(f"  [登录] [!] 达到最大重试次数 ({max_retries})，登录失败")
+            return False
+        finally:
+            # 拦截器在多次重试间复用，登录流程结束后统一停止
+            if self._captcha_interceptor:
+                self._captcha_interceptor.stop_monitoring()
+                self._captcha_interceptor = None
 
     async def _do_login(self, google_email: str, verification_timeout: int) -> bool:
         """
@@ -171,6 +395,7 @@ class GoogleAutoLogin:
         """
         current_url = self.page.url
         print(f"  [登录] 当前页面: {current_url}")
+        self._login_flavor = None
 
         # 预热浏览器会话，提高 reCAPTCHA 评分
         print(f"  [登录] 预热浏览器会话...")
@@ -213,12 +438,12 @@ class GoogleAutoLogin:
         print(f"  [登录] 跳转后页面: {current_url}")
 
         # 检查是否出现错误页面
-        if await self._is_error_page():
+        if await self._is_error_page(current_url):
             print("  [登录] 输入邮箱后出现错误页面...")
             return False
 
         # 检查是否跳转到注册页面
-        if await self._is_trial_signup_page():
+        if await self._is_trial_signup_page(current_url):
             print("  [登录] 检测到首次使用注册页面...")
             display_name = google_email.split("@")[0] if google_email else "Gemini User"
             if not await self._handle_trial_signup(display_name):
@@ -231,22 +456,29 @@ class GoogleAutoLogin:
         print(f"  [登录] 开始检测验证码页面 (最多等待15秒)...")
 
         # 检查是否需要验证码（可能跳转到 Google 验证码页面）
+        # 登录成功、注册页面、验证码页面的 URL 一出现就立即处理，其余情况每秒检查一次页面文本
         for i in range(15):
-            await asyncio.sleep(1)
+            await self._wait_for_url(self._NEXT_STEP_URL_RE, timeout=1)
             current_url = self.page.url
 
+            # 错误页面和验证码页面都需要探测页面文本，并发执行
+            is_error, is_verification = await asyncio.gather(
+                self._is_error_page(current_url),
+                self._is_verification_page(current_url),
+            )
+
             # 检查是否出现错误页面
-            if await self._is_error_page():
+            if is_error:
                 print("  [登录] 等待过程中检测到错误页面...")
                 return False
 
             # 检查是否已经登录成功
-            if any(indicator in current_url for indicator in self.LOGIN_SUCCESS_INDICATORS):
+            if self._SUCCESS_URL_RE.search(current_url):
                 print("  [登录] 会话有效，无需验证码，登录成功!")
                 return True
 
             # 检查是否在注册页面
-            if await self._is_trial_signup_page():
+            if await self._is_trial_signup_page(current_url):
                 print("  [登录] 检测到首次使用注册页面...")
                 display_name = google_email.split("@")[0] if google_email else "Gemini User"
                 if not await self._handle_trial_signup(display_name):
@@ -254,7 +486,6 @@ class GoogleAutoLogin:
                 break
 
             # 检查是否在验证码页面
-            is_verification = await self._is_verification_page()
             if i % 3 == 0:  # 每3秒输出一次状态
                 print(f"  [登录] 检测验证码页面... [{i+1}/15] 是验证码页面={is_verification}")
 
@@ -314,6 +545,7 @@ class GoogleAutoLogin:
                 await self.page.keyboard.press("Enter")
                 print("  已按回车")
 
+            self._login_flavor = "gemini"
             return True
 
         except Exception as e:
@@ -365,66 +597,66 @@ class GoogleAutoLogin:
                 await self.page.keyboard.press("Enter")
                 print("  已按回车")
 
+            self._login_flavor = "google"
             return True
 
         except Exception as e:
             print(f"  [!] 输入邮箱时出错: {e}")
             return False
 
-    async def _is_verification_page(self) -> bool:
+    async def _is_verification_page(self, url: Optional[str] = None) -> bool:
         """
         检查是否在验证码页面
 
+        Args:
+            url: 调用方已获取的当前 URL（不传则读取 page.url）
+
         Returns:
             是否需要验证码
         """
         try:
-            current_url = self.page.url
+            current_url = url if url is not None else self.page.url
 
             # 检查 URL 是否是验证码页面
-            for indicator in self.VERIFICATION_PAGE_INDICATORS:
-                if indicator in current_url:
-                    return True
+            if self._VERIFICATION_URL_RE.search(current_url):
+                return True
 
             # 检查页面文本
-            page_content = await self.page.content()
-            verification_keywords = [
-                "请输入验证码",
-                "输入验证码",
-                "verification",
-                "verify",
-                "enter the code",
-                "security code",
-                "验证码",
-            ]
-            for keyword in verification_keywords:
-                if keyword.lower() in page_content.lower():
-                    return True
+            if await self._find_page_text(self._VERIFICATION_KEYWORDS_LOWER) >= 0:
+                return True
 
             return False
 
-        except:
+        except PlaywrightError:
             return False
 
-    async def _is_error_page(self) -> bool:
+    async def _is_error_page(self, url: Optional[str] = None) -> bool:
         """
         检查是否在错误页面（被检测到自动化）
 
+        Args:
+            url: 调用方已获取的当前 URL（不传则读取 page.url）
+
         Returns:
             是否在错误页面
         """
         try:
-            current_url = self.page.url
-            page_content = await self.page.content()
+            current_url = url if url is not None else self.page.url
 
-            # 检查 URL 和页面内容
-            for indicator in self.ERROR_PAGE_INDICATORS:
-                if indicator in current_url or indicator in page_content:
-                    print(f"  [!] 检测到错误页面: {indicator}")
-                    return True
+            # 先检查 URL（无需访问浏览器）
+            match = self._ERROR_URL_RE.search(current_url)
+            if match:
+                print(f"  [!] 检测到错误页面: {match.group(0)}")
+                return True
+
+            # 再检查页面内容
+            index = await self._find_page_text(self._ERROR_INDICATORS_LOWER)
+            if index >= 0:
+                print(f"  [!] 检测到错误页面: {self.ERROR_PAGE_INDICATORS[index]}")
+                return True
 
             return False
-        except:
+        except PlaywrightError:
             return False
 
     async def _handle_error_page(self) -> bool:
@@ -438,25 +670,13 @@ class GoogleAutoLogin:
             print("  [错误] 尝试从错误页面恢复...")
 
             # 查找"注册或登录"按钮
-            retry_selectors = [
-                'button:has-text("注册或登录")',
-                'button:has-text("Sign in")',
-                'button:has-text("登录")',
-                'a:has-text("注册或登录")',
-                'a:has-text("Sign in")',
-            ]
-
-            for selector in retry_selectors:
-                try:
-                    btn = await self.page.query_selector(selector)
-                    if btn and await btn.is_visible():
-                        await self.human.wait_random(1000, 2000)
-                        await self.human.human_click(btn)
-                        print(f"  [错误] 已点击返回按钮")
-                        await self.human.wait_random(2000, 4000)
-                        return True
-                except:
-                    continue
+            btn = await self._query_first_visible(self.SELECTORS["error_retry_buttons"])
+            if btn:
+                await self.human.wait_random(1000, 2000)
+                await self.human.human_click(btn)
+                print(f"  [错误] 已点击返回按钮")
+                await self.human.wait_random(2000, 4000)
+                return True
 
             # 尝试返回上一页
             print("  [错误] 未找到返回按钮，尝试返回上一页...")
@@ -482,8 +702,14 @@ class GoogleAutoLogin:
         """
         print("  [验证] 进入验证码处理流程...")
 
-        # 如果配置了打码服务，启动验证码拦截器
-        if self.captcha_service:
+        # 如果配置了打码服务，启动验证码拦截器（同一次登录的多次重试共用一个）
+        if self._captcha_interceptor:
+            # 丢弃两次尝试之间收到的响应状态
+            self._captcha_interceptor.reset()
+            # 上一次尝试检测到验证码发送后监听已取消，需要重新挂载
+            if not self._captcha_interceptor.is_monitoring:
+                await self._captcha_interceptor.start_monitoring()
+        elif self.captcha_service:
             print("  [验证] 已配置 YesCaptcha 打码服务，启动网络监控...")
             self._captcha_interceptor = CaptchaInterceptor(self.page, self.captcha_service)
             await self._captcha_interceptor.start_monitoring()
@@ -525,13 +751,23 @@ class GoogleAutoLogin:
             else:
                 print(f"  [验证] [警告] 未指定目标邮箱，将匹配任意验证码!")
 
+            # 等待邮件期间同时等待验证码输入框就绪，拿到验证码后可以直接输入
+            inputs_ready = asyncio.ensure_future(self._wait_for_code_inputs(timeout))
+
             # 从邮箱获取验证码（异步调用，不阻塞事件循环）
             print(f"  [验证] 开始从 QQ 邮箱获取验证码 (超时={timeout}秒)...")
-            code = await self.email_service.fetch_verification_code(
-                timeout=timeout,
-                since_time=actual_request_time,
-                target_email=email_to_match
-            )
+            try:
+                code = await self.email_service.fetch_verification_code(
+                    timeout=timeout,
+                    since_time=actual_request_time,
+                    target_email=email_to_match
+                )
+                if code and not inputs_ready.done():
+                    # 验证码先到，再给输入框一点渲染时间
+                    await asyncio.wait({inputs_ready}, timeout=3)
+            finally:
+                if not inputs_ready.done():
+                    inputs_ready.cancel()
 
             if not code:
                 print("  [验证] [!] 未能获取到验证码!")
@@ -544,10 +780,9 @@ class GoogleAutoLogin:
             return await self._enter_verification_code(code)
 
         finally:
-            # 停止拦截器
+            # 清空本次尝试的状态（拦截器留给下一次重试复用）
             if self._captcha_interceptor:
-                self._captcha_interceptor.stop_monitoring()
-                self._captcha_interceptor = None
+                self._captcha_interceptor.reset()
 
     async def _wait_for_resend_button(self, timeout: int = 30) -> bool:
         """
@@ -562,69 +797,70 @@ class GoogleAutoLogin:
         Returns:
             是否检测到发送成功提示
         """
-        # 验证码已发送的提示文本
-        sent_indicators = [
-            # 中文
-            "验证码已发送",
-            "请查收你的邮件",
-            "请查收您的邮件",
-            "已发送验证码",
-            "代码已发送",
-            # 英文
-            "Code sent",
-            "code has been sent",
-            "Check your email",
-            "check your inbox",
-        ]
-
-        start_time = time.time()
-
-        while time.time() - start_time < timeout:
-            try:
-                # 获取页面文本内容
-                page_content = await self.page.content()
+        try:
+            # 检查逻辑全部在浏览器内执行，Python 侧只等待一个结果
+            handle = await self.page.wait_for_function(
+                self._WAIT_CODE_SENT_JS,
+                arg={
+                    "sent": list(self._SENT_INDICATORS_LOWER),
+                    "toasts": ", ".join(self.TOAST_SELECTORS),
+                    "verifyUrls": self.VERIFICATION_PAGE_INDICATORS,
+                    "verifyKeywords": list(self._VERIFICATION_KEYWORDS_LOWER),
+                },
+                polling=500,
+                timeout=timeout * 1000,
+            )
+            result = await handle.json_value()
+        except PlaywrightError:
+            result = None
 
-                # 检查是否包含发送成功的提示
-                for indicator in sent_indicators:
-                    if indicator.lower() in page_content.lower():
-                        print(f"  检测到: {indicator}")
-                        return True
+        if result and "sent" in result:
+            print(f"  检测到: {self.SENT_INDICATORS[result['sent']]}")
+            return True
 
-                # 也检查 snackbar/toast 消息元素
-                toast_selectors = [
-                    '.mat-snack-bar-container',
-                    '.snackbar',
-                    '.toast',
-                    '[role="alert"]',
-                    '.mdc-snackbar',
-                    '.notification',
-                ]
+        if result and result.get("left"):
+            print(f"  页面已跳转，停止等待")
+            return False
 
-                for selector in toast_selectors:
-                    try:
-                        elem = await self.page.query_selector(selector)
-                        if elem and await elem.is_visible():
-                            text = await elem.text_content()
-                            if text:
-                                for indicator in sent_indicators:
-                                    if indicator.lower() in text.lower():
-                                        print(f"  检测到消息: {indicator}")
-                                        return True
-                    except:
-                        continue
+        print(f"  等待发送提示超时 ({timeout}秒)，尝试继续...")
+        return False
 
-            except:
-                pass
+    def _resolve_login_flavor(self) -> str:
+        """
+        获取当前登录页面类型
 
-            # 检查是否还在验证码页面
-            if not await self._is_verification_page():
-                print(f"  页面已跳转，停止等待")
-                return False
+        Returns:
+            "gemini" 或 "google"
+        """
+        if self._login_flavor is not None:
+            return self._login_flavor
+        # 未经过输入邮箱步骤时，根据 URL 判断
+        current_url = self.page.url
+        print(f"  验证码页面: {current_url[:60]}...")
+        return "gemini" if "accountverification.business.gemini.google" in current_url else "google"
 
-            await asyncio.sleep(0.5)
+    async def _wait_for_code_inputs(self, timeout: float) -> bool:
+        """
+        等待验证码输入框可见
 
-        print(f"  等待发送提示超时 ({timeout}秒)，尝试继续...")
-        return False
+        Args:
+            timeout: 超时时间（秒）
+
+        Returns:
+            输入框是否已就绪
+        """
+        if self._resolve_login_flavor() == "gemini":
+            selectors = [self.SELECTORS["gemini_verification_inputs"]]
+        else:
+            selectors = self.SELECTORS["verification_inputs"]
+        try:
+            await self.page.wait_for_selector(
+                ", ".join(f"{selector}:visible" for selector in selectors),
+                timeout=timeout * 1000,
+            )
+            return True
+        except PlaywrightError:
+            return False
 
     async def _enter_verification_code(self, code: str) -> bool:
         """
@@ -637,11 +873,8 @@ class GoogleAutoLogin:
             是否成功
         """
         try:
-            current_url = self.page.url
-            print(f"  验证码页面: {current_url[:60]}...")
-
             # Gemini Business 验证码页面（6个独立输入框）
-            if "accountverification.business.gemini.google" in current_url:
+            if self._resolve_login_flavor() == "gemini":
                 return await self._enter_verification_code_gemini(code)
             else:
                 # Google 标准验证码页面
@@ -666,47 +899,37 @@ class GoogleAutoLogin:
         try:
             print(f"  在 Gemini 验证码页面输入: {code}")
 
-            # 等待输入框出现
-            await asyncio.sleep(1)
-
-            # 获取所有文本输入框
-            inputs = await self.page.query_selector_all('input[type="text"]')
-            visible_inputs = []
-            for inp in inputs:
-                if await inp.is_visible():
-                    visible_inputs.append(inp)
+            # 在浏览器内筛选可见输入框并一次性填入验证码
+            inputs_selector = self.SELECTORS["gemini_verification_inputs"]
+            input_count = await self.page.evaluate(
+                self._FILL_CODE_INPUTS_JS,
+                {"selector": inputs_selector, "code": code},
+            )
 
-            print(f"  找到 {len(visible_inputs)} 个输入框")
+            print(f"  找到 {input_count} 个输入框")
 
-            if len(visible_inputs) >= 6:
-                # 逐个输入每个字符
-                for i, char in enumerate(code[:6]):
-                    await visible_inputs[i].fill(char)
-                    await asyncio.sleep(0.1)
-                print(f"  已输入验证码: {code}")
-            elif len(visible_inputs) == 1:
-                # 只有一个输入框，直接输入整个验证码
-                await visible_inputs[0].fill(code)
+            if input_count >= 6 or input_count == 1:
                 print(f"  已输入验证码: {code}")
             else:
-                print(f"  [!] 输入框数量异常: {len(visible_inputs)}")
+                print(f"  [!] 输入框数量异常: {input_count}")
                 return False
 
+            # 留出一帧让前端框架处理输入事件
             await asyncio.sleep(0.5)
 
             # 点击验证按钮
-            verify_button = await self.page.query_selector('button:has-text("验证")')
-            if not verify_button:
-                verify_button = await self.page.query_selector('button[type="submit"]')
+            verify_button = await self._query_first_visible([
+                self.SELECTORS["gemini_verify_button"],
+                'button[type="submit"]',
+            ])
 
-            if verify_button and await verify_button.is_visible():
+            if verify_button:
                 await verify_button.click()
                 print("  已点击验证按钮")
             else:
-                # 尝试按回车
-                if visible_inputs:
-                    await visible_inputs[-1].press("Enter")
-                    print("  已按回车")
+                # 尝试在最后一个输入框按回车
+                await self.page.locator(f"{inputs_selector}:visible").last.press("Enter")
+                print("  已按回车")
 
             # 等待响应
             await asyncio.sleep(3)
@@ -730,40 +953,31 @@ class GoogleAutoLogin:
         try:
             print(f"  在 Google 验证码页面输入: {code}")
 
-            # 尝试多个可能的输入框选择器
-            for selector in self.SELECTORS["verification_inputs"]:
-                try:
-                    input_elem = await self.page.query_selector(selector)
-                    if input_elem and await input_elem.is_visible():
-                        await input_elem.fill("")
-                        await asyncio.sleep(0.3)
-                        await input_elem.fill(code)
-                        await asyncio.sleep(0.5)
-                        print(f"  已输入验证码: {code}")
-
-                        # 尝试找到并点击下一步/验证按钮
-                        for btn_selector in self.SELECTORS["verification_next_buttons"]:
-                            try:
-                                btn = await self.page.query_selector(btn_selector)
-                                if btn and await btn.is_visible():
-                                    await btn.click()
-                                    print("  已点击验证按钮")
-                                    break
-                            except:
-                                continue
-                        else:
-                            # 尝试按回车
-                            await input_elem.press("Enter")
-                            print("  已按回车")
-
-                        # 等待响应
-                        await asyncio.sleep(3)
-                        return True
-                except:
-                    continue
+            # 并发尝试多个可能的输入框选择器
+            input_elem = await self._query_first_visible(self.SELECTORS["verification_inputs"])
+            if not input_elem:
+                print("  [!] 未找到验证码输入框")
+                return False
 
-            print("  [!] 未找到验证码输入框")
-            return False
+            await input_elem.fill("")
+            await asyncio.sleep(0.3)
+            await input_elem.fill(code)
+            await asyncio.sleep(0.5)
+            print(f"  已输入验证码: {code}")
+
+            # 尝试找到并点击下一步/验证按钮
+            btn = await self._query_first_visible(self.SELECTORS["verification_next_buttons"])
+            if btn:
+                await btn.click()
+                print("  已点击验证按钮")
+            else:
+                # 尝试按回车
+                await input_elem.press("Enter")
+                print("  已按回车")
+
+            # 等待响应
+            await asyncio.sleep(3)
+            return True
 
         except Exception as e:
             print(f"  [!] Google 验证码输入出错: {e}")
@@ -783,48 +997,59 @@ class GoogleAutoLogin:
 
         trial_signup_handled = False  # 标记是否已处理过注册页面
 
-        for i in range(timeout):
-            await asyncio.sleep(1)
+        def is_next_step(url: str) -> bool:
+            if self._SUCCESS_URL_RE.search(url):
+                return True
+            return not trial_signup_handled and bool(self._SIGNUP_URL_RE.search(url))
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        while True:
             current_url = self.page.url
 
             # 检查是否登录成功
-            for indicator in self.LOGIN_SUCCESS_INDICATORS:
-                if indicator in current_url:
-                    print("  登录成功!")
-                    return True
+            if self._SUCCESS_URL_RE.search(current_url):
+                print("  登录成功!")
+                return True
 
             # 检查是否在首次注册页面（只处理一次）
-            if not trial_signup_handled and await self._is_trial_signup_page():
+            if not trial_signup_handled and await self._is_trial_signup_page(current_url):
                 print("  检测到首次使用注册页面...")
                 # 使用存储的邮箱前缀作为显示名称
                 display_name = self._current_email.split("@")[0] if self._current_email else "Gemini User"
                 if await self._handle_trial_signup(display_name):
-                    # 注册成功，标记为已处理，等待页面跳转
+                    # 注册成功，标记为已处理，继续等待页面跳转
                     trial_signup_handled = True
                     print("  等待页面跳转...")
-                    # 额外等待几秒让页面跳转
-                    await asyncio.sleep(3)
                     continue
                 else:
                     return False
 
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+
+            # 由导航事件驱动，URL 满足条件时立即返回
+            await self._wait_for_url(is_next_step, timeout=remaining)
+
         print("  [!] 等待登录成功超时")
         return False
 
-    async def _is_trial_signup_page(self) -> bool:
+    async def _is_trial_signup_page(self, url: Optional[str] = None) -> bool:
         """
         检查是否在首次使用注册页面
 
+        Args:
+            url: 调用方已获取的当前 URL（不传则读取 page.url）
+
         Returns:
             是否在注册页面
         """
         try:
-            current_url = self.page.url
-            for indicator in self.TRIAL_SIGNUP_INDICATORS:
-                if indicator in current_url:
-                    return True
-            return False
-        except:
+            current_url = url if url is not None else self.page.url
+            return bool(self._SIGNUP_URL_RE.search(current_url))
+        except PlaywrightError:
             return False
 
     async def _handle_trial_signup(self, display_name: str = None) -> bool:
@@ -849,25 +1074,7 @@ class GoogleAutoLogin:
                 display_name = "Gemini User"
 
             # 查找姓名输入框（多种可能的选择器）
-            name_input_selectors = [
-                'input[type="text"]',           # 通用文本输入框
-                'input[name="name"]',           # name 属性
-                'input[placeholder*="名"]',     # 包含"名"的占位符
-                'input[aria-label*="名"]',      # aria-label 包含"名"
-            ]
-
-            name_input = None
-            for selector in name_input_selectors:
-                try:
-                    inputs = await self.page.query_selector_all(selector)
-                    for inp in inputs:
-                        if await inp.is_visible():
-                            name_input = inp
-                            break
-                    if name_input:
-                        break
-                except:
-                    continue
+            name_input = await self._query_first_visible(self.SELECTORS["trial_name_inputs"])
 
             if name_input:
                 # 清空并输入名称
@@ -880,24 +1087,7 @@ class GoogleAutoLogin:
                 print("  [!] 未找到名称输入框，尝试继续...")
 
             # 查找并点击"同意并开始使用"按钮
-            submit_button_selectors = [
-                'button:has-text("同意并开始使用")',
-                'button:has-text("同意")',
-                'button:has-text("开始")',
-                'button:has-text("Start")',
-                'button:has-text("Agree")',
-                'button[type="submit"]',
-            ]
-
-            submit_button = None
-            for selector in submit_button_selectors:
-                try:
-                    btn = await self.page.query_selector(selector)
-                    if btn and await btn.is_visible():
-                        submit_button = btn
-                        break
-                except:
-                    continue
+            submit_button = await self._query_first_visible(self.SELECTORS["trial_submit_buttons"])
 
             if submit_button:
                 await submit_button.click()
@@ -912,77 +1102,12 @@ class GoogleAutoLogin:
                     return False
 
             # 智能等待页面跳转：持续等待直到离开注册页面
-            print("  等待页面跳转...")
-            max_wait = 120  # 最长等待2分钟
-
-            for i in range(max_wait):
-                await asyncio.sleep(1)
-                current_url = self.page.url
-
-                # 检查是否已离开注册页面
-                if "admin/create" not in current_url:
-                    if any(indicator in current_url for indicator in self.LOGIN_SUCCESS_INDICATORS):
-                        print("  注册成功，已进入 Gemini Business")
-                        return True
-                    elif "business.gemini.google" in current_url:
-                        print("  注册成功，页面已跳转")
-                        return True
-                    else:
-                        # 跳转到其他页面
-                        print(f"  页面已跳转: {current_url[:50]}...")
-                        return True
-
-                # 检测页面是否有变化或正在加载
-                is_loading = await self._is_page_loading()
-
-                # 每10秒报告一次状态
-                if i > 0 and i % 10 == 0:
-                    status = "页面加载中..." if is_loading else "等待跳转..."
-                    print(f"  {status} ({i}秒)")
-
-            # 超时
-            print(f"  [!] 等待页面跳转超时 ({max_wait}秒)")
-            return False
+            return await _wait_trial_signup_done(self.page)
 
         except Exception as e:
             print(f"  [!] 处理注册页面出错: {e}")
             return False
 
-    async def _is_page_loading(self) -> bool:
-        """
-        检测页面是否正在加载
-
-        Returns:
-            是否正在加载
-        """
-        try:
-            # 检测常见的加载指示器
-            loading_selectors = [
-                '[role="progressbar"]',
-                '.loading',
-                '.spinner',
-                '[aria-busy="true"]',
-                'mat-spinner',
-                'mat-progress-spinner',
-            ]
-
-            for selector in loading_selectors:
-                try:
-                    elem = await self.page.query_selector(selector)
-                    if elem and await elem.is_visible():
-                        return True
-                except:
-                    continue
-
-            # 检测按钮是否被禁用（表示正在处理）
-            disabled_button = await self.page.query_selector('button[disabled]')
-            if disabled_button and await disabled_button.is_visible():
-                return True
-
-            return False
-        except:
-            return False
-
 
 async def _safe_goto(page, url: str, max_retries: int = 3, **kwargs) -> bool:
     """
@@ -1029,6 +1154,159 @@ async def _safe_goto(page, url: str, max_retries: int = 3, **kwargs) -> bool:
     return False
 
 
+# 欢迎引导弹窗的检测选择器
+WELCOME_DIALOG_SELECTORS = [
+    'div[role="dialog"]',
+    '[role="dialog"]',
+    '.mdc-dialog',
+    '.mat-dialog-container',
+    'div[class*="dialog"]',
+    'div[class*="modal"]',
+    # 根据弹窗内容检测
+    'div:has-text("从您的数据中获取答案")',
+    'div:has-text("关联您的数据")',
+]
+
+# 关闭欢迎引导弹窗的按钮选择器（按优先级排列）
+WELCOME_DISMISS_SELECTORS = [
+    # "以后再执行此操作" 按钮 - 各种可能的选择器
+    'button:has-text("以后再执行此操作")',
+    'button:has-text("以后再")',
+    'button:has-text("稍后")',
+    'button:has-text("跳过")',
+    'button:has-text("取消")',
+    'button:has-text("Skip")',
+    'button:has-text("Later")',
+    'button:has-text("Cancel")',
+    'button:has-text("Not now")',
+    'button:has-text("Maybe later")',
+    # 根据按钮样式（非主要按钮通常是跳过）
+    'button.mdc-button--outlined',
+    'button[class*="secondary"]',
+    'button[class*="text-button"]',
+    # 弹窗内的第一个按钮
+    'div[role="dialog"] button:first-of-type',
+    '.mdc-dialog button:first-of-type',
+    '.mat-dialog-actions button:first-of-type',
+]
+
+# 任一欢迎弹窗可见（Playwright 选择器，用于条件等待）
+_WELCOME_DIALOG_VISIBLE = ", ".join(f"{selector}:visible" for selector in WELCOME_DIALOG_SELECTORS)
+
+_HAS_TEXT_RE = re.compile(r':has-text\("([^"]*)"\)')
+
+# 浏览器端按优先级查找第一个可见元素的下标（未找到为 -1）。
+# 每项为 [css, text]，text 非空时要求元素文本包含该文字（对应 Playwright 的 :has-text，不区分大小写）
+_FIRST_VISIBLE_INDEX_JS = """(candidates) => {""" + _JS_IS_VISIBLE + """
+    for (let i = 0; i < candidates.length; i++) {
+        const [css, text] = candidates[i];
+        for (const el of document.querySelectorAll(css)) {
+            if (!isVisible(el)) continue;
+            if (text && !(el.textContent || "").toLowerCase().includes(text)) continue;
+            return i;
+        }
+    }
+    return -1;
+}"""
+
+
+def _split_has_text(selector: str) -> list:
+    """将 Playwright 选择器拆成 [纯 CSS, :has-text 文本]，供浏览器端查找使用"""
+    match = _HAS_TEXT_RE.search(selector)
+    if not match:
+        return [selector, ""]
+    return [_HAS_TEXT_RE.sub("", selector), match.group(1).lower()]
+
+
+async def _first_visible_index(page, selectors) -> int:
+    """
+    一次 page.evaluate 按优先级查找第一个可见元素
+
+    Args:
+        page: Playwright 页面对象
+        selectors: 按优先级排列的选择器列表（支持 :has-text）
+
+    Returns:
+        命中的选择器下标，未找到返回 -1
+    """
+    return await page.evaluate(
+        _FIRST_VISIBLE_INDEX_JS, [_split_has_text(selector) for selector in selectors]
+    )
+
+
+async def _wait_welcome_dialog_closed(page, timeout: int):
+    """等待欢迎弹窗消失（毫秒超时，超时不报错）"""
+    try:
+        await page.wait_for_selector(_WELCOME_DIALOG_VISIBLE, state="detached", timeout=timeout)
+    except PlaywrightError:
+        pass
+
+
+async def _wait_for_page_settled(page, timeout: int = 3000):
+    """等待页面跳转后加载完成（毫秒超时，超时不报错），代替固定等待"""
+    try:
+        await page.wait_for_load_state("load", timeout=timeout)
+    except PlaywrightError:
+        pass
+
+
+async def _is_page_loading(page) -> bool:
+    """检测页面是否正在加载（任一加载指示元素可见）"""
+    try:
+        return await page.evaluate(
+            GoogleAutoLogin._IS_LOADING_JS, ", ".join(GoogleAutoLogin.LOADING_SELECTORS)
+        )
+    except PlaywrightError:
+        return False
+
+
+async def _wait_trial_signup_done(page, max_wait: int = 120) -> bool:
+    """
+    提交试用注册后等待离开注册页面，并按跳转后的 URL 输出结果
+
+    由导航事件驱动，离开注册页面时立即返回；GoogleAutoLogin._handle_trial_signup
+    与 _handle_trial_signup_page 共用，成功页面的判断统一使用 _SUCCESS_URL_RE
+
+    Args:
+        page: Playwright 页面对象
+        max_wait: 最长等待时间（秒）
+
+    Returns:
+        是否在超时前离开了注册页面
+    """
+    print("  等待页面跳转...")
+
+    async def report_status():
+        # 每10秒报告一次状态
+        for elapsed in range(10, max_wait, 10):
+            await asyncio.sleep(10)
+            status = "页面加载中..." if await _is_page_loading(page) else "等待跳转..."
+            print(f"  {status} ({elapsed}秒)")
+
+    reporter = asyncio.ensure_future(report_status())
+    try:
+        await page.wait_for_url(
+            lambda url: "admin/create" not in url,
+            wait_until="commit",
+            timeout=max_wait * 1000,
+        )
+    except PlaywrightError:
+        print(f"  [!] 等待页面跳转超时 ({max_wait}秒)")
+        return False
+    finally:
+        reporter.cancel()
+
+    current_url = page.url
+    if GoogleAutoLogin._SUCCESS_URL_RE.search(current_url):
+        print("  注册成功，已进入 Gemini Business")
+    elif "business.gemini.google" in current_url:
+        print("  注册成功，页面已跳转")
+    else:
+        # 跳转到其他页面
+        print(f"  页面已跳转: {current_url[:50]}...")
+    return True
+
+
 async def _dismiss_welcome_dialog(page) -> bool:
     """
     关闭 Gemini Business 的欢迎引导弹窗（"从您的数据中获取答案"）
@@ -1040,84 +1318,35 @@ async def _dismiss_welcome_dialog(page) -> bool:
         是否成功关闭（如果没有弹窗也返回 True）
     """
     try:
-        # 等待页面稳定
-        await asyncio.sleep(2)
-
-        # 多种弹窗检测选择器
-        dialog_selectors = [
-            'div[role="dialog"]',
-            '[role="dialog"]',
-            '.mdc-dialog',
-            '.mat-dialog-container',
-            'div[class*="dialog"]',
-            'div[class*="modal"]',
-            # 根据弹窗内容检测
-            'div:has-text("从您的数据中获取答案")',
-            'div:has-text("关联您的数据")',
-        ]
-
-        dialog = None
-        for selector in dialog_selectors:
-            try:
-                elem = await page.query_selector(selector)
-                if elem and await elem.is_visible():
-                    dialog = elem
-                    print(f"  检测到弹窗 (选择器: {selector[:30]}...)")
-                    break
-            except:
-                continue
-
-        if not dialog:
-            # 没有检测到弹窗，尝试直接查找关闭按钮
+        # 等待弹窗出现（出现即返回，最多 2.5 秒）
+        try:
+            await page.wait_for_selector(_WELCOME_DIALOG_VISIBLE, timeout=2500)
+            print("  检测到弹窗")
+        except PlaywrightError:
             pass
 
-        # 尝试多种方式关闭弹窗
-        dismiss_selectors = [
-            # "以后再执行此操作" 按钮 - 各种可能的选择器
-            'button:has-text("以后再执行此操作")',
-            'button:has-text("以后再")',
-            'button:has-text("稍后")',
-            'button:has-text("跳过")',
-            'button:has-text("取消")',
-            'button:has-text("Skip")',
-            'button:has-text("Later")',
-            'button:has-text("Cancel")',
-            'button:has-text("Not now")',
-            'button:has-text("Maybe later")',
-            # 根据按钮样式（非主要按钮通常是跳过）
-            'button.mdc-button--outlined',
-            'button[class*="secondary"]',
-            'button[class*="text-button"]',
-            # 弹窗内的第一个按钮
-            'div[role="dialog"] button:first-of-type',
-            '.mdc-dialog button:first-of-type',
-            '.mat-dialog-actions button:first-of-type',
-        ]
-
-        for selector in dismiss_selectors:
+        # 尝试多种方式关闭弹窗（一次查询出第一个可见的关闭按钮）
+        index = await _first_visible_index(page, WELCOME_DISMISS_SELECTORS)
+        if index >= 0:
+            btn = page.locator(f"{WELCOME_DISMISS_SELECTORS[index]}:visible").first
             try:
-                btn = await page.query_selector(selector)
-                if btn and await btn.is_visible():
-                    try:
-                        btn_text = await btn.inner_text()
-                        btn_text = btn_text.strip()[:30]
-                    except:
-                        btn_text = "(无法获取文本)"
-
-                    print(f"  找到按钮: {btn_text}")
-                    await btn.click()
-                    await asyncio.sleep(2)
-                    print(f"  已点击关闭按钮")
-                    return True
-            except Exception as e:
-                continue
+                btn_text = await btn.inner_text()
+                btn_text = btn_text.strip()[:30]
+            except PlaywrightError:
+                btn_text = "(无法获取文本)"
+
+            print(f"  找到按钮: {btn_text}")
+            await btn.click()
+            await _wait_welcome_dialog_closed(page, timeout=2000)
+            print(f"  已点击关闭按钮")
+            return True
 
         # 尝试按 Escape 键关闭
         try:
             print(f"  尝试按 Escape 关闭...")
             await page.keyboard.press("Escape")
-            await asyncio.sleep(1)
-        except:
+            await _wait_welcome_dialog_closed(page, timeout=1000)
+        except PlaywrightError:
             pass
 
         return True  # 即使没关闭也继续
@@ -1141,29 +1370,21 @@ async def _handle_trial_signup_page(page, display_name: str = "Gemini User") ->
     try:
         print("  正在处理 Gemini Business 试用注册...")
 
-        # 等待页面加载
-        await asyncio.sleep(1)
+        name_selectors = GoogleAutoLogin.SELECTORS["trial_name_inputs"]
+        submit_selectors = GoogleAutoLogin.SELECTORS["trial_submit_buttons"]
 
-        # 查找姓名输入框（多种可能的选择器）
-        name_input_selectors = [
-            'input[type="text"]',           # 通用文本输入框
-            'input[name="name"]',           # name 属性
-            'input[placeholder*="名"]',     # 包含"名"的占位符
-            'input[aria-label*="名"]',      # aria-label 包含"名"
-        ]
+        # 等待任一名称输入框可见（由浏览器端轮询，出现即返回，代替固定等待）
+        name_ready = page.locator(
+            ", ".join(f"{selector}:visible" for selector in name_selectors)
+        ).first
+        try:
+            await name_ready.wait_for(state="visible", timeout=5000)
+        except PlaywrightError:
+            pass
 
-        name_input = None
-        for selector in name_input_selectors:
-            try:
-                inputs = await page.query_selector_all(selector)
-                for inp in inputs:
-                    if await inp.is_visible():
-                        name_input = inp
-                        break
-                if name_input:
-                    break
-            except:
-                continue
+        # 查找姓名输入框（多种可能的选择器，一次查询）
+        index = await _first_visible_index(page, name_selectors)
+        name_input = page.locator(f"{name_selectors[index]}:visible").first if index >= 0 else None
 
         if name_input:
             # 清空并输入名称
@@ -1176,24 +1397,8 @@ async def _handle_trial_signup_page(page, display_name: str = "Gemini User") ->
             print("  [!] 未找到名称输入框，尝试继续...")
 
         # 查找并点击"同意并开始使用"按钮
-        submit_button_selectors = [
-            'button:has-text("同意并开始使用")',
-            'button:has-text("同意")',
-            'button:has-text("开始")',
-            'button:has-text("Start")',
-            'button:has-text("Agree")',
-            'button[type="submit"]',
-        ]
-
-        submit_button = None
-        for selector in submit_button_selectors:
-            try:
-                btn = await page.query_selector(selector)
-                if btn and await btn.is_visible():
-                    submit_button = btn
-                    break
-            except:
-                continue
+        index = await _first_visible_index(page, submit_selectors)
+        submit_button = page.locator(f"{submit_selectors[index]}:visible").first if index >= 0 else None
 
         if submit_button:
             await submit_button.click()
@@ -1208,36 +1413,7 @@ async def _handle_trial_signup_page(page, display_name: str = "Gemini User") ->
                 return False
 
         # 智能等待页面跳转：持续等待直到离开注册页面
-        print("  等待页面跳转...")
-        success_indicators = [
-            "business.gemini.google/home",
-            "business.gemini.google/cid",
-        ]
-        max_wait = 120  # 最长等待2分钟
-
-        for i in range(max_wait):
-            await asyncio.sleep(1)
-            current_url = page.url
-
-            # 检查是否已离开注册页面
-            if "admin/create" not in current_url:
-                if any(indicator in current_url for indicator in success_indicators):
-                    print("  注册成功，已进入 Gemini Business")
-                    return True
-                elif "business.gemini.google" in current_url:
-                    print("  注册成功，页面已跳转")
-                    return True
-                else:
-                    print(f"  页面已跳转: {current_url[:50]}...")
-                    return True
-
-            # 每10秒报告一次状态
-            if i > 0 and i % 10 == 0:
-                print(f"  等待跳转... ({i}秒)")
-
-        # 超时
-        print(f"  [!] 等待页面跳转超时 ({max_wait}秒)")
-        return False
+        return await _wait_trial_signup_done(page)
 
     except Exception as e:
         print(f"  [!] 处理注册页面出错: {e}")
@@ -1269,7 +1445,11 @@ class AutoLoginService:
         # 初始化 YesCaptcha 打码服务（如果配置了 API key）
         yescaptcha_api_key = config.get("yescaptcha_api_key", "")
         if yescaptcha_api_key:
-            self._captcha_service = YesCaptchaService(yescaptcha_api_key)
+            self._captcha_service = YesCaptchaService(
+                yescaptcha_api_key,
+                max_concurrent=config.get("yescaptcha_max_concurrent", 3),
+                pool_size=config.get("yescaptcha_token_pool_size", 0)
+            )
             print(f"  [YesCaptcha] 打码服务已初始化")
         else:
             self._captcha_service = None
@@ -1327,7 +1507,7 @@ class AutoLoginService:
             timezone_id="Asia/Shanghai",
         )
 
-        # 注入反检测脚本
+        # 注入反检测脚本（页面级脚本一并注入，新页面无需再单独注入）
         await context.add_init_script("""
             // 隐藏 webdriver 属性
             Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
@@ -1348,7 +1528,7 @@ class AutoLoginService:
                     Promise.resolve({ state: Notification.permission }) :
                     originalQuery(parameters)
             );
-        """)
+        """ + PAGE_STEALTH_SCRIPT)
 
         return context
 
@@ -1385,21 +1565,18 @@ class AutoLoginService:
 
         # 创建邮件服务
         email_service = EmailVerificationService(self.qq_email_config)
-        if not await email_service.connect():
-            print("  [!] 无法连接到邮箱")
-            return None
-
         page = None
         context = None
 
         try:
+            if not await email_service.connect():
+                print("  [!] 无法连接到邮箱")
+                return None
+
             # 为每个账号创建独立的浏览器上下文（隔离 cookie）
             context = await self._create_stealth_context()
             page = await context.new_page()
 
-            # 注入额外的反检测脚本
-            await inject_stealth_scripts(page)
-
             # 构造目标 URL
             target_url = f"https://business.gemini.google/home/cid/{account.team_id}"
             if account.csesidx:
@@ -1420,7 +1597,7 @@ class AutoLoginService:
                 display_name = account.note or google_email.split("@")[0]
                 if not await _handle_trial_signup_page(page, display_name):
                     return None
-                await asyncio.sleep(3)
+                await _wait_for_page_settled(page)
                 current_url = page.url
 
             # 检查是否需要登录
@@ -1455,7 +1632,7 @@ class AutoLoginService:
                 display_name = account.note or google_email.split("@")[0]
                 if not await _handle_trial_signup_page(page, display_name):
                     return None
-                await asyncio.sleep(3)
+                await _wait_for_page_settled(page)
                 current_url = page.url
 
             # 等待进入聊天页面
@@ -1504,6 +1681,8 @@ class AutoLoginService:
             for cookie in cookies:
                 if cookie["name"] == "__Secure-C_SES":
                     credentials["secure_c_ses"] = cookie["value"]
+                    if cookie.get("expires", -1) > 0:
+                        credentials["expires_at"] = datetime.fromtimestamp(cookie["expires"]).isoformat()
                 elif cookie["name"] == "__Host-C_OSES":
                     credentials["host_c_oses"] = cookie["value"]
 
@@ -1554,23 +1733,20 @@ class AutoLoginService:
         # 创建邮件服务
         print(f"  [注册] 正在连接 QQ 邮箱...")
         email_service = EmailVerificationService(self.qq_email_config)
-        if not await email_service.connect():
-            print(f"  [注册] [!] 无法连接到 QQ 邮箱!")
-            return None
-
         context = None
         page = None
 
         try:
+            if not await email_service.connect():
+                print(f"  [注册] [!] 无法连接到 QQ 邮箱!")
+                return None
+
             print(f"  [注册] 创建浏览器页面...")
 
             # 为每个账号创建独立的浏览器上下文（隔离 cookie）
             context = await self._create_stealth_context()
             page = await context.new_page()
 
-            # 注入额外的反检测脚本
-            await inject_stealth_scripts(page)
-
             # 访问 Gemini Business 主页
             target_url = "https://business.gemini.google/"
             print(f"  [注册] 正在访问: {target_url}")
@@ -1589,7 +1765,7 @@ class AutoLoginService:
                 if not await _handle_trial_signup_page(page, display_name):
                     print(f"  [注册] [!] 首次注册失败")
                     return None
-                await asyncio.sleep(3)
+                await _wait_for_page_settled(page)
                 current_url = page.url
 
             # 检查是否需要登录
@@ -1628,7 +1804,7 @@ class AutoLoginService:
                 if not await _handle_trial_signup_page(page, display_name):
                     print(f"  [注册] [!] 首次注册失败!")
                     return None
-                await asyncio.sleep(3)
+                await _wait_for_page_settled(page)
                 current_url = page.url
 
             # 等待进入聊天页面
@@ -1682,6 +1858,8 @@ class AutoLoginService:
             for cookie in cookies:
                 if cookie["name"] == "__Secure-C_SES":
                     credentials["secure_c_ses"] = cookie["value"]
+                    if cookie.get("expires", -1) > 0:
+                        credentials["expires_at"] = datetime.fromtimestamp(cookie["expires"]).isoformat()
                     print(f"  [注册] secure_c_ses: {cookie['value'][:20]}...")
                 elif cookie["name"] == "__Host-C_OSES":
                     credentials["host_c_oses"] = cookie["value"]
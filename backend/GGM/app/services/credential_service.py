@@ -31,9 +31,6 @@ from app.utils.crypto import decode_xsrf_token, create_jwt_token
 
 logger = logging.getLogger(__name__)
 
-# 并发刷新服务（延迟导入避免循环依赖）
-_concurrent_service = None
-
 # API URL
 GETOXSRF_URL = "https://business.gemini.google/auth/getoxsrf"
 CREATE_SESSION_URL = "https://biz-discoveryengine.googleapis.com/v1alpha/locations/global/widgetCreateSession"
@@ -214,6 +211,7 @@ class CredentialRefreshService:
         self._code_hub = None  # 共享的验证码中心
         self._captcha_service = None
         self._config_dict = None  # 保存配置用于创建浏览器上下文
+        self._shared_borrowers = 0  # 正在借用共享资源的批量刷新数（期间不做空闲回收）
 
         # 并发注册相关
         self._register_queue: asyncio.Queue = None  # 注册队列
@@ -264,6 +262,8 @@ class CredentialRefreshService:
                     "headless": getattr(auto_login_config, 'headless', True),
                     # 添加 YesCaptcha API key（用于绕过 reCAPTCHA）
                     "yescaptcha_api_key": getattr(auto_login_config, 'yescaptcha_api_key', ''),
+                    "yescaptcha_max_concurrent": getattr(auto_login_config, 'yescaptcha_max_concurrent', 3),
+                    "yescaptcha_token_pool_size": getattr(auto_login_config, 'yescaptcha_token_pool_size', 0),
                     # 添加代理配置
                     "proxy": config.proxy,
                 }
@@ -359,7 +359,11 @@ class CredentialRefreshService:
                 yescaptcha_key = self._config_dict.get("yescaptcha_api_key", "")
                 if yescaptcha_key:
                     from app.services.auto_login.captcha_service import YesCaptchaService
-                    self._captcha_service = YesCaptchaService(yescaptcha_key)
+                    self._captcha_service = YesCaptchaService(
+                        yescaptcha_key,
+                        max_concurrent=self._config_dict.get("yescaptcha_max_concurrent", 3),
+                        pool_size=self._config_dict.get("yescaptcha_token_pool_size", 0)
+                    )
 
                 print(f"[Credential Service] Shared resources initialized (max_concurrent={self._max_concurrent})")
                 return True
@@ -575,7 +579,7 @@ class CredentialRefreshService:
                         idle_cycles = 0
                     except asyncio.TimeoutError:
                         idle_cycles += 1
-                        if idle_cycles >= 60 and self._browser is not None:
+                        if idle_cycles >= 60 and self._browser is not None and not self._shared_borrowers:
                             print(f"[Credential Service] Idle timeout, closing shared resources")
                             await self._close_shared_resources()
                 else:
@@ -631,9 +635,9 @@ class CredentialRefreshService:
         """
         from app.services.auto_login.service import (
             _safe_goto, _handle_trial_signup_page,
-            _dismiss_welcome_dialog, inject_stealth_scripts
+            _dismiss_welcome_dialog
         )
-        from app.services.auto_login.human_behavior import HumanBehavior
+        from app.services.auto_login.human_behavior import HumanBehavior, PAGE_STEALTH_SCRIPT
         from app.services.auto_login.captcha_service import CaptchaInterceptor
         from urllib.parse import urlparse, parse_qs
         import re
@@ -667,10 +671,9 @@ class CredentialRefreshService:
                 Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
                 Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
                 window.chrome = { runtime: {} };
-            """)
+            """ + PAGE_STEALTH_SCRIPT)
 
             page = await context.new_page()
-            await inject_stealth_scripts(page)
 
             human = HumanBehavior(page)
 
@@ -789,6 +792,9 @@ class CredentialRefreshService:
             for cookie in cookies:
                 if cookie["name"] == "__Secure-C_SES":
                     credentials["secure_c_ses"] = cookie["value"]
+                    # Playwright 的 expires 为 Unix 秒，会话 cookie 为 -1
+                    if cookie.get("expires", -1) > 0:
+                        credentials["expires_at"] = datetime.fromtimestamp(cookie["expires"]).isoformat()
                     print(f"{tag} secure_c_ses: {cookie['value'][:20]}...")
                 elif cookie["name"] == "__Host-C_OSES":
                     credentials["host_c_oses"] = cookie["value"]
@@ -1362,9 +1368,9 @@ class CredentialRefreshService:
         """
         from app.services.auto_login.service import (
             _safe_goto, _handle_trial_signup_page,
-            _dismiss_welcome_dialog, inject_stealth_scripts
+            _dismiss_welcome_dialog
         )
-        from app.services.auto_login.human_behavior import HumanBehavior
+        from app.services.auto_login.human_behavior import HumanBehavior, PAGE_STEALTH_SCRIPT
         from app.services.auto_login.captcha_service import CaptchaInterceptor
         from urllib.parse import urlparse, parse_qs
         import re
@@ -1394,10 +1400,9 @@ class CredentialRefreshService:
                 Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
                 Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
                 window.chrome = { runtime: {} };
-            """)
+            """ + PAGE_STEALTH_SCRIPT)
 
             page = await context.new_page()
-            await inject_stealth_scripts(page)
 
             human = HumanBehavior(page)
 
@@ -1517,6 +1522,8 @@ class CredentialRefreshService:
             for cookie in cookies:
                 if cookie["name"] == "__Secure-C_SES":
                     credentials["secure_c_ses"] = cookie["value"]
+                    if cookie.get("expires", -1) > 0:
+                        credentials["expires_at"] = datetime.fromtimestamp(cookie["expires"]).isoformat()
                     print(f"{tag} secure_c_ses: {cookie['value'][:20]}...")
                 elif cookie["name"] == "__Host-C_OSES":
                     credentials["host_c_oses"] = cookie["value"]
@@ -1792,6 +1799,8 @@ class CredentialRefreshService:
         # 更新刷新时间
         from datetime import datetime
         account.refresh_time = credentials.get("refresh_time") or datetime.now().isoformat()
+        # 新 cookie 没带过期时间时清空旧值，避免按旧过期时间误判
+        account.expires_at = credentials.get("expires_at", "")
 
         # 标记为可用
         account.available = True
@@ -2281,7 +2290,9 @@ class CredentialRefreshService:
             host_c_oses=credentials.get("host_c_oses", ""),
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
             note=note,
-            available=True
+            available=True,
+            refresh_time=credentials.get("refresh_time", ""),
+            expires_at=credentials.get("expires_at", "")
         )
 
         config_manager.config.accounts.append(new_account)
@@ -2341,8 +2352,6 @@ class CredentialRefreshService:
         Returns:
             同步结果统计
         """
-        global _concurrent_service
-
         # 加载邮箱列表
         emails = self._load_emails_from_file(file_path)
         if not emails:
@@ -2404,18 +2413,36 @@ class CredentialRefreshService:
                 "verification_timeout": auto_login_config.verification_timeout,
                 "headless": getattr(auto_login_config, 'headless', True),
                 "yescaptcha_api_key": getattr(auto_login_config, 'yescaptcha_api_key', ''),
+                "yescaptcha_max_concurrent": getattr(auto_login_config, 'yescaptcha_max_concurrent', 3),
+                "yescaptcha_token_pool_size": getattr(auto_login_config, 'yescaptcha_token_pool_size', 0),
             }
 
-            # 创建并发服务
-            if _concurrent_service is None:
-                _concurrent_service = ConcurrentAutoLoginService(config_dict, max_concurrent)
-                await _concurrent_service.initialize()
+            # 创建并发服务：优先复用共享的浏览器和验证码中心，
+            # 避免再启动一个 Chromium 进程和一路 IMAP 轮询
+            self._shared_borrowers += 1
+            try:
+                if await self._ensure_shared_resources():
+                    concurrent_service = ConcurrentAutoLoginService(
+                        config_dict,
+                        max_concurrent,
+                        browser=self._browser,
+                        code_hub=self._code_hub,
+                        captcha_service=self._captcha_service,
+                    )
+                else:
+                    concurrent_service = ConcurrentAutoLoginService(config_dict, max_concurrent)
+                await concurrent_service.initialize()
 
-            print(f"\n[并发刷新] 开始刷新 {len(accounts_to_refresh)} 个账号 (并发数={max_concurrent})")
-            logger.info(f"开始并发刷新 {len(accounts_to_refresh)} 个账号")
+                print(f"\n[并发刷新] 开始刷新 {len(accounts_to_refresh)} 个账号 (并发数={max_concurrent})")
+                logger.info(f"开始并发刷新 {len(accounts_to_refresh)} 个账号")
 
-            # 执行并发刷新
-            results = await _concurrent_service.refresh_accounts(accounts_to_refresh)
+                # 执行并发刷新
+                try:
+                    results = await concurrent_service.refresh_accounts(accounts_to_refresh)
+                finally:
+                    await concurrent_service.close()
+            finally:
+                self._shared_borrowers -= 1
 
             # 更新成功的账号凭证
             for item in results.get("success", []):
@@ -2462,14 +2489,6 @@ class CredentialRefreshService:
 
     async def shutdown_concurrent_service(self):
         """关闭并发刷新服务（包括共享资源）"""
-        global _concurrent_service
-
-        # 关闭独立的并发服务（如果有）
-        if _concurrent_service:
-            await _concurrent_service.close()
-            _concurrent_service = None
-            logger.info("独立并发刷新服务已关闭")
-
         # 关闭内置的共享资源
         await self._close_shared_resources()
         logger.info("共享刷新资源已关闭")
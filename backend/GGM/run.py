@@ -11,6 +11,7 @@
   python run.py -f           # 强制清理端口占用进程
   python run.py -p 9000      # 使用指定端口
   python run.py --no-clear   # 不清理端口，直接尝试启动
+  python run.py -v           # 输出调试日志
 """
 import sys
 import os
@@ -309,6 +310,11 @@ def main():
         action="store_true",
         help="不清理端口，直接尝试启动（端口占用时会报错）"
     )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="输出调试日志（DEBUG 级别）"
+    )
     args = parser.parse_args()
 
     # 确定使用的端口
@@ -330,6 +336,10 @@ def main():
     if args.port:
         os.environ["GEMINI_PORT"] = str(args.port)
 
+    # 详细模式：通过环境变量覆盖日志级别
+    if args.verbose:
+        os.environ["GEMINI_LOG_LEVEL"] = "DEBUG"
+
     print("正在启动服务...\n")
 
     # 启动服务
@@ -0,0 +1,51 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.services.account_pool_service import AccountPoolService
+
+
+def _account(expires_at=None, refresh_time=None):
+    return SimpleNamespace(expires_at=expires_at, refresh_time=refresh_time)
+
+
+def test_expiry_from_cookie_only():
+    service = AccountPoolService()
+    account = _account(expires_at="2026-01-01T10:00:00")
+    assert service._get_credential_expiry(account) == datetime(2026, 1, 1, 10, 0, 0)
+
+
+def test_expiry_from_refresh_time_only():
+    service = AccountPoolService()
+    account = _account(refresh_time="2026-01-01T00:00:00")
+    expected = datetime(2026, 1, 1) + timedelta(hours=service.CREDENTIAL_EXPIRE_HOURS)
+    assert service._get_credential_expiry(account) == expected
+
+
+def test_expiry_takes_earlier_when_both_present():
+    service = AccountPoolService()
+    refresh_expiry = datetime(2026, 1, 1) + timedelta(hours=service.CREDENTIAL_EXPIRE_HOURS)
+
+    # cookie 比估算值晚：取估算值
+    later = _account(
+        expires_at=(refresh_expiry + timedelta(days=30)).isoformat(),
+        refresh_time="2026-01-01T00:00:00",
+    )
+    assert service._get_credential_expiry(later) == refresh_expiry
+
+    # cookie 比估算值早：取 cookie
+    earlier = _account(
+        expires_at=(refresh_expiry - timedelta(hours=1)).isoformat(),
+        refresh_time="2026-01-01T00:00:00",
+    )
+    assert service._get_credential_expiry(earlier) == refresh_expiry - timedelta(hours=1)
+
+
+def test_expiry_none_without_timestamps():
+    service = AccountPoolService()
+    assert service._get_credential_expiry(_account()) is None
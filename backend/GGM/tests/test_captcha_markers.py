@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.services.auto_login.captcha_service import classify_response
+
+
+def test_captcha_failure_takes_priority_over_api_status():
+    body = b')]}\'\n[["wrb.fr",null,"inner_api_status"],["CAPTCHA_CHECK_FAILED",1]]'
+    assert classify_response(body) == "captcha_failed"
+
+
+def test_code_sent_takes_priority():
+    body = b'[["inner_api_status"],["wrb.fr","SendVerificationCode",null]]'
+    assert classify_response(body) == "code_sent"
+
+
+def test_api_status_only():
+    assert classify_response(b'[["inner_api_status",1]]') == "handled"
+
+
+def test_no_markers_returns_none():
+    assert classify_response(b'[["wrb.fr","Other",null]]') is None
+
+
+def test_patch_payload_replaces_token_inside_encoded_f_req():
+    from app.services.auto_login.captcha_service import YesCaptchaService
+
+    old_token = "03AFc" + "a" * 60
+    new_token = "03AFc" + "b" * 60
+    raw_body = f"f.req=%5B%5B%5B%22x%22%2C%22%5B%5C%22{old_token}%5C%22%5D%22%5D%5D%5D&at=AJpMio123&"
+    patched = YesCaptchaService("key").patch_payload(raw_body, new_token)
+    assert patched == raw_body.replace(old_token, new_token)
+
+
+def test_patch_payload_without_token_is_unchanged():
+    from app.services.auto_login.captcha_service import YesCaptchaService
+
+    raw_body = "f.req=%5B%5D&at=AJpMio123&"
+    assert YesCaptchaService("key").patch_payload(raw_body, "03AFc" + "b" * 60) == raw_body
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.services.auto_login.email_service import EmailVerificationService
+
+
+def _service():
+    return EmailVerificationService({})
+
+
+def test_higher_priority_pattern_wins_over_earlier_match():
+    # 通用格式出现在前面，但"一次性验证码为"单独一行的格式优先级更高
+    body = "验证码：ZZZ999\n您的一次性验证码为：\n\nabc123\n"
+    assert _service()._match_code(body) == "ABC123"
+
+
+def test_code_keyword_beats_g_prefix():
+    body = "G-123456 is not it, your code: QWE789"
+    assert _service()._match_code(body) == "QWE789"
+
+
+def test_body_failing_prefilter_returns_none():
+    body = "Welcome to Gemini Business, sign in with 123456 to continue."
+    assert _service()._match_code(body) is None
+
+
+def test_keywordless_body_matches_standalone_line():
+    body = "Welcome\n  XY7Z42  \nThanks"
+    assert _service()._match_code(body) == "XY7Z42"
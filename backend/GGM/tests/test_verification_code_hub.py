@@ -0,0 +1,95 @@
+import asyncio
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.services.auto_login.concurrent_service import VerificationCodeHub
+
+
+class FakeImapClient:
+    """只实现 _poll_once 用到的 uid_search，依次返回预先给定的 UID 列表"""
+
+    def __init__(self, searches):
+        self.searches = list(searches)
+        self.criteria = []
+
+    async def uid_search(self, criteria):
+        self.criteria.append(criteria)
+        return "OK", [self.searches.pop(0).encode()]
+
+
+def _hub(searches, mails):
+    """
+    构造使用假 IMAP 连接的验证码中心
+
+    mails: {uid: (验证码, 收件人)}，每次 FETCH 的 UID 记录在 hub.fetched 中
+    """
+    hub = VerificationCodeHub({})
+    hub._imap_client = FakeImapClient(searches)
+    hub.fetched = []
+
+    async def fetch_batch(uids):
+        hub.fetched.append(list(uids))
+        return {uid: uid.encode() for uid in uids if uid in mails}
+
+    hub._fetch_batch = fetch_batch
+    hub._parse_email = lambda uid, raw: mails.get(uid)
+    return hub
+
+
+def test_code_arriving_before_wait_is_delivered():
+    async def run():
+        hub = _hub(["5"], {"5": ("ABC123", "a@example.com")})
+        hub._last_max_uid = 4
+        await hub._poll_once()
+        return await hub.wait_for_code("A@example.com", timeout=1)
+
+    assert asyncio.run(run()) == "ABC123"
+
+
+def test_uid_below_watermark_is_ignored():
+    async def run():
+        mails = {"8": ("OLD111", "a@example.com"), "11": ("NEW222", "a@example.com")}
+        # "N:*" 在没有新邮件时仍会返回最后一封，第二次搜索模拟这种情况
+        hub = _hub(["8 11", "11"], mails)
+        hub._last_max_uid = 10
+        await hub._poll_once()
+        await hub._poll_once()
+        code = await hub.wait_for_code("a@example.com", timeout=0.1)
+        leftover = await hub.wait_for_code("a@example.com", timeout=0.1)
+        return hub, code, leftover
+
+    hub, code, leftover = asyncio.run(run())
+    assert hub.fetched == [["11"]]
+    assert hub._last_max_uid == 11
+    assert hub._imap_client.criteria[1].startswith("UID 12:*")
+    assert code == "NEW222"
+    assert leftover is None
+
+
+def test_cancelled_waiter_does_not_consume_other_email_code():
+    async def run():
+        hub = VerificationCodeHub({})
+        cancel_a = asyncio.Event()
+        waiter_a = asyncio.create_task(
+            hub.wait_for_code("a@example.com", timeout=5, cancel_event=cancel_a)
+        )
+        waiter_b = asyncio.create_task(hub.wait_for_code("b@example.com", timeout=5))
+        await asyncio.sleep(0)
+
+        cancel_a.set()
+        result_a = await waiter_a
+        hub._store_codes([("BBB222", "b@example.com")])
+        result_b = await waiter_b
+        # 已取消的等待者不再登记，之后到达的 a 的验证码留在队列中
+        hub._store_codes([("AAA111", "a@example.com")])
+        return hub, result_a, result_b
+
+    hub, result_a, result_b = asyncio.run(run())
+    assert result_a is None
+    assert result_b == "BBB222"
+    assert not hub._waiters
+    assert [code for code, _ in hub._codes_by_email["a@example.com"]] == ["AAA111"]
@@ -71,6 +71,12 @@ AUTO_LOGIN_HEADLESS = True
 # YesCaptcha API 密钥（用于绕过 reCAPTCHA，可选）
 YESCAPTCHA_API_KEY = ""
 
+# YesCaptcha 最大并发打码任务数（与套餐并发数一致）
+YESCAPTCHA_MAX_CONCURRENT = 3
+
+# YesCaptcha 预取 token 池大小（0 表示不预取；开启后空闲时也会消耗打码额度）
+YESCAPTCHA_TOKEN_POOL_SIZE = 0
+
 # ============================================================
 # 账号池管理配置
 # ============================================================
@@ -79,4 +85,5 @@ ACCOUNT_POOL_HEALTH_CHECK_INTERVAL = 300
 ACCOUNT_POOL_MAX_REFRESH_FAILURES = 2
 ACCOUNT_POOL_MAX_CONSECUTIVE_ERRORS = 3
 ACCOUNT_POOL_CREDENTIAL_EXPIRE_HOURS = 12
+ACCOUNT_POOL_CREDENTIAL_REFRESH_AHEAD_SECONDS = 900
 ACCOUNT_POOL_MAX_CONCURRENT = 5